@@ -1,24 +1,63 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
+from functools import wraps
 import threading
 import time
+import os
 import config
 import argparse
-from utils.data_generator import generate_synthetic_data
+from utils import cache_store, transport
+from utils.data_generator import generate_synthetic_data, compute_route_distances
+from models.arrivals import ArrivalProcess
 from models.simulation import Simulation
-
-# Parse command line arguments
-parser = argparse.ArgumentParser(description='EV Queue Simulation Server')
-parser.add_argument('--no-cache', action='store_true', help='Disable data caching')
-parser.add_argument('--clear-cache', action='store_true', help='Clear existing cache before starting')
-args = parser.parse_args()
+from models.optimization import tracer
+from models.fleet_query import EV_FIELDS, parse_bbox
+from models.memory import memory_report
+from models.whatif import run_what_ifs
 
 app = Flask(__name__)
 
-# Clear cache if requested
-if args.clear_cache:
-    import os
+# EV fields of EV.to_dict, in order (MessagePack responses write them straight from the EVs)
+EV_DICT_FIELDS = (
+    'id', 'current_position', 'soc', 'target_soc', 'charging', 'in_queue', 'assigned_station',
+    'waiting_time', 'trip_completed', 'abandoned', 'journey_log'
+)
+
+# Journey log entries returned per EV by the incremental journey endpoints
+JOURNEY_PAGE_LIMIT = 500
+
+# Default data set loaded at startup
+DEFAULT_DATA_PARAMS = {'num_evs': 100, 'num_stations': 20, 'num_nodes': 80, 'num_routes': 240}
+
+# Simulation data, loaded in the background so the server answers immediately
+evs, stations, routes, simulation = [], [], [], None
+data_ready = threading.Event()
+data_lock = threading.Lock()
+# Guards the idle -> loading transition so concurrent first requests start one load
+load_start_lock = threading.Lock()
+load_state = {'status': 'idle', 'error': None, 'started_at': None, 'load_time': None}
+load_options = {'use_cache': True}
+
+def create_simulation(evs, stations, routes, rolling=None, seed=None):
+    """Build the simulation, with a time-of-day arrival process in rolling-fleet mode"""
+    if rolling is None:
+        rolling = getattr(config, 'ROLLING_FLEET', False)
+    arrivals = None
+    if rolling:
+        arrivals = ArrivalProcess(
+            routes,
+            route_distances=compute_route_distances(routes),
+            hourly_rates=getattr(config, 'ARRIVAL_RATES_PER_HOUR', None),
+            start_hour=getattr(config, 'SIMULATION_START_HOUR', 7),
+            rate_scale=getattr(config, 'ARRIVAL_RATE_SCALE', 1.0),
+            seed=seed
+        )
+    return Simulation(evs, stations, routes, arrivals=arrivals)
+
+def clear_cache_files():
+    """Remove cached nodes, routes and distance matrices"""
     import glob
     print("Clearing cache files...")
+    cache_store.clear_cache()
     for cache_file in glob.glob("*.pkl"):
         try:
             os.remove(cache_file)
@@ -26,12 +65,99 @@ if args.clear_cache:
         except Exception as e:
             print(f"Failed to remove {cache_file}: {e}")
 
-# Initialize simulation with predefined routes
-print("Initializing simulation data...")
-evs, stations, routes = generate_synthetic_data(100, 20, 80, 240, use_cache=not args.no_cache)
-print("Creating simulation engine...")
-simulation = Simulation(evs, stations, routes)
-print("Server initialization complete!")
+def load_data(use_cache=True):
+    """Generate or load the default data set and build the simulation"""
+    global evs, stations, routes, simulation
+    with data_lock:
+        load_state['status'] = 'loading'
+        load_state['started_at'] = time.time()
+        try:
+            print("Initializing simulation data...")
+            new_evs, new_stations, new_routes = generate_synthetic_data(
+                use_cache=use_cache, **DEFAULT_DATA_PARAMS)
+            print("Creating simulation engine...")
+            evs, stations, routes = new_evs, new_stations, new_routes
+            simulation = create_simulation(evs, stations, routes)
+            load_state['status'] = 'ready'
+            load_state['load_time'] = time.time() - load_state['started_at']
+            data_ready.set()
+            print(f"Simulation data ready in {load_state['load_time']:.2f}s")
+        except Exception as e:
+            load_state['status'] = 'error'
+            load_state['error'] = str(e)
+            print(f"Error loading simulation data: {e}")
+
+def start_background_load(use_cache=True):
+    """Start loading data in a background thread (no-op if already started)"""
+    with load_start_lock:
+        if load_state['status'] != 'idle':
+            return False
+        load_state['status'] = 'loading'
+    thread = threading.Thread(target=load_data, kwargs={'use_cache': use_cache})
+    thread.daemon = True
+    thread.start()
+    return True
+
+@app.before_request
+def ensure_data_loading():
+    """Lazily start loading data when the app is served without __main__"""
+    if load_state['status'] == 'idle':
+        start_background_load(use_cache=load_options['use_cache'])
+
+def negotiated(data, columnar=None, packed=None):
+    """
+    Respond in the representation the client asked for in Accept
+    
+    `data` returns the JSON/MessagePack payload, `columnar` (if the
+    endpoint offers it) the packed columnar bytes and `packed` (optional)
+    MessagePack bytes written without building `data`. Bodies are gzip or
+    deflate compressed when the client accepts it and TRANSPORT_COMPRESSION
+    is on.
+    """
+    mimetype = transport.negotiate(request.accept_mimetypes, columnar=columnar is not None)
+    if mimetype == transport.COLUMNAR:
+        body = columnar()
+    elif mimetype == transport.MSGPACK:
+        body = packed() if packed is not None else transport.pack_msgpack(data())
+    else:
+        response = jsonify(data())
+        if not getattr(config, 'TRANSPORT_COMPRESSION', True):
+            return response
+        body = response.get_data()
+    
+    encoding = None
+    if getattr(config, 'TRANSPORT_COMPRESSION', True):
+        body, encoding = transport.compress(body, request.accept_encodings,
+                                            level=getattr(config, 'TRANSPORT_COMPRESS_LEVEL', 6))
+    response = Response(body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept')
+    response.vary.add('Accept-Encoding')
+    return response
+
+def requires_data(view):
+    """Answer 503 until the simulation data has finished loading"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not data_ready.is_set():
+            return jsonify({
+                'error': 'Simulation data is not ready yet',
+                'status': load_state['status']
+            }), 503
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/ready')
+def readiness():
+    """Readiness probe: 200 once simulation data is loaded, 503 before"""
+    body = {
+        'ready': data_ready.is_set(),
+        'status': load_state['status'],
+        'error': load_state['error'],
+        'load_time': load_state['load_time']
+    }
+    return jsonify(body), (200 if data_ready.is_set() else 503)
 
 @app.route('/')
 def index():
@@ -39,67 +165,341 @@ def index():
     return render_template('index.html', api_key=config.GOOGLE_MAPS_API_KEY)
 
 @app.route('/api/simulation/start', methods=['POST'])
+@requires_data
 def start_simulation():
     """Start the simulation"""
     success = simulation.start()
     return jsonify({'success': success})
 
 @app.route('/api/simulation/stop', methods=['POST'])
+@requires_data
 def stop_simulation():
     """Stop the simulation"""
     success = simulation.stop()
     return jsonify({'success': success})
 
 @app.route('/api/simulation/reset', methods=['POST'])
+@requires_data
 def reset_simulation():
     """Reset the simulation"""
     success = simulation.reset()
     return jsonify({'success': success})
 
+@app.route('/api/simulation/speed', methods=['GET', 'POST'])
+@requires_data
+def simulation_speed():
+    """Set the target speed in simulated seconds per wall-clock second (POST) or get pacing stats (GET)"""
+    if request.method == 'POST':
+        try:
+            simulation.set_speed(request.json.get('speed'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(simulation.pacer.stats())
+
+@app.route('/api/simulation/checkpoint', methods=['GET', 'POST'])
+@requires_data
+def checkpoint_simulation():
+    """Write a checkpoint (POST) or get the status of the last one (GET)"""
+    if request.method == 'POST':
+        started = simulation.checkpoint(simulation.checkpoint_file)
+        return jsonify({'success': started, 'status': simulation.get_checkpoint_status()})
+    return jsonify(simulation.get_checkpoint_status())
+
+@app.route('/api/simulation/restore', methods=['POST'])
+@requires_data
+def restore_simulation():
+    """Replace the running simulation with the last checkpoint"""
+    global evs, stations, routes, simulation
+    
+    checkpoint_file = simulation.checkpoint_file
+    if not os.path.exists(checkpoint_file):
+        return jsonify({'success': False, 'error': 'No checkpoint available'}), 404
+    
+    simulation.stop()
+    with data_lock:
+        simulation = Simulation.restore(checkpoint_file)
+        evs, stations, routes = simulation.evs, simulation.stations, simulation.routes
+    return jsonify({'success': True, 'step': simulation.current_step})
+
 @app.route('/api/simulation/state')
+@requires_data
 def get_state():
     """Get current simulation state"""
     state = simulation.get_current_state()
     if not state:
         return jsonify({'error': 'No simulation state available'})
-    return jsonify(state)
+    
+    def columnar():
+        with simulation.lock:
+            return transport.state_columnar(simulation.current_step, dict(simulation.metrics),
+                                            simulation.evs, simulation.stations)
+    return negotiated(lambda: state, columnar=columnar)
+
+@app.route('/api/simulation/what-if', methods=['POST'])
+@requires_data
+def what_if():
+    """
+    Forecast scenarios on forks of the current state, in parallel
+    
+    Body: {"steps": 60, "scenarios": [{"name": "...", "stations_down": [...],
+    "add_chargers": {station_id: n}, "charging_rate": {station_id: kW},
+    "demand_scale": 1.5}, ...]}. The live simulation keeps running.
+    """
+    data = request.get_json(silent=True) or {}
+    scenarios = data.get('scenarios') or [{'name': 'baseline'}]
+    max_steps = getattr(config, 'WHATIF_MAX_STEPS', 1440)
+    try:
+        steps = int(data.get('steps', 60))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'steps must be an integer'}), 400
+    if not 0 < steps <= max_steps:
+        return jsonify({'error': f'steps must be between 1 and {max_steps}'}), 400
+    if not isinstance(scenarios, list) or not all(isinstance(scenario, dict) for scenario in scenarios):
+        return jsonify({'error': 'scenarios must be a list of objects'}), 400
+    
+    started = time.time()
+    results = run_what_ifs(simulation, scenarios, steps)
+    return negotiated(lambda: {
+        'steps': steps,
+        'results': results,
+        'elapsed_seconds': time.time() - started
+    })
 
 @app.route('/api/simulation/history')
+@requires_data
 def get_history():
     """Get simulation history"""
     start = int(request.args.get('start', 0))
     count = int(request.args.get('count', 100))
     history = simulation.get_history(start, count)
-    return jsonify(history)
+    return negotiated(lambda: history, columnar=lambda: transport.history_columnar(history))
+
+@app.route('/api/metrics/history')
+@requires_data
+def get_metrics_history():
+    """
+    Downsampled metric series for charts
+    
+    Query parameters: `metrics` (comma-separated, all by default), a step
+    range `start`/`end` or a time range `start_time`/`end_time` in simulated
+    seconds, `points` (target points per series, default 200) and `method`
+    ('minmax' or 'lttb').
+    """
+    def number(name, convert=int):
+        value = request.args.get(name)
+        return convert(value) if value not in (None, '') else None
+    
+    metrics = request.args.get('metrics')
+    try:
+        history = simulation.get_metrics_history(
+            start=number('start'),
+            end=number('end'),
+            start_time=number('start_time', float),
+            end_time=number('end_time', float),
+            points=number('points') or 200,
+            metrics=metrics.split(',') if metrics else None,
+            method=request.args.get('method', 'minmax')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return negotiated(lambda: history)
+
+@app.route('/api/metrics/rolling')
+@requires_data
+def get_metric_aggregates():
+    """
+    Rolling mean and max over the last `window` steps (default 60), and the
+    EWMA, of `metrics` (comma-separated; station utilization columns are
+    named station_utilization.<station id>)
+    """
+    metrics = request.args.get('metrics')
+    try:
+        aggregates = simulation.get_metric_aggregates(
+            int(request.args.get('window', 60)),
+            metrics.split(',') if metrics else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return negotiated(lambda: aggregates)
+
+@app.route('/api/metrics/quantiles')
+@requires_data
+def get_duration_quantiles():
+    """
+    Wait and charge duration quantiles from the streaming sketches
+    
+    `quantiles` is comma-separated (default 0.5,0.9,0.95,0.99); with
+    `station_id` (comma-separated) the stations' sketches are merged,
+    otherwise the fleet-wide ones are used.
+    """
+    station_ids = request.args.get('station_id')
+    try:
+        quantiles = [float(q) for q in request.args.get('quantiles', '0.5,0.9,0.95,0.99').split(',')]
+        if any(not 0 <= q <= 1 for q in quantiles):
+            raise ValueError("Quantiles must be between 0 and 1")
+        result = simulation.get_duration_quantiles(quantiles, station_ids.split(',') if station_ids else None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return negotiated(lambda: result)
 
 @app.route('/api/optimization/logs')
+@requires_data
 def get_optimization_logs():
     """Get optimization logs"""
     logs = simulation.get_optimization_logs()
     return jsonify({'logs': logs})
 
+@app.route('/api/optimization/trace', methods=['GET', 'POST'])
+@requires_data
+def get_decision_trace():
+    """Query optimizer decisions (GET), or change the trace level and sampling rate (POST)"""
+    if request.method == 'POST':
+        options = request.json or {}
+        try:
+            tracer.configure(level=options.get('level'), sample_rate=options.get('sample_rate'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(tracer.stats())
+    
+    try:
+        records = simulation.get_decision_trace(
+            ev_id=request.args.get('ev_id'),
+            station_id=request.args.get('station_id'),
+            kind=request.args.get('kind'),
+            min_level=request.args.get('level'),
+            since=int(request.args.get('since', 0)),
+            limit=int(request.args.get('limit', 100))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'records': records, 'trace': tracer.stats()})
+
 @app.route('/api/ev/journey-log/<ev_id>')
+@requires_data
 def get_ev_journey_log(ev_id):
-    """Get detailed journey log for a specific EV"""
-    journey_log = simulation.get_ev_journey_log(ev_id)
-    return jsonify({'ev_id': ev_id, 'journey_log': journey_log})
+    """
+    Get detailed journey log for a specific EV
+    
+    Without parameters returns the whole log. With `since` (the sequence
+    number of the last entry seen) and/or `limit` returns only newer entries:
+    {'ev_id', 'events', 'next_cursor', 'reset'}.
+    """
+    if 'since' not in request.args and 'limit' not in request.args:
+        journey_log = simulation.get_ev_journey_log(ev_id)
+        return negotiated(lambda: {'ev_id': ev_id, 'journey_log': journey_log})
+    
+    try:
+        since = int(request.args['since']) if request.args.get('since') else None
+        limit = int(request.args.get('limit', JOURNEY_PAGE_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    delta = simulation.get_journey_events({ev_id: since}, limit).get(ev_id)
+    if delta is None:
+        return jsonify({'error': f'Unknown EV {ev_id}'}), 404
+    return negotiated(lambda: dict(delta, ev_id=ev_id))
+
+@app.route('/api/ev/journey-logs', methods=['POST'])
+@requires_data
+def get_journey_logs():
+    """
+    Journey log entries for many EVs in one request
+    
+    Body: {"cursors": {ev_id: last sequence number seen or null}, "limit": n}.
+    Returns {'journey_logs': {ev_id: {'events', 'next_cursor', 'reset'}},
+    'unknown': [IDs not in the fleet]}.
+    """
+    data = request.get_json(silent=True) or {}
+    cursors = data.get('cursors')
+    if not isinstance(cursors, dict):
+        return jsonify({'error': 'cursors must map EV IDs to sequence numbers'}), 400
+    try:
+        cursors = {ev_id: None if since is None else int(since) for ev_id, since in cursors.items()}
+        limit = int(data.get('limit', JOURNEY_PAGE_LIMIT))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Cursors and limit must be integers'}), 400
+    deltas = simulation.get_journey_events(cursors, limit)
+    return negotiated(lambda: {
+        'journey_logs': deltas,
+        'unknown': [ev_id for ev_id in cursors if ev_id not in deltas]
+    })
 
 @app.route('/api/stations')
+@requires_data
 def get_stations():
     """Get all charging stations"""
     return jsonify([station.to_dict() for station in stations])
 
 @app.route('/api/evs')
+@requires_data
 def get_evs():
-    """Get all EVs"""
-    return jsonify([ev.to_dict() for ev in evs])
+    """
+    Get EVs
+    
+    Without parameters returns every EV with its journey log. With any of
+    `bbox` (south,west,north,east), `fields`, `status` (comma-separated),
+    `cursor` or `limit` returns one page of matching EVs with only the
+    requested fields: {'evs': [...], 'total': n, 'next_cursor': id or null}.
+    """
+    if not any(name in request.args for name in ('bbox', 'fields', 'status', 'cursor', 'limit')):
+        def columnar():
+            with simulation.lock:
+                return transport.encode_columnar({'ev_ids': [ev.id for ev in evs]}, transport.ev_columns(evs))
+        return negotiated(
+            lambda: [ev.to_dict() for ev in evs],
+            columnar=columnar,
+            packed=lambda: transport.pack_ev_fields(evs, [(field, EV_FIELDS[field]) for field in EV_DICT_FIELDS])
+        )
+    
+    def split(name):
+        value = request.args.get(name)
+        return [part for part in value.split(',') if part] if value else None
+    
+    try:
+        bbox = request.args.get('bbox')
+        page = simulation.query_evs(
+            bbox=parse_bbox(bbox) if bbox else None,
+            fields=split('fields'),
+            statuses=split('status'),
+            cursor=request.args.get('cursor'),
+            limit=min(int(request.args.get('limit', 500)), 5000)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return negotiated(lambda: page)
+
+@app.route('/api/map/clusters')
+@requires_data
+def get_map_clusters():
+    """EV and station clusters for a `zoom` level and `bbox`, or individual points at high zoom"""
+    try:
+        zoom = int(request.args.get('zoom', 13))
+        bbox = request.args.get('bbox')
+        fields = request.args.get('fields')
+        view = simulation.map_view(
+            zoom,
+            bbox=parse_bbox(bbox) if bbox else None,
+            fields=fields.split(',') if fields else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(view)
 
 @app.route('/api/routes')
+@requires_data
 def get_routes():
     """Get all predefined routes"""
-    return jsonify(routes)
+    return jsonify(list(routes))
+
+@app.route('/api/memory')
+@requires_data
+def get_memory_report():
+    """Get per-structure memory usage of the simulation"""
+    with simulation.lock:
+        report = memory_report(simulation)
+    return jsonify(report)
 
 @app.route('/api/generate', methods=['POST'])
+@requires_data
 def regenerate_data():
     """Regenerate synthetic data"""
     global evs, stations, routes, simulation
@@ -113,17 +513,21 @@ def regenerate_data():
     num_nodes = int(request.json.get('num_nodes', 80))
     num_routes = int(request.json.get('num_routes', 240))
     use_cache = request.json.get('use_cache', True)
+    seed = request.json.get('seed')
+    rolling = request.json.get('rolling')
     
     print(f"Regenerating data with {num_evs} EVs, {num_stations} stations, {num_nodes} nodes, {num_routes} routes...")
     print(f"Cache usage: {'enabled' if use_cache else 'disabled'}")
     
-    # Generate new data
-    evs, stations, routes = generate_synthetic_data(num_evs, num_stations, num_nodes, num_routes, use_cache=use_cache)
-    
-    # Create new simulation
-    print("Creating new simulation engine...")
-    simulation = Simulation(evs, stations, routes)
-    print("Regeneration complete!")
+    with data_lock:
+        # Generate new data
+        evs, stations, routes = generate_synthetic_data(num_evs, num_stations, num_nodes, num_routes,
+                                                        use_cache=use_cache, seed=seed)
+        
+        # Create new simulation
+        print("Creating new simulation engine...")
+        simulation = create_simulation(evs, stations, routes, rolling=rolling, seed=seed)
+        print("Regeneration complete!")
     
     return jsonify({
         'success': True, 
@@ -131,8 +535,30 @@ def regenerate_data():
         'num_stations': num_stations,
         'num_nodes': num_nodes,
         'num_routes': num_routes,
-        'cache_used': use_cache
+        'cache_used': use_cache,
+        'rolling': simulation.rolling
     })
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='EV Queue Simulation Server')
+    parser.add_argument('--no-cache', action='store_true', help='Disable data caching')
+    parser.add_argument('--clear-cache', action='store_true', help='Clear existing cache before starting')
+    parser.add_argument('--host', default=config.HOST, help='Host to bind (default from config)')
+    parser.add_argument('--port', type=int, default=config.PORT, help='Port to bind (default from config)')
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
\ No newline at end of file
+    args = parse_args()
+    
+    # Clear cache if requested
+    if args.clear_cache:
+        clear_cache_files()
+    
+    load_options['use_cache'] = not args.no_cache
+    
+    # With the debug reloader, only the serving child process loads data
+    if not config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_load(use_cache=load_options['use_cache'])
+    
+    app.run(host=args.host, port=args.port, debug=config.DEBUG)
\ No newline at end of file
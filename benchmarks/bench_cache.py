@@ -0,0 +1,64 @@
+"""
+Cache benchmarks: save and open time of the columnar route cache
+
+Run from the repository root:
+
+    python benchmarks/bench_cache.py [--routes 100000] [--points 12]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import cache_store
+
+def make_routes(num_routes, points_per_route):
+    """Synthetic route dicts shaped like the generator's output"""
+    routes = []
+    for i in range(num_routes):
+        points = [(12.9 + random.random() * 0.2, 77.5 + random.random() * 0.2)
+                  for _ in range(points_per_route)]
+        routes.append({
+            "id": f"route-{i + 1}",
+            "origin": points[0],
+            "destination": points[-1],
+            "points": points,
+            "distance": random.uniform(1, 30)
+        })
+    return routes
+
+def main():
+    parser = argparse.ArgumentParser(description='EV Queue cache benchmarks')
+    parser.add_argument('--routes', type=int, default=100000, help='Number of routes')
+    parser.add_argument('--points', type=int, default=12, help='Points per route')
+    args = parser.parse_args()
+
+    routes = make_routes(args.routes, args.points)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_store.CACHE_DIR = cache_dir
+        key = cache_store.cache_key(kind='bench', num_routes=args.routes)
+
+        start = time.perf_counter()
+        cache_store.save_routes(key, routes)
+        save_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table = cache_store.load_routes(key)
+        open_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(0, len(table), max(1, len(table) // 1000)):
+            table[i]
+        access_time = (time.perf_counter() - start) / min(len(table), 1000)
+
+    print(f"{args.routes} routes x {args.points} points")
+    print(f"  {'save':<24} {save_time * 1000:10.1f} ms")
+    print(f"  {'open (memory-mapped)':<24} {open_time * 1000:10.2f} ms")
+    print(f"  {'first access per route':<24} {access_time * 1e6:10.1f} us")
+
+if __name__ == '__main__':
+    main()
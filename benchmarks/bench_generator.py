@@ -0,0 +1,54 @@
+"""
+Data generator benchmarks: fleet generation throughput in EVs/sec
+
+Run from the repository root (no network needed, routes are built offline):
+
+    python benchmarks/bench_generator.py [--evs 1000000] [--chunk 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from models.road_graph import get_offline_router
+from utils.data_generator import (
+    compute_route_distances, generate_fleet, generate_random_locations,
+    generate_routes_parallel, iter_ev_chunks
+)
+
+def main():
+    parser = argparse.ArgumentParser(description='EV Queue data generator benchmarks')
+    parser.add_argument('--evs', type=int, default=1000000, help='Fleet size')
+    parser.add_argument('--chunk', type=int, default=100000, help='EVs per streamed chunk')
+    parser.add_argument('--nodes', type=int, default=80, help='Number of nodes')
+    parser.add_argument('--routes', type=int, default=240, help='Number of routes')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    nodes = generate_random_locations(args.nodes, rng)
+    routes = generate_routes_parallel(nodes, args.routes, router=get_offline_router(nodes), offline=True)
+
+    start = time.perf_counter()
+    fleet = generate_fleet(args.evs, len(routes), seed=1)
+    arrays_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_route_distances(routes)
+    distances_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count = 0
+    for chunk in iter_ev_chunks(args.evs, routes, args.chunk, seed=1):
+        count += len(chunk)
+    objects_time = time.perf_counter() - start
+
+    print(f"{len(fleet)} EVs over {len(routes)} routes")
+    print(f"  {'fleet arrays':<28} {args.evs / arrays_time:14,.0f} EVs/sec")
+    print(f"  {'route distances (batch)':<28} {distances_time * 1000:14.2f} ms")
+    print(f"  {'streamed EV objects':<28} {count / objects_time:14,.0f} EVs/sec")
+
+if __name__ == '__main__':
+    main()
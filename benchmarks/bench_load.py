@@ -0,0 +1,272 @@
+"""
+Load test: concurrent dashboard clients against a running server, with
+per-endpoint latency percentiles, error rates and the simulation's step
+rate under each load level
+
+Each client follows the browser's polling pattern: main.js polls
+/api/simulation/state every 1000 / UI speed ms, charts.js refreshes the
+metrics history every 5th update, journey.js fetches the selected EV's new
+journey entries every update and the EV selector every 20th, logs.js the
+optimization logs every 10th, and map.js reloads the clusters in view
+whenever the map is panned or zoomed.
+
+Run from the repository root (no network needed, routes are built offline):
+
+    python benchmarks/bench_load.py [--clients 0 1 10 50] [--duration 20] [--evs 1000]
+    python benchmarks/bench_load.py --url http://127.0.0.1:5000 --clients 10
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, REPO_ROOT)
+
+from utils.data_generator import BANGALORE_CENTER, CITY_RADIUS
+
+# Polling pattern of the dashboard, in state updates (main.js, charts.js, journey.js, logs.js)
+CHARTS_EVERY = 5
+LOGS_EVERY = 10
+EV_SELECTOR_EVERY = 20
+
+def start_server(port, num_evs, num_stations, timeout=300):
+    """Serve the app on offline data in a child process; returns the process once data is ready"""
+    code = (
+        "import app\n"
+        "from benchmarks.bench_sharding import build_data\n"
+        f"app.evs, app.stations, app.routes = build_data({num_evs}, {num_stations}, 400, 2000)\n"
+        "app.simulation = app.create_simulation(app.evs, app.stations, app.routes)\n"
+        "app.load_state.update(status='ready', load_time=0.0)\n"
+        "app.data_ready.set()\n"
+        f"app.app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)\n"
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-c', code], cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=1) as response:
+                if json.loads(response.read()).get('ready'):
+                    return server
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.05)
+    server.terminate()
+    raise TimeoutError(f"Server not ready after {timeout}s")
+
+def call(base_url, path, body=None, timeout=10):
+    """(status, parsed JSON or None); status 0 for connection errors and timeouts"""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method='POST' if data is not None else 'GET',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, None
+    except (urllib.error.URLError, ConnectionError, TimeoutError, ValueError):
+        return 0, None
+
+class Recorder:
+    """Latencies and errors per endpoint, shared by the client threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + (not ok)
+
+    def report(self, elapsed):
+        """{endpoint: {'requests', 'errors', 'error_rate', 'rps', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'}}"""
+        rows = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            milliseconds = np.asarray(latencies) * 1000
+            p50, p90, p99 = np.percentile(milliseconds, [50, 90, 99])
+            rows[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors[endpoint],
+                'error_rate': self.errors[endpoint] / len(latencies),
+                'rps': len(latencies) / elapsed,
+                'p50_ms': float(p50), 'p90_ms': float(p90), 'p99_ms': float(p99),
+                'max_ms': float(milliseconds.max())
+            }
+        return rows
+
+class DashboardClient(threading.Thread):
+    """One browser tab polling the API until `stop` is set"""
+
+    def __init__(self, base_url, recorder, stop, ui_speed, pan_interval, seed):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop = stop
+        self.interval = 1 / ui_speed
+        self.pan_interval = pan_interval
+        self.rng = random.Random(seed)
+        self.ev_id = None
+        self.journey_cursor = None
+
+    def get(self, endpoint, path, body=None):
+        start = time.perf_counter()
+        status, data = call(self.base_url, path, body)
+        self.recorder.record(endpoint, time.perf_counter() - start, 200 <= status < 400)
+        return data
+
+    def load_ev_selector(self):
+        page = self.get('/api/evs', '/api/evs?fields=id,soc,status&limit=5000')
+        if page and page.get('evs') and self.ev_id is None:
+            self.ev_id = self.rng.choice(page['evs'])['id']
+
+    def refresh_map(self):
+        """A pan or zoom: clusters (or points when zoomed in) for a random view"""
+        zoom = self.rng.randint(10, 16)
+        span = CITY_RADIUS * 2 ** (12 - zoom)
+        lat = BANGALORE_CENTER[0] + self.rng.uniform(-CITY_RADIUS, CITY_RADIUS) / 2
+        lng = BANGALORE_CENTER[1] + self.rng.uniform(-CITY_RADIUS, CITY_RADIUS) / 2
+        bbox = f"{lat - span},{lng - span},{lat + span},{lng + span}"
+        self.get('/api/map/clusters', f"/api/map/clusters?zoom={zoom}&bbox={bbox}"
+                 "&fields=id,current_position,soc,status,assigned_station,waiting_time")
+
+    def update_journey(self):
+        since = '' if self.journey_cursor is None else self.journey_cursor
+        data = self.get('/api/ev/journey-log/<id>', f"/api/ev/journey-log/{self.ev_id}?since={since}&limit=500")
+        if data and 'next_cursor' in data:
+            self.journey_cursor = data['next_cursor']
+
+    def run(self):
+        # Page load (main.js whenServerReady, map.js loadMapData, journey.js)
+        self.get('/api/ready', '/api/ready')
+        self.get('/api/stations', '/api/stations')
+        self.refresh_map()
+        self.load_ev_selector()
+
+        updates = 0
+        next_update = time.perf_counter() + self.rng.uniform(0, self.interval)
+        next_pan = time.perf_counter() + self.rng.expovariate(1 / self.pan_interval)
+        while not self.stop.is_set():
+            now = time.perf_counter()
+            if now < next_update:
+                self.stop.wait(next_update - now)
+                continue
+            # setInterval keeps its schedule; updates missed while a request ran are skipped
+            next_update += self.interval * max(1, int((now - next_update) / self.interval) + 1)
+
+            self.get('/api/simulation/state', '/api/simulation/state')
+            updates += 1
+            if updates % CHARTS_EVERY == 0:
+                self.get('/api/metrics/history',
+                         '/api/metrics/history?metrics=average_wait_time,max_queue_length&points=120&method=minmax')
+            if self.ev_id is not None:
+                self.update_journey()
+            if updates % LOGS_EVERY == 0:
+                self.get('/api/optimization/logs', '/api/optimization/logs')
+            if updates % EV_SELECTOR_EVERY == 0:
+                self.load_ev_selector()
+            if now >= next_pan:
+                self.refresh_map()
+                next_pan = now + self.rng.expovariate(1 / self.pan_interval)
+
+def pacer_steps(base_url):
+    status, stats = call(base_url, '/api/simulation/speed')
+    if status != 200:
+        raise RuntimeError(f"/api/simulation/speed answered {status}")
+    return stats['steps']
+
+def run_level(base_url, num_clients, duration, ui_speed, pan_interval):
+    """Run `num_clients` dashboards for `duration` seconds; returns the report dict"""
+    recorder = Recorder()
+    stop = threading.Event()
+    clients = [DashboardClient(base_url, recorder, stop, ui_speed, pan_interval, seed=i) for i in range(num_clients)]
+    steps_before = pacer_steps(base_url)
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    stop.wait(duration)
+    stop.set()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    steps = pacer_steps(base_url) - steps_before
+
+    endpoints = recorder.report(elapsed)
+    requests = sum(row['requests'] for row in endpoints.values())
+    errors = sum(row['errors'] for row in endpoints.values())
+    return {
+        'clients': num_clients,
+        'seconds': elapsed,
+        'steps_per_second': steps / elapsed,
+        'requests': requests,
+        'rps': requests / elapsed,
+        'error_rate': errors / requests if requests else 0.0,
+        'endpoints': endpoints
+    }
+
+def print_level(result):
+    print(f"{result['clients']} clients: {result['steps_per_second']:.1f} steps/s, "
+          f"{result['rps']:.1f} req/s, error rate {result['error_rate'] * 100:.2f}%")
+    if result['endpoints']:
+        print(f"  {'endpoint':<28} {'reqs':>7} {'err%':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, row in result['endpoints'].items():
+        print(f"  {endpoint:<28} {row['requests']:>7} {row['error_rate'] * 100:>6.2f} "
+              f"{row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='EV Queue API load test')
+    parser.add_argument('--clients', type=int, nargs='+', default=[0, 1, 10, 50],
+                        help='Concurrent dashboards per run (0 measures the unloaded step rate)')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per run')
+    parser.add_argument('--url', help='Test an already running server instead of starting one')
+    parser.add_argument('--port', type=int, default=5056, help='Port for the started server')
+    parser.add_argument('--evs', type=int, default=1000, help='Fleet size of the started server')
+    parser.add_argument('--stations', type=int, default=50, help='Stations of the started server')
+    parser.add_argument('--sim-speed', type=float, default=1e6,
+                        help='Simulation speed to set (the default lets it step as fast as it can)')
+    parser.add_argument('--ui-speed', type=float, default=5, help='Dashboard state updates per second (main.js)')
+    parser.add_argument('--pan-interval', type=float, default=10, help='Mean seconds between map pans')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url.rstrip('/') if args.url else f"http://127.0.0.1:{args.port}"
+    if not args.url:
+        print(f"Starting server with {args.evs} EVs and {args.stations} stations...")
+        server = start_server(args.port, args.evs, args.stations)
+    try:
+        call(base_url, '/api/simulation/speed', {'speed': args.sim_speed})
+        call(base_url, '/api/simulation/start', {})
+        results = []
+        for num_clients in args.clients:
+            result = run_level(base_url, num_clients, args.duration, args.ui_speed, args.pan_interval)
+            print_level(result)
+            results.append(result)
+        call(base_url, '/api/simulation/stop', {})
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
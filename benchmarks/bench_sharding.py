@@ -0,0 +1,73 @@
+"""
+Sharded simulation benchmarks: step throughput of a single Simulation
+versus region-sharded worker processes
+
+Run from the repository root (no network needed, routes are built offline):
+
+    python benchmarks/bench_sharding.py [--evs 20000] [--steps 50] [--grids 2x2 4x4]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from models.road_graph import get_offline_router
+from models.sharding import RegionGrid, ShardedSimulation
+from models.simulation import Simulation
+from models.station import ChargingStation
+from utils.data_generator import (
+    BANGALORE_CENTER, CITY_RADIUS, compute_route_distances, generate_fleet,
+    generate_random_locations, generate_routes_parallel
+)
+
+def build_data(num_evs, num_stations, num_nodes, num_routes):
+    """Fresh EVs and stations over an offline route set"""
+    rng = np.random.default_rng(0)
+    nodes = generate_random_locations(num_nodes, rng)
+    routes = generate_routes_parallel(nodes, num_routes, router=get_offline_router(nodes), offline=True)
+    stations = [
+        ChargingStation(id=f"station-{i + 1}", location=location,
+                        num_chargers=int(rng.integers(2, 6)), charging_rate=float(rng.uniform(7, 22)))
+        for i, location in enumerate(generate_random_locations(num_stations, rng))
+    ]
+    fleet = generate_fleet(num_evs, len(routes), seed=1)
+    evs = fleet.materialize(routes, compute_route_distances(routes))
+    return evs, stations, routes
+
+def main():
+    parser = argparse.ArgumentParser(description='EV Queue sharded simulation benchmarks')
+    parser.add_argument('--evs', type=int, default=20000, help='Fleet size')
+    parser.add_argument('--stations', type=int, default=200, help='Number of stations')
+    parser.add_argument('--nodes', type=int, default=400, help='Number of nodes')
+    parser.add_argument('--routes', type=int, default=2000, help='Number of routes')
+    parser.add_argument('--steps', type=int, default=50, help='Steps to time')
+    parser.add_argument('--grids', nargs='+', default=['2x2', '4x4'], help='Region grids as ROWSxCOLS')
+    args = parser.parse_args()
+
+    evs, stations, routes = build_data(args.evs, args.stations, args.nodes, args.routes)
+    print(f"{len(evs)} EVs, {len(stations)} stations, {os.cpu_count()} CPUs")
+
+    simulation = Simulation(evs, stations, routes)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        simulation.step()
+    baseline = args.steps / (time.perf_counter() - start)
+    print(f"  {'single process':<20} {baseline:10.2f} steps/sec")
+
+    for spec in args.grids:
+        rows, cols = (int(value) for value in spec.lower().split('x'))
+        evs, stations, routes = build_data(args.evs, args.stations, args.nodes, args.routes)
+        grid = RegionGrid(BANGALORE_CENTER, CITY_RADIUS, rows, cols)
+        with ShardedSimulation(evs, stations, routes, grid) as sharded:
+            start = time.perf_counter()
+            sharded.run(args.steps)
+            rate = args.steps / (time.perf_counter() - start)
+            handoffs = sharded.handoffs
+        print(f"  {spec + ' regions':<20} {rate:10.2f} steps/sec  "
+              f"({rate / baseline:.2f}x, {handoffs} handoffs)")
+
+if __name__ == '__main__':
+    main()
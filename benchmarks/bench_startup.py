@@ -0,0 +1,94 @@
+"""
+Startup benchmarks: module import time and server time-to-ready
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--runs 5] [--port 5055]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGETS = ['models.maps_service', 'utils.data_generator', 'app']
+
+def measure_import(module, runs):
+    """Median wall time (seconds) to import a module in a fresh interpreter"""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - t)"
+    )
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()
+        samples.append(float(output[-1]))
+    return statistics.median(samples)
+
+def measure_server_startup(port, timeout=300):
+    """
+    Start the server and time first HTTP response and data readiness
+
+    Returns:
+        tuple: (seconds until /api/ready answers, seconds until it reports ready)
+    """
+    code = (
+        "import app; app.start_background_load(); "
+        f"app.app.run(host='127.0.0.1', port={port}, debug=False)"
+    )
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-c', code], cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first_response = None
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=1) as response:
+                    body = json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                body = json.loads(e.read())
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+                continue
+            if first_response is None:
+                first_response = time.perf_counter() - start
+            if body.get('ready'):
+                return first_response, time.perf_counter() - start
+            time.sleep(0.01)
+        raise TimeoutError(f"Server not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='EV Queue startup benchmarks')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per measurement')
+    parser.add_argument('--port', type=int, default=5055, help='Port for the test server')
+    args = parser.parse_args()
+
+    print("Import time (median of {} runs):".format(args.runs))
+    for module in IMPORT_TARGETS:
+        print(f"  {module:<24} {measure_import(module, args.runs) * 1000:8.1f} ms")
+
+    first, ready = [], []
+    for _ in range(args.runs):
+        first_response, data_ready = measure_server_startup(args.port)
+        first.append(first_response)
+        ready.append(data_ready)
+    print("Server startup (median of {} runs):".format(args.runs))
+    print(f"  {'first response':<24} {statistics.median(first) * 1000:8.1f} ms")
+    print(f"  {'data ready':<24} {statistics.median(ready) * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Transport benchmarks: payload size and encode time of the simulation state
+as jsonify output versus MessagePack and the packed columnar layout, with
+and without gzip
+
+Run from the repository root (no network needed, routes are built offline):
+
+    python benchmarks/bench_transport.py [--evs 1000 10000] [--repeat 5]
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from models.simulation import Simulation
+from utils import transport
+from benchmarks.bench_sharding import build_data
+
+def timed(encode, repeat):
+    """(best time in seconds, payload) over `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = encode()
+        best = min(best, time.perf_counter() - start)
+    return best, payload
+
+def main():
+    parser = argparse.ArgumentParser(description='EV Queue transport benchmarks')
+    parser.add_argument('--evs', type=int, nargs='+', default=[1000, 10000], help='Fleet sizes')
+    parser.add_argument('--steps', type=int, default=20, help='Steps to run before encoding')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per encoder (best is reported)')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    for num_evs in args.evs:
+        evs, stations, routes = build_data(num_evs, max(num_evs // 100, 10), 400, 2000)
+        simulation = Simulation(evs, stations, routes, async_optimization=False)
+        for _ in range(args.steps):
+            simulation.step()
+        simulation._record_state()
+        state = simulation.get_current_state()
+
+        encoders = [
+            ('jsonify', lambda: jsonify(state).get_data()),
+            ('columnar', lambda: transport.state_columnar(simulation.current_step, simulation.metrics,
+                                                          simulation.evs, simulation.stations))
+        ]
+        if transport.msgpack is not None:
+            encoders.insert(1, ('msgpack', lambda: transport.pack_msgpack(state)))
+
+        print(f"{num_evs} EVs, {len(stations)} stations")
+        with app.app_context():
+            baseline = None
+            for name, encode in encoders:
+                seconds, payload = timed(encode, args.repeat)
+                gzip_seconds, compressed = timed(lambda: gzip.compress(payload, compresslevel=6), args.repeat)
+                if baseline is None:
+                    baseline = (seconds, len(payload))
+                print(f"  {name:<10} {len(payload) / 1024:10.1f} KiB {seconds * 1000:8.2f} ms  "
+                      f"({len(payload) / baseline[1]:.3f}x size, {seconds / baseline[0]:.3f}x time)  "
+                      f"gzip: {len(compressed) / 1024:8.1f} KiB +{gzip_seconds * 1000:.2f} ms")
+        if transport.msgpack is None:
+            print("  (msgpack not installed; pip install msgpack to include it)")
+
+if __name__ == '__main__':
+    main()
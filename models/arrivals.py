@@ -0,0 +1,133 @@
+import numpy as np
+from models.ev import EV
+from models.fleet import FleetArrays
+
+# Trips started per hour of the day (index 0 = midnight), with morning and evening peaks
+DEFAULT_HOURLY_RATES = [
+    20, 10, 8, 8, 15, 40, 120, 300, 400, 300, 200, 180,
+    200, 190, 180, 200, 280, 400, 380, 250, 150, 100, 60, 40
+]
+
+class EVPool:
+    """Free list of retired EV objects, reused for new trips"""
+
+    def __init__(self, max_size=100000):
+        self.free = []
+        self.max_size = max_size
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, **trip):
+        """Get an EV set up for a new trip, reusing a retired one if available"""
+        if self.free:
+            ev = self.free.pop()
+            ev.reinitialize(**trip)
+            self.reused += 1
+            return ev
+        self.created += 1
+        return EV(**trip)
+
+    def release(self, ev):
+        """Return a finished EV to the pool"""
+        ev.assigned_station = None
+        if len(self.free) < self.max_size:
+            self.free.append(ev)
+
+class ArrivalProcess:
+    """
+    Time-of-day arrival process for a rolling fleet
+
+    New trips arrive as a Poisson process whose rate is interpolated
+    from `hourly_rates` (trips per hour). Each trip drives a random
+    route with vectorized random EV parameters, and EV objects come from
+    an EVPool.
+    """
+
+    def __init__(self, routes, route_distances=None, hourly_rates=None, start_hour=0.0,
+                 rate_scale=1.0, seed=None):
+        self.routes = routes
+        self.route_distances = route_distances.tolist() if hasattr(route_distances, 'tolist') else route_distances
+        if hourly_rates is None:
+            hourly_rates = DEFAULT_HOURLY_RATES
+        self.hourly_rates = np.asarray(hourly_rates, dtype=np.float64) * rate_scale
+        self.start_hour = start_hour
+        self.rng = np.random.default_rng(seed)
+        self.pool = EVPool()
+        self.trips_started = 0
+
+    def get_state(self):
+        """Counters and rate profile for checkpoints (the generator is saved separately)"""
+        return {
+            'num_routes': len(self.routes),
+            'route_distances': self.route_distances,
+            'hourly_rates': self.hourly_rates.tolist(),
+            'start_hour': self.start_hour,
+            'trips_started': self.trips_started,
+            'pool_created': self.pool.created,
+            'pool_reused': self.pool.reused
+        }
+
+    @classmethod
+    def from_state(cls, routes, state):
+        """Rebuild an arrival process saved with get_state over the first `num_routes` routes"""
+        arrivals = cls(
+            routes[:state['num_routes']],
+            route_distances=state['route_distances'],
+            hourly_rates=state['hourly_rates'],
+            start_hour=state['start_hour']
+        )
+        arrivals.trips_started = state['trips_started']
+        arrivals.pool.created = state['pool_created']
+        arrivals.pool.reused = state['pool_reused']
+        return arrivals
+
+    def rate_at(self, sim_seconds):
+        """Arrival rate (trips/hour) at a simulated time since the start"""
+        hour = (self.start_hour + sim_seconds / 3600) % 24
+        lower = int(hour)
+        upper = (lower + 1) % 24
+        fraction = hour - lower
+        return float(self.hourly_rates[lower] * (1 - fraction) + self.hourly_rates[upper] * fraction)
+
+    def spawn(self, sim_seconds, time_step_seconds, clock):
+        """Draw this step's arrivals and return their EVs"""
+        expected = self.rate_at(sim_seconds) * time_step_seconds / 3600
+        count = int(self.rng.poisson(expected))
+        if count == 0 or not len(self.routes):
+            return []
+
+        fleet = FleetArrays.generate(count, len(self.routes), self.rng)
+        route_index = fleet.route_index.tolist()
+        battery_capacity = fleet.battery_capacity.tolist()
+        initial_soc = fleet.initial_soc.tolist()
+        consumption_rate = fleet.consumption_rate.tolist()
+
+        evs = []
+        for i, r in enumerate(route_index):
+            route = self.routes[r]
+            self.trips_started += 1
+            evs.append(self.pool.acquire(
+                id=f"trip-{self.trips_started}",
+                origin=route["origin"],
+                destination=route["destination"],
+                battery_capacity=battery_capacity[i],
+                initial_soc=initial_soc[i],
+                consumption_rate=consumption_rate[i],
+                route=route["points"],
+                route_distance=self.route_distances[r] if self.route_distances is not None else None,
+                clock=clock
+            ))
+        return evs
+
+    def release(self, ev):
+        """Retire a finished EV into the pool"""
+        self.pool.release(ev)
+
+    def stats(self):
+        """Arrival and pool counters"""
+        return {
+            'trips_started': self.trips_started,
+            'pool_free': len(self.pool.free),
+            'pool_created': self.pool.created,
+            'pool_reused': self.pool.reused
+        }
@@ -0,0 +1,343 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from models.ev import EV
+from models.station import ChargingStation
+from models.quantiles import DurationSketches
+
+# Bump when the checkpoint layout changes
+CHECKPOINT_VERSION = 5
+
+# Numeric EV columns stored in the `ev_numeric` array, in order
+EV_NUMERIC_FIELDS = (
+    'battery_capacity', 'initial_soc', 'soc', 'consumption_rate',
+    'route_index', 'waiting_time', 'target_soc'
+)
+
+# Boolean EV columns stored in the `ev_flags` array, in order
+EV_FLAG_FIELDS = ('charging', 'in_queue', 'trip_completed', 'abandoned')
+
+# EV timestamps (step numbers or None) stored in the JSON part
+EV_TIME_FIELDS = ('queue_arrival_time', 'charging_start_time', 'trip_start_time', 'trip_end_time')
+
+def _route_dicts(simulation):
+    """Map id(points list) -> route dict for routes that are already materialized"""
+    routes = simulation.routes
+    candidates = getattr(routes, '_materialized', None)
+    candidates = candidates.values() if candidates is not None else routes
+    return {id(route["points"]): route for route in candidates}
+
+def capture_state(simulation):
+    """
+    Snapshot the state of a simulation
+
+    Must be called while the simulation is not stepping. Only mutable
+    containers are copied; journey log entries and route point lists are
+    never modified after creation, so they are shared with the live run
+    (copy-on-write by convention) and the snapshot stays cheap.
+    """
+    route_dicts = _route_dicts(simulation)
+    routes = []
+    route_index_by_id = {}
+    ev_routes = []
+    arrivals = simulation.arrivals.get_state() if simulation.rolling else None
+    if arrivals is not None:
+        # Arrivals draw from the whole route table, so it goes first and in order
+        for route in simulation.arrivals.routes:
+            route_index_by_id.setdefault(id(route["points"]), len(routes))
+            routes.append(route)
+    for ev in simulation.evs:
+        key = id(ev.route)
+        if key not in route_index_by_id:
+            route_index_by_id[key] = len(routes)
+            route = route_dicts.get(key) or {
+                "id": f"route-ev-{ev.id}",
+                "origin": ev.origin,
+                "destination": ev.destination,
+                "points": ev.route,
+                "distance": ev.calculate_total_route_distance()
+            }
+            routes.append(route)
+        ev_routes.append(route_index_by_id[key])
+
+    return {
+        'version': CHECKPOINT_VERSION,
+        'created_at': time.time(),
+        'routes': routes,
+        'ev_routes': ev_routes,
+        'evs': [
+            {
+                'id': ev.id,
+                'origin': ev.origin,
+                'destination': ev.destination,
+                'current_position': ev.current_position,
+                'assigned_station': ev.assigned_station.id if ev.assigned_station else None,
+                'numeric': [getattr(ev, field) for field in EV_NUMERIC_FIELDS],
+                'flags': [getattr(ev, field) for field in EV_FLAG_FIELDS],
+                'times': [getattr(ev, field) for field in EV_TIME_FIELDS],
+                'journey_log': list(ev.journey_log)
+            }
+            for ev in simulation.evs
+        ],
+        'stations': [
+            {
+                'id': station.id,
+                'location': station.location,
+                'num_chargers': station.num_chargers,
+                'charging_rate': station.charging_rate,
+                'charging_evs': [ev.id for ev in station.charging_evs],
+                'queue': [ev.id for ev in station.queue],
+                'total_served': station.total_served,
+                'total_wait_time': station.total_wait_time,
+                'max_queue_length': station.max_queue_length,
+                'durations': station.durations.to_state()
+            }
+            for station in simulation.stations
+        ],
+        'simulation': {
+            'time_step': simulation.time_step,
+            'current_step': simulation.current_step,
+            'last_optimization_step': simulation.last_optimization_step,
+            'last_optimization_error': simulation.last_optimization_error,
+            'metrics': {
+                **simulation.metrics,
+                'station_utilization': dict(simulation.metrics['station_utilization'])
+            },
+            'stalled_positions': {
+                ev_id: dict(entry) for ev_id, entry in simulation.stalled_positions.items()
+            },
+            'trips_total': simulation.trips_total,
+            'completed_total': simulation.completed_total,
+            'abandoned_total': simulation.abandoned_total,
+            'arrivals': arrivals
+        },
+        # Generators owned by the simulation (global random state is not used while stepping)
+        'rng': {
+            name: generator.bit_generator.state
+            for name, generator in simulation.generators().items()
+        }
+    }
+
+def write_checkpoint(state, path):
+    """
+    Encode a captured state and write it atomically to `path`
+
+    The file is a compressed .npz: EV numeric and flag columns and route
+    points are packed arrays, everything else is a JSON document. It can
+    be loaded without unpickling anything.
+    """
+    routes = state['routes']
+    counts = [len(route["points"]) for route in routes]
+    offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    route_points = np.empty((int(offsets[-1]), 2), dtype=np.float64)
+    for i, route in enumerate(routes):
+        route_points[offsets[i]:offsets[i + 1]] = route["points"]
+
+    simulation = dict(state['simulation'])
+    arrival_route_distances = np.zeros(0, dtype=np.float64)
+    if simulation['arrivals'] is not None:
+        arrivals = dict(simulation['arrivals'])
+        if arrivals['route_distances'] is not None:
+            arrival_route_distances = np.asarray(arrivals['route_distances'], dtype=np.float64)
+        arrivals['route_distances'] = None
+        simulation['arrivals'] = arrivals
+    
+    evs = state['evs']
+    ev_numeric = np.array([ev['numeric'] for ev in evs], dtype=np.float64).reshape(-1, len(EV_NUMERIC_FIELDS))
+    ev_flags = np.array([ev['flags'] for ev in evs], dtype=bool).reshape(-1, len(EV_FLAG_FIELDS))
+    ev_positions = np.array(
+        [(*ev['origin'], *ev['destination'], *ev['current_position']) for ev in evs],
+        dtype=np.float64
+    ).reshape(-1, 6)
+
+    document = {
+        'version': state['version'],
+        'created_at': state['created_at'],
+        'routes': [
+            {key: route[key] for key in ("id", "origin", "destination", "distance")}
+            for route in routes
+        ],
+        'evs': [
+            {
+                'id': ev['id'],
+                'assigned_station': ev['assigned_station'],
+                'times': ev['times'],
+                'journey_log': ev['journey_log']
+            }
+            for ev in evs
+        ],
+        'stations': state['stations'],
+        'simulation': simulation,
+        'rng': state['rng']
+    }
+    document_bytes = np.frombuffer(json.dumps(document, default=str).encode(), dtype=np.uint8)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            route_points=route_points,
+            route_offsets=offsets,
+            ev_routes=np.array(state['ev_routes'], dtype=np.int64),
+            ev_numeric=ev_numeric,
+            ev_flags=ev_flags,
+            ev_positions=ev_positions,
+            arrival_route_distances=arrival_route_distances,
+            document=document_bytes
+        )
+    os.replace(tmp_path, path)
+    return path
+
+def read_checkpoint(path):
+    """Load a checkpoint file and rebuild EVs, stations and routes (see restore_state)"""
+    with np.load(path, allow_pickle=False) as data:
+        document = json.loads(data['document'].tobytes().decode())
+        if document.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {document.get('version')}")
+        route_points = data['route_points']
+        offsets = data['route_offsets']
+        ev_routes = data['ev_routes']
+        ev_numeric = data['ev_numeric']
+        ev_flags = data['ev_flags']
+        ev_positions = data['ev_positions']
+        arrival_route_distances = data['arrival_route_distances']
+
+    routes = []
+    for i, meta in enumerate(document['routes']):
+        routes.append({
+            "id": meta["id"],
+            "origin": tuple(meta["origin"]),
+            "destination": tuple(meta["destination"]),
+            "points": [tuple(point) for point in route_points[offsets[i]:offsets[i + 1]].tolist()],
+            "distance": meta["distance"]
+        })
+
+    # Back into the shape capture_state produces
+    evs = []
+    for entry, numeric, flags, positions in zip(document['evs'], ev_numeric.tolist(),
+                                                ev_flags.tolist(), ev_positions.tolist()):
+        evs.append(dict(
+            entry,
+            origin=positions[0:2],
+            destination=positions[2:4],
+            current_position=positions[4:6],
+            numeric=numeric,
+            flags=flags
+        ))
+
+    simulation = document['simulation']
+    if simulation['arrivals'] is not None and len(arrival_route_distances):
+        simulation['arrivals']['route_distances'] = arrival_route_distances.tolist()
+    return restore_state({
+        'routes': routes,
+        'ev_routes': ev_routes.tolist(),
+        'evs': evs,
+        'stations': document['stations'],
+        'simulation': simulation,
+        'rng': document['rng']
+    })
+
+def restore_state(state):
+    """
+    Rebuild EVs, stations and routes from a captured (or loaded) state
+
+    Route point lists and journey log entries are shared with the state,
+    so restoring a capture_state snapshot in memory is cheap.
+
+    Returns:
+        tuple: (evs, stations, routes, simulation state, generator states)
+    """
+    routes = state['routes']
+    stations = [
+        ChargingStation(
+            id=entry['id'],
+            location=tuple(entry['location']),
+            num_chargers=entry['num_chargers'],
+            charging_rate=entry['charging_rate']
+        )
+        for entry in state['stations']
+    ]
+    stations_by_id = {station.id: station for station in stations}
+
+    evs = []
+    for entry, route_index in zip(state['evs'], state['ev_routes']):
+        numeric = dict(zip(EV_NUMERIC_FIELDS, entry['numeric']))
+        route = routes[int(route_index)]
+        ev = EV(
+            id=entry['id'],
+            origin=tuple(entry['origin']),
+            destination=tuple(entry['destination']),
+            battery_capacity=numeric['battery_capacity'],
+            initial_soc=numeric['initial_soc'],
+            consumption_rate=numeric['consumption_rate'],
+            route=route["points"],
+            route_distance=route["distance"]
+        )
+        ev.soc = numeric['soc']
+        ev.route_index = int(numeric['route_index'])
+        ev.waiting_time = numeric['waiting_time']
+        ev.target_soc = numeric['target_soc']
+        ev.current_position = tuple(entry['current_position'])
+        for field, value in zip(EV_FLAG_FIELDS, entry['flags']):
+            setattr(ev, field, bool(value))
+        for field, value in zip(EV_TIME_FIELDS, entry['times']):
+            setattr(ev, field, value)
+        ev.assigned_station = stations_by_id.get(entry['assigned_station'])
+        ev.journey_log = list(entry['journey_log'])
+        ev.journey_seq = ev.journey_log[-1]['seq'] + 1 if ev.journey_log else 0
+        evs.append(ev)
+    evs_by_id = {ev.id: ev for ev in evs}
+
+    for station, entry in zip(stations, state['stations']):
+        station.charging_evs = [evs_by_id[ev_id] for ev_id in entry['charging_evs']]
+        station.queue.extend(evs_by_id[ev_id] for ev_id in entry['queue'])
+        station.total_served = entry['total_served']
+        station.total_wait_time = entry['total_wait_time']
+        station.max_queue_length = entry['max_queue_length']
+        station.durations = DurationSketches.from_state(entry['durations'])
+
+    return evs, stations, routes, state['simulation'], state['rng']
+
+class CheckpointWriter:
+    """Writes captured simulation states on a background thread, one at a time"""
+
+    def __init__(self):
+        self._thread = None
+        self.last_result = None
+
+    def busy(self):
+        """Whether a checkpoint is still being written"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, state, path, capture_time=0.0):
+        """Write a captured state in the background; returns False if a write is in progress"""
+        if self.busy():
+            return False
+        self._thread = threading.Thread(target=self._write, args=(state, path, capture_time))
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def wait(self, timeout=None):
+        """Block until the current write (if any) finishes"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _write(self, state, path, capture_time):
+        start_time = time.time()
+        try:
+            write_checkpoint(state, path)
+            self.last_result = {
+                'path': path,
+                'step': state['simulation']['current_step'],
+                'capture_time': capture_time,
+                'write_time': time.time() - start_time,
+                'size_bytes': os.path.getsize(path),
+                'error': None
+            }
+        except Exception as e:
+            print(f"Error writing checkpoint: {e}")
+            self.last_result = {'path': path, 'error': str(e)}
@@ -0,0 +1,21 @@
+import config
+
+class SimulationClock:
+    """
+    Simulation time, shared by reference between a simulation and its EVs
+
+    Timestamps elsewhere are step numbers; `time_step` converts them to
+    simulated seconds.
+    """
+    __slots__ = ('step', 'time_step')
+
+    def __init__(self, step=0, time_step=None):
+        self.step = step
+        self.time_step = config.TIME_STEP_SECONDS if time_step is None else time_step
+
+    def seconds_since(self, step):
+        """Simulated seconds elapsed since the given step"""
+        return (self.step - step) * self.time_step
+
+# Clock used by EVs until a simulation adopts them
+DEFAULT_CLOCK = SimulationClock()
@@ -0,0 +1,121 @@
+import numpy as np
+
+# Cell (row, col) pairs are packed as (row + offset) * base + (col + offset)
+_KEY_OFFSET = 2 ** 30
+_KEY_BASE = 2 ** 31
+
+# EV state columns counted per cluster, in order
+EV_STATES = ('moving', 'queued', 'charging', 'abandoned', 'completed')
+
+class ClusterIndex:
+    """
+    Hierarchical grid clusters of EVs and stations for the map
+
+    The finest level has cells of about `cell_pixels` screen pixels at
+    `max_zoom`; each zoom level below merges 2x2 cells of the level above,
+    so only the finest level is aggregated from the points and the others
+    from cell sums. Levels are rebuilt at most once per simulation step.
+
+    Each rebuild is a full one rather than applying per-EV cell deltas:
+    every moving EV changes its cluster's position and SoC sums every
+    step, so deltas would touch nearly every EV anyway and accumulate
+    rounding error in the sums. The rebuild is one pass to read EV state
+    followed by vectorised NumPy aggregation, and it only runs on steps
+    where the map is actually queried.
+    """
+
+    def __init__(self, min_zoom=3, max_zoom=16, cell_pixels=64):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        # Degrees per cell at max_zoom (256-pixel Web Mercator tiles, longitude scale)
+        self.cell_size = 360.0 * cell_pixels / (256 * 2 ** max_zoom)
+        self.key = None
+        self.ev_levels = {}
+        self.station_levels = {}
+
+    def update(self, evs, stations, key):
+        """Rebuild every level from scratch unless they were already built for `key` (e.g. the step)"""
+        if key == self.key:
+            return
+        state_index = {state: i for i, state in enumerate(EV_STATES)}
+        # Columns: lat, lng, soc, then one count column per state
+        ev_columns = np.zeros((len(evs), 3 + len(EV_STATES)))
+        if len(evs):
+            ev_columns[:, :2] = [ev.current_position for ev in evs]
+            ev_columns[:, 2] = [ev.soc for ev in evs]
+            states = np.fromiter((state_index[ev.status] for ev in evs), dtype=np.int64, count=len(evs))
+            ev_columns[np.arange(len(evs)), 3 + states] = 1
+        # Columns: lat, lng, count, chargers, charging, queued
+        station_columns = np.array([
+            (station.location[0], station.location[1], 1, station.num_chargers,
+             len(station.charging_evs), len(station.queue))
+            for station in stations
+        ], dtype=np.float64).reshape(-1, 6)
+
+        self.ev_levels = self._build_levels(ev_columns)
+        self.station_levels = self._build_levels(station_columns)
+        self.key = key
+
+    def _build_levels(self, columns):
+        rows = np.floor(columns[:, 0] / self.cell_size).astype(np.int64)
+        cols = np.floor(columns[:, 1] / self.cell_size).astype(np.int64)
+        level = _aggregate(rows, cols, columns)
+        levels = {self.max_zoom: level}
+        for zoom in range(self.max_zoom - 1, self.min_zoom - 1, -1):
+            rows, cols, sums = level
+            level = _aggregate(rows // 2, cols // 2, sums)
+            levels[zoom] = level
+        return levels
+
+    def _level(self, levels, zoom, bbox):
+        """Column sums of the cells at a zoom level that overlap the bounding box"""
+        zoom = min(max(int(zoom), self.min_zoom), self.max_zoom)
+        rows, cols, sums = levels[zoom]
+        if bbox is not None and len(rows):
+            size = self.cell_size * 2 ** (self.max_zoom - zoom)
+            south, west, north, east = bbox
+            visible = ((rows + 1) * size >= south) & (rows * size <= north) & \
+                      ((cols + 1) * size >= west) & (cols * size <= east)
+            sums = sums[visible]
+        return sums
+
+    def ev_clusters(self, zoom, bbox=None):
+        """EV clusters with centroid, counts by state and average SoC"""
+        clusters = []
+        for row in self._level(self.ev_levels, zoom, bbox).tolist():
+            count = sum(row[3:])
+            clusters.append({
+                'lat': row[0] / count,
+                'lng': row[1] / count,
+                'count': int(count),
+                'states': {state: int(row[3 + i]) for i, state in enumerate(EV_STATES)},
+                'average_soc': row[2] / count
+            })
+        return clusters
+
+    def station_clusters(self, zoom, bbox=None):
+        """Station clusters with centroid, charger totals and current load"""
+        return [
+            {
+                'lat': row[0] / row[2],
+                'lng': row[1] / row[2],
+                'count': int(row[2]),
+                'chargers': int(row[3]),
+                'charging': int(row[4]),
+                'queue_length': int(row[5])
+            }
+            for row in self._level(self.station_levels, zoom, bbox).tolist()
+        ]
+
+def _aggregate(rows, cols, columns):
+    """Sum `columns` per (row, col) cell; returns (cell rows, cell cols, sums)"""
+    if not len(rows):
+        return rows, cols, np.zeros((0, columns.shape[1]))
+    # One int64 key per cell; a 1-D unique is much faster than unique rows
+    keys, inverse = np.unique((rows + _KEY_OFFSET) * _KEY_BASE + (cols + _KEY_OFFSET), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = np.stack([
+        np.bincount(inverse, weights=columns[:, j], minlength=len(keys))
+        for j in range(columns.shape[1])
+    ], axis=1)
+    return keys // _KEY_BASE - _KEY_OFFSET, keys % _KEY_BASE - _KEY_OFFSET, sums
@@ -0,0 +1,79 @@
+import math
+import numpy as np
+import config
+
+# Mean Earth radius in meters; every function here returns meters
+EARTH_RADIUS = 6371000
+
+HAVERSINE = 'haversine'
+EQUIRECTANGULAR = 'equirectangular'
+MODES = (HAVERSINE, EQUIRECTANGULAR)
+
+# Accuracy mode used when callers don't pass one
+DEFAULT_MODE = getattr(config, 'DISTANCE_MODE', HAVERSINE)
+
+def _check_mode(mode):
+    mode = mode or DEFAULT_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown distance mode '{mode}', expected one of {MODES}")
+    return mode
+
+def prepare_points(points):
+    """
+    Convert (lat, lng) points to an (N, 3) array of lat and lng in radians plus cos(lat)
+
+    Prepared arrays can be passed to any batch function in place of raw
+    points, so callers that reuse the same points (e.g. a fixed route)
+    pay for the trigonometry once.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim == 2 and points.shape[1] == 3:
+        return points
+    coords = np.radians(points.reshape(-1, 2))
+    return np.column_stack((coords, np.cos(coords[:, 0])))
+
+def _kernel(a, b, mode):
+    """Distances between broadcastable prepared-point arrays"""
+    dlat = b[..., 0] - a[..., 0]
+    dlng = b[..., 1] - a[..., 1]
+    if mode == EQUIRECTANGULAR:
+        x = dlng * (a[..., 2] + b[..., 2]) / 2
+        return EARTH_RADIUS * np.sqrt(x * x + dlat * dlat)
+    h = np.sin(dlat / 2) ** 2 + a[..., 2] * b[..., 2] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+def one_to_many(origin, points, mode=None):
+    """Distances (meters) from one (lat, lng) point to each of `points`"""
+    mode = _check_mode(mode)
+    return _kernel(prepare_points([origin])[0], prepare_points(points), mode)
+
+def many_to_many(points_a, points_b, mode=None):
+    """Distance matrix (meters) of shape (len(points_a), len(points_b))"""
+    mode = _check_mode(mode)
+    a = prepare_points(points_a)
+    b = prepare_points(points_b)
+    return _kernel(a[:, None, :], b[None, :, :], mode)
+
+def paired(points_a, points_b, mode=None):
+    """Element-wise distances (meters) between points_a[i] and points_b[i]"""
+    mode = _check_mode(mode)
+    return _kernel(prepare_points(points_a), prepare_points(points_b), mode)
+
+def segment_lengths(points, mode=None):
+    """Lengths (meters) of consecutive segments along a polyline"""
+    prepared = prepare_points(points)
+    if len(prepared) < 2:
+        return np.zeros(0)
+    return _kernel(prepared[:-1], prepared[1:], _check_mode(mode))
+
+def distance(p1, p2, mode=None):
+    """Distance (meters) between two (lat, lng) points without NumPy overhead"""
+    mode = _check_mode(mode)
+    lat1, lng1 = math.radians(p1[0]), math.radians(p1[1])
+    lat2, lng2 = math.radians(p2[0]), math.radians(p2[1])
+    if mode == EQUIRECTANGULAR:
+        x = (lng2 - lng1) * (math.cos(lat1) + math.cos(lat2)) / 2
+        return EARTH_RADIUS * math.hypot(x, lat2 - lat1)
+    h = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(h, 1.0)))
@@ -0,0 +1,161 @@
+import os
+import numpy as np
+from models.distance import distance, many_to_many, one_to_many, prepare_points, segment_lengths
+
+class DistanceMatrix:
+    """
+    Precomputed distances between the fixed points of a simulation
+
+    Holds a node x node and a node x station matrix (meters). Distances
+    between known points are index lookups; anything else falls back to
+    the distance kernel.
+    """
+
+    def __init__(self, nodes, station_locations, node_node, node_station):
+        self.nodes = [tuple(node) for node in nodes]
+        self.station_locations = [tuple(location) for location in station_locations]
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.station_index = {location: j for j, location in enumerate(self.station_locations)}
+        self.node_node = node_node
+        self.node_station = node_station
+
+    @classmethod
+    def build(cls, nodes, station_locations, cache_file=None, station_cache_file=None):
+        """
+        Build the matrices, reusing memory-mapped copies when valid
+
+        Args:
+            nodes: List of (lat, lng) nodes
+            station_locations: List of (lat, lng) station locations
+            cache_file: Path of the persisted node x node matrix, or None to skip persistence
+            station_cache_file: Path of the persisted node x station matrix, or None to skip persistence
+        """
+        node_node = None
+        if cache_file:
+            node_node = load_node_matrix(cache_file, nodes)
+        if node_node is None:
+            node_node = many_to_many(nodes, nodes)
+            if cache_file:
+                node_node = save_matrix(cache_file, node_node)
+
+        node_station = None
+        if station_cache_file:
+            node_station = load_station_matrix(station_cache_file, nodes, station_locations)
+        if node_station is None:
+            # Stations sit on nodes, so their columns are usually already computed
+            node_index = {tuple(node): i for i, node in enumerate(nodes)}
+            node_station = np.empty((len(nodes), len(station_locations)), dtype=np.float64)
+            for j, location in enumerate(station_locations):
+                i = node_index.get(tuple(location))
+                if i is not None:
+                    node_station[:, j] = node_node[:, i]
+                else:
+                    node_station[:, j] = one_to_many(location, nodes)
+            if station_cache_file:
+                node_station = save_matrix(station_cache_file, node_station)
+
+        return cls(nodes, station_locations, node_node, node_station)
+
+    def distance(self, p1, p2):
+        """Distance in meters between two (lat, lng) points"""
+        i = self.node_index.get(p1)
+        if i is not None:
+            k = self.node_index.get(p2)
+            if k is not None:
+                return float(self.node_node[i, k])
+            j = self.station_index.get(p2)
+            if j is not None:
+                return float(self.node_station[i, j])
+        else:
+            j = self.station_index.get(p1)
+            if j is not None:
+                k = self.node_index.get(p2)
+                if k is not None:
+                    return float(self.node_station[k, j])
+        return distance(p1, p2)
+
+    def station_columns(self, station_locations):
+        """Matrix columns of the given station locations, or None if any is unknown"""
+        columns = [self.station_index.get(tuple(location)) for location in station_locations]
+        if None in columns:
+            return None
+        return np.array(columns, dtype=np.int64)
+
+    def distances_to_stations(self, point, columns=None):
+        """
+        Distances in meters from a point to every station, in station order
+
+        With `columns` (from station_columns) only those stations are
+        returned, in that order. Points that are not nodes fall back to
+        the distance kernel.
+        """
+        i = self.node_index.get(tuple(point))
+        if i is not None:
+            row = self.node_station[i]
+            return row if columns is None else row[columns]
+        locations = self.station_locations if columns is None else [self.station_locations[j] for j in columns]
+        return one_to_many(point, locations)
+
+    def segment_lengths(self, points):
+        """Lengths in meters of consecutive polyline segments, looked up when every point is a node"""
+        indices = [self.node_index.get(tuple(point)) for point in points]
+        if len(indices) >= 2 and None not in indices:
+            indices = np.array(indices, dtype=np.int64)
+            return np.asarray(self.node_node[indices[:-1], indices[1:]], dtype=np.float64)
+        return segment_lengths(prepare_points(points))
+
+def save_matrix(cache_file, matrix):
+    """Persist a distance matrix and reopen it memory-mapped"""
+    try:
+        np.save(cache_file, matrix.astype(np.float64, copy=False))
+        return np.load(cache_file, mmap_mode='r')
+    except Exception as e:
+        print(f"Error saving distance matrix: {e}")
+        return matrix
+
+def _open_matrix(cache_file, shape):
+    """Open a persisted matrix memory-mapped if it exists and has the expected shape"""
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        matrix = np.load(cache_file, mmap_mode='r')
+    except Exception as e:
+        print(f"Error loading distance matrix: {e}")
+        return None
+    return matrix if matrix.shape == shape else None
+
+def load_node_matrix(cache_file, nodes):
+    """Open the persisted node x node matrix if it matches the given nodes"""
+    n = len(nodes)
+    matrix = _open_matrix(cache_file, (n, n))
+    if matrix is None:
+        return None
+    # Spot-check a row to catch a matrix for other nodes or another distance mode
+    if n > 1 and not np.allclose(matrix[n - 1], one_to_many(nodes[n - 1], nodes)):
+        return None
+    print(f"Loaded {n}x{n} distance matrix")
+    return matrix
+
+def load_station_matrix(cache_file, nodes, station_locations):
+    """Open the persisted node x station matrix if it matches the given nodes and stations"""
+    n, s = len(nodes), len(station_locations)
+    matrix = _open_matrix(cache_file, (n, s))
+    if matrix is None:
+        return None
+    # Spot-check the last station's column
+    if n and s and not np.allclose(matrix[:, s - 1], one_to_many(station_locations[s - 1], nodes)):
+        return None
+    print(f"Loaded {n}x{s} node-station distance matrix")
+    return matrix
+
+# Matrix for the currently generated data, consulted by calculate_distance
+_active_matrix = None
+
+def set_active_matrix(matrix):
+    """Make a distance matrix the one used for point-to-point lookups"""
+    global _active_matrix
+    _active_matrix = matrix
+
+def get_active_matrix():
+    """Get the distance matrix for the current data, if any"""
+    return _active_matrix
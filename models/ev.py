@@ -1,53 +1,113 @@
 import uuid
-from datetime import datetime
+import numpy as np
+from models.clock import DEFAULT_CLOCK
+from models.distance import many_to_many, one_to_many, prepare_points, segment_lengths
+from models.distance_matrix import get_active_matrix
 from models.maps_service import calculate_distance
 
+# Route geometry shared by every EV driving the same route list, keyed by id(route).
+# Entries hold the route itself, so an id is never reused while cached.
+_shared_route_geometry = {}
+ROUTE_GEOMETRY_CACHE_SIZE = 100000
+
 class EV:
+    __slots__ = (
+        'id', 'origin', 'destination', 'battery_capacity', 'initial_soc', 'soc',
+        'consumption_rate', 'current_position', 'route', 'route_index', '_route_geometry',
+        'assigned_station', 'charging', 'in_queue', 'queue_arrival_time',
+        'charging_start_time', 'waiting_time', 'target_soc', 'trip_completed',
+        'abandoned', 'trip_start_time', 'trip_end_time', 'journey_log', 'journey_seq', 'clock'
+    )
+    
     def __init__(self, id=None, origin=None, destination=None, 
                  battery_capacity=None, initial_soc=None, 
-                 consumption_rate=None, route=None):
+                 consumption_rate=None, route=None, route_distance=None, clock=None):
+        self.reinitialize(id, origin, destination, battery_capacity, initial_soc,
+                          consumption_rate, route, route_distance, clock)
+    
+    def reinitialize(self, id=None, origin=None, destination=None,
+                     battery_capacity=None, initial_soc=None,
+                     consumption_rate=None, route=None, route_distance=None, clock=None):
+        """Set up a new trip, reusing this object (used by the rolling-fleet pool)"""
         self.id = id or str(uuid.uuid4())
+        self.clock = clock or DEFAULT_CLOCK  # Shared simulation clock; timestamps are step numbers
         self.origin = origin  # (lat, lng)
         self.destination = destination  # (lat, lng)
         self.battery_capacity = battery_capacity  # kWh
+        self.initial_soc = initial_soc  # SoC at trip start, restored by Simulation.reset
         self.soc = initial_soc  # State of Charge (0-1)
         self.consumption_rate = consumption_rate  # kWh/km
         
         self.current_position = origin  # Start at origin
         self.route = route or []  # List of points along route [(lat, lng), ...]
         self.route_index = 0  # Current position in route
+        self._route_geometry = None  # Cached (route, prepared points, segment km, remaining km)
         
         self.assigned_station = None  # Station assigned for charging
         self.charging = False  # Currently at a charger
         self.in_queue = False  # Waiting in a queue
-        self.queue_arrival_time = None  # When EV arrived at queue
-        self.charging_start_time = None  # When EV started charging
+        self.queue_arrival_time = None  # Step when EV arrived at queue
+        self.charging_start_time = None  # Step when EV started charging
         self.waiting_time = 0  # Total time spent waiting in queue
         self.target_soc = 0.8  # Default target SoC is 80%
         
         self.trip_completed = False
         self.abandoned = False  # Flag for abandoned EVs (can't reach any station)
-        self.trip_start_time = datetime.now()
+        self.trip_start_time = self.clock.step
         self.trip_end_time = None
         
-        # Journey log to track detailed timeline
+        # Journey log to track detailed timeline; entries carry increasing sequence numbers
         self.journey_log = []
-        # Record initialization
+        self.journey_seq = 0  # Sequence number of the next entry
+        # Record initialization (route_distance, in km, skips recomputing the route length)
+        if route_distance is None:
+            route_distance = self.calculate_total_route_distance()
         self._log_event("Initialized", {
             "origin_node": f"Node at {origin}",
             "destination_node": f"Node at {destination}",
             "battery": f"{self.soc * 100:.1f}%",
-            "total_distance": self.calculate_total_route_distance(),
-            "battery_required": f"{self.calculate_energy_for_total_route() / self.battery_capacity * 100:.1f}%"
+            "total_distance": route_distance,
+            "battery_required": f"{route_distance * self.consumption_rate / self.battery_capacity * 100:.1f}%"
         })
     
     def _log_event(self, event_type, details):
         """Add an event to the journey log"""
         self.journey_log.append({
-            "timestamp": datetime.now().isoformat(),
+            "seq": self.journey_seq,
+            "step": self.clock.step,
             "event": event_type,
             "details": details
         })
+        self.journey_seq += 1
+    
+    def restart_journey_log(self):
+        """Clear the journey log, skipping a sequence number so old cursors see the gap"""
+        self.journey_log = []
+        self.journey_seq += 1
+    
+    def journey_since(self, since=None, limit=None):
+        """
+        Journey log entries after sequence number `since`
+        
+        Sequence numbers keep counting when the log is restarted (e.g. by a
+        simulation reset), so entries are contiguous from the first one and
+        the start is found by arithmetic rather than a scan.
+        
+        Returns:
+            dict: 'events', 'next_cursor' (pass back as `since`) and 'reset',
+            True when the cursor doesn't continue this log (it was cleared or
+            restored from a checkpoint) and the events start from the beginning
+        """
+        log = self.journey_log
+        first = log[0]["seq"] if log else self.journey_seq
+        reset = since is not None and (since + 1 < first or since >= self.journey_seq)
+        start = 0 if since is None or reset else since + 1 - first
+        events = log[start:] if limit is None else log[start:start + limit]
+        if events:
+            next_cursor = events[-1]["seq"]
+        else:
+            next_cursor = since if since is not None and not reset else first - 1
+        return {'events': events, 'next_cursor': next_cursor, 'reset': reset}
     
     def move(self, time_step_seconds):
         """Move the EV along its route for one time step"""
@@ -58,17 +118,17 @@ class EV:
             # Reached destination
             self.current_position = self.destination
             self.trip_completed = True
-            self.trip_end_time = datetime.now()
+            self.trip_end_time = self.clock.step
             self._log_event("Trip Completed", {
                 "final_battery": f"{self.soc * 100:.1f}%",
-                "total_time": f"{(self.trip_end_time - self.trip_start_time).total_seconds()} seconds"
+                "total_time": f"{self.clock.seconds_since(self.trip_start_time)} seconds"
             })
             return
         
         # Calculate distance to next point
         current_point = self.route[self.route_index]
         next_point = self.route[self.route_index + 1]
-        segment_distance = self._calculate_distance(current_point, next_point)
+        segment_distance = float(self._route_segments()[self.route_index])
         
         # Calculate energy required
         energy_required = segment_distance * self.consumption_rate
@@ -119,9 +179,7 @@ class EV:
         
         # Check if enough battery to reach next point
         if self.route_index < len(self.route) - 1:
-            current_point = self.route[self.route_index]
-            next_point = self.route[self.route_index + 1]
-            segment_distance = self._calculate_distance(current_point, next_point)
+            segment_distance = float(self._route_segments()[self.route_index])
             energy_required = segment_distance * self.consumption_rate
             
             # Add 10% reserve requirement
@@ -144,7 +202,7 @@ class EV:
         self.assigned_station = station
         self.charging = True
         self.in_queue = False
-        self.charging_start_time = datetime.now()
+        self.charging_start_time = self.clock.step
         
         # Log charging start
         self._log_event("Started Charging", {
@@ -159,7 +217,7 @@ class EV:
         """Join the queue at a station"""
         self.assigned_station = station
         self.in_queue = True
-        self.queue_arrival_time = datetime.now()
+        self.queue_arrival_time = self.clock.step
         
         # Log queue join
         self._log_event("Joined Queue", {
@@ -191,49 +249,40 @@ class EV:
             # Default to a reasonable value if calculation fails
             return 0.5 * self.battery_capacity  # Charge to 50% as fallback
     
+    def _route_geometry_cache(self):
+        """Prepared route points and per-segment distances, computed once per route"""
+        cached = self._route_geometry
+        if cached is None or cached[0] is not self.route:
+            cached = _shared_route_geometry.get(id(self.route))
+            if cached is None or cached[0] is not self.route:
+                cached = _compute_route_geometry(self.route)
+                if len(_shared_route_geometry) >= ROUTE_GEOMETRY_CACHE_SIZE:
+                    _shared_route_geometry.clear()
+                _shared_route_geometry[id(self.route)] = cached
+            self._route_geometry = cached
+        return cached
+    
+    def _route_segments(self):
+        """Distance in km of each route segment"""
+        return self._route_geometry_cache()[2]
+    
     def calculate_remaining_distance(self):
         """Calculate remaining distance to destination"""
-        try:
-            if not self.route or len(self.route) < 2:
-                return 0
-            
-            if self.route_index >= len(self.route) - 1:
-                return 0
-            
-            # Ensure route_index is valid
-            safe_index = min(max(0, self.route_index), len(self.route) - 1)
-            
-            total_distance = 0
-            for i in range(safe_index, len(self.route) - 1):
-                dist = self._calculate_distance(self.route[i], self.route[i + 1])
-                # Check for invalid distance calculation
-                if dist < 0 or dist > 1000:  # Sanity check: no segment should be >1000km
-                    dist = 0
-                total_distance += dist
-            
-            return total_distance
-        except Exception as e:
-            # Return a default distance if calculation fails
-            return 50  # Default 50km as fallback
+        if not self.route or len(self.route) < 2:
+            return 0
+        
+        if self.route_index >= len(self.route) - 1:
+            return 0
+        
+        # Ensure route_index is valid
+        safe_index = min(max(0, self.route_index), len(self.route) - 1)
+        return float(self._route_geometry_cache()[3][safe_index])
     
     def calculate_total_route_distance(self):
         """Calculate total distance of the route"""
-        try:
-            if not self.route or len(self.route) < 2:
-                return 0
-            
-            total_distance = 0
-            for i in range(len(self.route) - 1):
-                dist = self._calculate_distance(self.route[i], self.route[i + 1])
-                # Check for invalid distance calculation
-                if dist < 0 or dist > 1000:  # Sanity check: no segment should be >1000km
-                    dist = 0
-                total_distance += dist
-            
-            return total_distance
-        except Exception as e:
-            # Return a default distance if calculation fails
-            return 50  # Default 50km as fallback
+        if not self.route or len(self.route) < 2:
+            return 0
+        return float(self._route_geometry_cache()[3][0])
     
     def calculate_energy_for_total_route(self):
         """Calculate energy needed for the total route"""
@@ -282,7 +331,7 @@ class EV:
                 "battery_after": f"{self.soc * 100:.1f}%",
                 "target_battery": f"{self.target_soc * 100:.1f}%",
                 "energy_added": f"{(self.soc - old_soc) * self.battery_capacity:.2f} kWh",
-                "charging_duration": f"{(datetime.now() - self.charging_start_time).total_seconds()} seconds"
+                "charging_duration": f"{self.clock.seconds_since(self.charging_start_time)} seconds"
             })
             self.finish_charging()
         elif time_step_seconds > 0:  # Only log if meaningful time has passed
@@ -311,17 +360,26 @@ class EV:
     
     def can_reach_station(self, station_location):
         """Check if the EV can reach the station with current battery"""
-        try:
-            distance = self._calculate_distance(self.current_position, station_location)
-            # Sanity check on distance
-            if distance < 0 or distance > 1000:  # No station should be >1000km away
-                distance = 50  # Default reasonable distance
+        distance = self._calculate_distance(self.current_position, station_location)
+        # Sanity check on distance
+        if distance < 0 or distance > 1000:  # No station should be >1000km away
+            distance = 50  # Default reasonable distance
+        
+        energy_required = distance * self.consumption_rate
+        return self.soc * self.battery_capacity >= energy_required
+    
+    def can_reach_stations(self, station_distances):
+        """
+        Batch version of can_reach_station
+        
+        Args:
+            station_distances: Array of distances (km) from the current position to each station
             
-            energy_required = distance * self.consumption_rate
-            return self.soc * self.battery_capacity >= energy_required
-        except Exception as e:
-            # Default to saying we can reach it, and let other checks determine suitability
-            return True
+        Returns:
+            numpy.ndarray: Boolean mask of reachable stations
+        """
+        distances = np.where((station_distances < 0) | (station_distances > 1000), 50, station_distances)
+        return self.soc * self.battery_capacity >= distances * self.consumption_rate
     
     def is_station_on_route(self, station_location, max_detour=1000):
         """
@@ -334,51 +392,61 @@ class EV:
         Returns:
             bool: True if station is on route within max_detour
         """
-        try:
-            if not self.route or self.route_index >= len(self.route):
-                return False
-            
-            # Ensure route_index is valid
-            safe_index = min(max(0, self.route_index), len(self.route) - 1)
-            
-            # Check distance from each point in remaining route to station
-            for i in range(safe_index, len(self.route)):
-                route_point = self.route[i]
-                try:
-                    distance_to_station = calculate_distance(route_point, station_location)
-                    
-                    if distance_to_station <= max_detour:
-                        return True
-                except Exception:
-                    # Skip this point if calculation fails
-                    continue
-            
-            return False
-        except Exception as e:
-            # Default to False if overall calculation fails
+        if not self.route or self.route_index >= len(self.route):
             return False
+        
+        # Ensure route_index is valid
+        safe_index = min(max(0, self.route_index), len(self.route) - 1)
+        
+        # Check distance from each point in remaining route to station
+        remaining_points = self._route_geometry_cache()[1][safe_index:]
+        return bool((one_to_many(station_location, remaining_points) <= max_detour).any())
+    
+    def stations_on_route(self, station_locations, max_detour=1000):
+        """
+        Batch version of is_station_on_route
+        
+        Returns:
+            numpy.ndarray: Boolean mask of stations within max_detour meters of the remaining route
+        """
+        if not self.route or self.route_index >= len(self.route) or not len(station_locations):
+            return np.zeros(len(station_locations), dtype=bool)
+        
+        safe_index = min(max(0, self.route_index), len(self.route) - 1)
+        remaining_points = self._route_geometry_cache()[1][safe_index:]
+        return many_to_many(remaining_points, station_locations).min(axis=0) <= max_detour
+    
+    def snapshot(self):
+        """
+        Detached copy of the EV for background optimization
+        
+        Route data is shared (it is never modified), while the journey log
+        and station reference are not, so work on the copy can't touch
+        the live EV.
+        """
+        copy = EV.__new__(EV)
+        for field in EV.__slots__:
+            setattr(copy, field, getattr(self, field))
+        copy.journey_log = []
+        copy.assigned_station = None
+        return copy
+    
+    @property
+    def status(self):
+        """One of 'completed', 'abandoned', 'charging', 'queued' or 'moving'"""
+        if self.trip_completed:
+            return 'completed'
+        if self.abandoned:
+            return 'abandoned'
+        if self.charging:
+            return 'charging'
+        if self.in_queue:
+            return 'queued'
+        return 'moving'
     
     def _calculate_distance(self, point1, point2):
-        """Calculate distance between two points (simplified)"""
-        try:
-            lat1, lng1 = point1
-            lat2, lng2 = point2
-            
-            # Validate inputs
-            if not all(isinstance(coord, (int, float)) for coord in [lat1, lng1, lat2, lng2]):
-                return 0
-            
-            # Very simplified distance calculation - in reality, use haversine formula
-            distance = ((lat2 - lat1) ** 2 + (lng2 - lng1) ** 2) ** 0.5 * 111  # Rough km conversion
-            
-            # Sanity check the result
-            if distance < 0 or distance > 1000:  # No segment should be >1000km
-                return 0
-            
-            return distance
-        except Exception as e:
-            # Return a small non-zero value as fallback
-            return 0.1  # 100m as default
+        """Calculate distance in km between two points"""
+        return calculate_distance(point1, point2) / 1000
         
     def to_dict(self):
         """Convert EV to dictionary for API response"""
@@ -394,4 +462,23 @@ class EV:
             'trip_completed': self.trip_completed,
             'abandoned': self.abandoned,
             'journey_log': self.journey_log
-        }
\ No newline at end of file
+        }
+
+def _compute_route_geometry(route):
+    """(route, prepared points, segment km, remaining km) for a route"""
+    if len(route) >= 2:
+        prepared = prepare_points(route)
+        # Route points are usually nodes, whose distances are precomputed
+        matrix = get_active_matrix()
+        if matrix is not None:
+            segments = matrix.segment_lengths(route) / 1000  # km
+        else:
+            segments = segment_lengths(prepared) / 1000  # km
+        # Sanity check: no segment should be >1000km
+        segments[(segments < 0) | (segments > 1000)] = 0
+    else:
+        prepared = prepare_points(route) if route else np.zeros((0, 3))
+        segments = np.zeros(0)
+    # remaining[i] is the distance from route point i to the destination
+    remaining = np.append(np.cumsum(segments[::-1])[::-1], 0.0)
+    return (route, prepared, segments, remaining)
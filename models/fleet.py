@@ -0,0 +1,76 @@
+import numpy as np
+from models.ev import EV
+
+class FleetArrays:
+    """
+    Array-backed storage of EV trip parameters
+
+    One row per EV: the route it drives plus battery capacity (kWh),
+    initial SoC (0-1) and consumption rate (kWh/km). EV objects are only
+    built when a slice of the fleet is materialized.
+    """
+
+    def __init__(self, route_index, battery_capacity, initial_soc, consumption_rate, id_offset=0):
+        self.route_index = route_index
+        self.battery_capacity = battery_capacity
+        self.initial_soc = initial_soc
+        self.consumption_rate = consumption_rate
+        self.id_offset = id_offset
+
+    @classmethod
+    def generate(cls, num_evs, num_routes, rng, id_offset=0):
+        """Draw all EV attributes with vectorized calls on a NumPy Generator"""
+        return cls(
+            route_index=rng.integers(0, num_routes, size=num_evs),
+            # 20-60 kWh for battery capacity (smaller for scooters, larger for cars)
+            battery_capacity=rng.uniform(20, 60, size=num_evs),
+            # 0.2 to 0.8 for initial SoC
+            initial_soc=rng.uniform(0.2, 0.8, size=num_evs),
+            # 0.15 to 0.25 kWh/km for consumption
+            consumption_rate=rng.uniform(0.15, 0.25, size=num_evs),
+            id_offset=id_offset
+        )
+
+    def __len__(self):
+        return len(self.route_index)
+
+    def ev_id(self, i):
+        """ID of the i-th EV in this fleet"""
+        return f"ev-{self.id_offset + i + 1}"
+
+    def materialize(self, routes, route_distances=None, start=0, stop=None):
+        """
+        Build EV objects for rows [start, stop)
+
+        Args:
+            routes: Sequence of route dicts indexed by `route_index`
+            route_distances: Optional per-route total distance (km) so EVs skip recomputing it
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        # tolist() converts whole columns to Python scalars in one call
+        route_index = self.route_index[start:stop].tolist()
+        battery_capacity = self.battery_capacity[start:stop].tolist()
+        initial_soc = self.initial_soc[start:stop].tolist()
+        consumption_rate = self.consumption_rate[start:stop].tolist()
+        if hasattr(route_distances, 'tolist'):
+            route_distances = route_distances.tolist()
+
+        evs = []
+        for offset, r in enumerate(route_index):
+            route = routes[r]
+            evs.append(EV(
+                id=self.ev_id(start + offset),
+                origin=route["origin"],
+                destination=route["destination"],
+                battery_capacity=battery_capacity[offset],
+                initial_soc=initial_soc[offset],
+                consumption_rate=consumption_rate[offset],
+                route=route["points"],
+                route_distance=route_distances[r] if route_distances is not None else None
+            ))
+        return evs
+
+    def iter_chunks(self, routes, chunk_size=10000, route_distances=None):
+        """Yield the fleet as lists of at most `chunk_size` EVs"""
+        for start in range(0, len(self), chunk_size):
+            yield self.materialize(routes, route_distances, start, start + chunk_size)
@@ -0,0 +1,110 @@
+import numpy as np
+
+# EV fields a query can project; journey_log is only returned when asked for
+EV_FIELDS = {
+    'id': lambda ev: ev.id,
+    'current_position': lambda ev: ev.current_position,
+    'soc': lambda ev: ev.soc,
+    'target_soc': lambda ev: ev.target_soc,
+    'status': lambda ev: ev.status,
+    'charging': lambda ev: ev.charging,
+    'in_queue': lambda ev: ev.in_queue,
+    'assigned_station': lambda ev: ev.assigned_station.id if ev.assigned_station else None,
+    'waiting_time': lambda ev: ev.waiting_time,
+    'trip_completed': lambda ev: ev.trip_completed,
+    'abandoned': lambda ev: ev.abandoned,
+    'journey_log': lambda ev: ev.journey_log
+}
+
+DEFAULT_FIELDS = ('id', 'current_position', 'soc', 'status')
+
+EV_STATUSES = ('moving', 'queued', 'charging', 'completed', 'abandoned')
+
+class SpatialGrid:
+    """
+    Uniform lat/lng grid over a set of points
+
+    Each non-empty cell holds the indices of the points in it, so a
+    bounding-box query only looks at points in overlapping cells.
+    """
+
+    def __init__(self, points, cell_size=0.01):
+        self.cell_size = cell_size
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cells = {}
+        if not len(self.points):
+            return
+        rows = np.floor(self.points[:, 0] / cell_size).astype(np.int64)
+        cols = np.floor(self.points[:, 1] / cell_size).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        rows, cols = rows[order], cols[order]
+        # Start of each run of points sharing a cell
+        starts = np.flatnonzero(np.concatenate(([True], (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1]))))
+        for start, end in zip(starts.tolist(), np.append(starts[1:], len(order)).tolist()):
+            self.cells[(int(rows[start]), int(cols[start]))] = order[start:end]
+
+    def query(self, south, west, north, east):
+        """Indices (ascending) of the points inside the bounding box"""
+        row_range = range(int(np.floor(south / self.cell_size)), int(np.floor(north / self.cell_size)) + 1)
+        col_range = range(int(np.floor(west / self.cell_size)), int(np.floor(east / self.cell_size)) + 1)
+        if len(row_range) * len(col_range) <= len(self.cells):
+            candidates = [self.cells[(row, col)] for row in row_range for col in col_range
+                          if (row, col) in self.cells]
+        else:
+            candidates = [indices for (row, col), indices in self.cells.items()
+                          if row in row_range and col in col_range]
+        if not candidates:
+            return np.zeros(0, dtype=np.int64)
+        indices = np.concatenate(candidates)
+        points = self.points[indices]
+        inside = ((points[:, 0] >= south) & (points[:, 0] <= north) &
+                  (points[:, 1] >= west) & (points[:, 1] <= east))
+        return np.sort(indices[inside])
+
+def parse_bbox(value):
+    """(south, west, north, east) from a 'south,west,north,east' string"""
+    south, west, north, east = (float(part) for part in value.split(','))
+    if south > north or west > east:
+        raise ValueError("Bounding box must be south,west,north,east")
+    return south, west, north, east
+
+def query_evs(evs, index=None, bbox=None, fields=None, statuses=None, cursor=None, limit=500):
+    """
+    Filter, project and page EVs
+
+    Args:
+        evs: EVs the index was built over, in the same order
+        index: SpatialGrid over the EVs' current positions (needed with bbox)
+        bbox: (south, west, north, east) or None for the whole fleet
+        fields: Field names to return (see EV_FIELDS), DEFAULT_FIELDS if None
+        statuses: Statuses to keep (see EV_STATUSES), all if None
+        cursor: ID of the last EV of the previous page
+        limit: Maximum EVs per page
+
+    Returns:
+        dict: 'evs', 'total' (matches across all pages) and 'next_cursor'
+    """
+    fields = DEFAULT_FIELDS if fields is None else tuple(fields)
+    unknown = [field for field in fields if field not in EV_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if statuses is not None:
+        statuses = set(statuses)
+        unknown = statuses - set(EV_STATUSES)
+        if unknown:
+            raise ValueError(f"Unknown statuses: {', '.join(sorted(unknown))}")
+
+    candidates = (evs[i] for i in index.query(*bbox).tolist()) if bbox is not None else evs
+    matches = [ev for ev in candidates if statuses is None or ev.status in statuses]
+    # Pages are ordered by ID, so they stay stable while EVs move between cells
+    matches.sort(key=lambda ev: ev.id)
+    start = 0
+    if cursor is not None:
+        start = next((i for i, ev in enumerate(matches) if ev.id > cursor), len(matches))
+    page = matches[start:start + limit]
+    getters = [(field, EV_FIELDS[field]) for field in fields]
+    return {
+        'evs': [{field: getter(ev) for field, getter in getters} for ev in page],
+        'total': len(matches),
+        'next_cursor': page[-1].id if start + limit < len(matches) else None
+    }
@@ -4,14 +4,19 @@ import config
 import os
 import json
 import pickle
+import threading
+from models.distance import distance
+from models.distance_matrix import get_active_matrix
 
-# File-based persistent cache
+# File-based persistent cache, opened on first use
 CACHE_FILE = "route_cache.pkl"
 _route_cache = {}
+_cache_loaded = False
+_cache_lock = threading.Lock()
 
 # Load cache from disk if it exists
 def load_cache():
-    global _route_cache
+    global _route_cache, _cache_loaded
     try:
         if os.path.exists(CACHE_FILE):
             with open(CACHE_FILE, 'rb') as f:
@@ -20,18 +25,27 @@ def load_cache():
     except Exception as e:
         print(f"Error loading route cache: {e}")
         _route_cache = {}
+    _cache_loaded = True
+
+def _ensure_cache_loaded():
+    """Load the route cache the first time it is needed"""
+    if _cache_loaded:
+        return
+    with _cache_lock:
+        if not _cache_loaded:
+            load_cache()
 
 # Save cache to disk
 def save_cache():
+    # Nothing to save if the cache was never opened
+    if not _cache_loaded:
+        return
     try:
         with open(CACHE_FILE, 'wb') as f:
             pickle.dump(_route_cache, f)
     except Exception as e:
         print(f"Error saving route cache: {e}")
 
-# Load cache at module import time
-load_cache()
-
 def get_route(origin, destination):
     """
     Get route between origin and destination using Google Maps Directions API
@@ -47,6 +61,7 @@ def get_route(origin, destination):
     cache_key = f"{origin[0]},{origin[1]}-{destination[0]},{destination[1]}"
     
     # Check cache first
+    _ensure_cache_loaded()
     if cache_key in _route_cache:
         print(f"Cache hit for route: {cache_key[:20]}...")
         return _route_cache[cache_key]
@@ -105,19 +120,9 @@ def get_route(origin, destination):
     return result
 
 def calculate_distance(origin, destination):
-    """Calculate straight-line distance between two points (fallback)"""
-    from math import radians, cos, sin, asin, sqrt
-    
-    # Convert decimal degrees to radians
-    lon1, lat1 = origin
-    lon2, lat2 = destination
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    r = 6371000  # Radius of earth in meters
-    
-    return c * r
\ No newline at end of file
+    """Calculate straight-line distance in meters between two (lat, lng) points (fallback)"""
+    # Known nodes and stations are a lookup in the precomputed matrix
+    matrix = get_active_matrix()
+    if matrix is not None:
+        return matrix.distance(origin, destination)
+    return distance(origin, destination)
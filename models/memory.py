@@ -0,0 +1,97 @@
+import sys
+from collections import deque
+import numpy as np
+from models import distance_matrix, maps_service, optimization
+from models.ev import EV, _shared_route_geometry
+from models.station import ChargingStation
+
+# Objects owned by another report category; never descended into from elsewhere
+_BOUNDARY_TYPES = (EV, ChargingStation)
+
+def deep_sizeof(obj, seen, root=True):
+    """
+    Approximate retained size in bytes of an object graph
+
+    Objects already in `seen` are skipped, so sizing several categories
+    with one `seen` set counts shared objects once, in the first
+    category that reaches them. EVs and stations are only descended into
+    when they are the root.
+    """
+    total = 0
+    stack = [(obj, root)]
+    while stack:
+        current, is_root = stack.pop()
+        if id(current) in seen:
+            continue
+        if not is_root and isinstance(current, _BOUNDARY_TYPES):
+            continue
+        seen.add(id(current))
+
+        if isinstance(current, np.ndarray):
+            if isinstance(current, np.memmap) or current.base is not None:
+                # Memory-mapped arrays and views don't own their data
+                total += sys.getsizeof(current)
+            else:
+                total += current.nbytes
+            continue
+
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            for key, value in current.items():
+                stack.append((key, False))
+                stack.append((value, False))
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend((item, False) for item in current)
+        elif isinstance(current, (str, bytes, int, float, bool, type(None))):
+            continue
+        else:
+            slots = getattr(type(current), '__slots__', ())
+            for slot in slots:
+                if hasattr(current, slot):
+                    stack.append((getattr(current, slot), False))
+            if hasattr(current, '__dict__'):
+                stack.append((current.__dict__, False))
+    return total
+
+def memory_report(simulation):
+    """
+    Per-structure memory usage of a simulation, in bytes
+
+    Categories are sized in order with a shared `seen` set, so journey
+    logs and routes are attributed to their own rows rather than to the
+    EVs referencing them.
+    """
+    seen = set()
+    report = {}
+
+    def add(name, objects, count=None):
+        report[name] = {
+            'bytes': sum(deep_sizeof(obj, seen) for obj in objects),
+            'count': len(objects) if count is None else count
+        }
+
+    evs = simulation.evs
+    # The clock is referenced by every EV; give it its own row
+    add('clock', [simulation.clock])
+    add('journey_logs', [ev.journey_log for ev in evs],
+        count=sum(len(ev.journey_log) for ev in evs))
+    add('routes', [simulation.routes] + [ev.route for ev in evs], count=len(simulation.routes))
+    add('route_geometry', [_shared_route_geometry], count=len(_shared_route_geometry))
+    add('evs', evs)
+    add('stations', simulation.stations)
+    add('history', [simulation.step_history], count=len(simulation.step_history))
+    add('metrics_history', [simulation.metrics_history], count=len(simulation.metrics_history.columns))
+    add('decision_trace', [optimization.tracer.records], count=len(optimization.tracer.records))
+
+    caches = [maps_service._route_cache]
+    matrix = distance_matrix.get_active_matrix()
+    if matrix is not None:
+        caches.append(matrix)
+    add('caches', caches)
+
+    total = sum(entry['bytes'] for entry in report.values())
+    return {
+        'structures': report,
+        'total_bytes': total,
+        'bytes_per_ev': report['evs']['bytes'] / len(evs) if evs else 0
+    }
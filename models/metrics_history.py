@@ -0,0 +1,277 @@
+import numpy as np
+
+# Scalar metrics kept in the history, in column order
+HISTORY_METRICS = (
+    'average_wait_time', 'max_queue_length', 'completion_rate', 'abandoned_rate',
+    'optimization_time', 'optimization_lag_steps'
+)
+
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+
+# Per-station utilization columns are named STATION_PREFIX + station ID
+STATION_PREFIX = 'station_utilization.'
+
+class _Tier:
+    """
+    Fixed-size ring of buckets `width` steps wide
+
+    Each row holds a bucket's first and last step, the number of samples
+    and the per-metric min, max and sum; the newest row stays open until
+    a step from the next bucket arrives.
+    """
+
+    def __init__(self, capacity, num_metrics, width):
+        self.capacity = capacity
+        self.width = width
+        self.first = np.zeros(capacity, dtype=np.int64)
+        self.last = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.minimum = np.zeros((capacity, num_metrics))
+        self.maximum = np.zeros((capacity, num_metrics))
+        self.total = np.zeros((capacity, num_metrics))
+        self.head = -1  # Row of the newest bucket
+        self.size = 0
+
+    def add(self, step, values):
+        head = self.head
+        if self.size and step // self.width == self.first[head] // self.width:
+            self.last[head] = step
+            self.count[head] += 1
+            np.minimum(self.minimum[head], values, out=self.minimum[head])
+            np.maximum(self.maximum[head], values, out=self.maximum[head])
+            self.total[head] += values
+            return
+        head = self.head = (head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.first[head] = self.last[head] = step
+        self.count[head] = 1
+        self.minimum[head] = self.maximum[head] = self.total[head] = values
+
+    def rows(self, start, end):
+        """Ring rows of the buckets overlapping [start, end], oldest first"""
+        order = (self.head - self.size + 1 + np.arange(self.size)) % self.capacity
+        lo = np.searchsorted(self.last[order], start, side='left')
+        hi = np.searchsorted(self.first[order], end, side='right')
+        return order[lo:hi]
+
+    def oldest(self):
+        return int(self.first[(self.head - self.size + 1) % self.capacity])
+
+    def add_columns(self, count):
+        """Append `count` zero columns (for stations that appear after the first step)"""
+        padding = np.zeros((self.capacity, count))
+        self.minimum = np.hstack((self.minimum, padding))
+        self.maximum = np.hstack((self.maximum, padding))
+        self.total = np.hstack((self.total, padding))
+
+class MetricsHistory:
+    """
+    Time series of scalar metrics and per-station utilization
+
+    Each column (a metric, or STATION_PREFIX + station ID) is kept in
+    preallocated ring buffers at several resolutions: tier 0 holds one
+    bucket per step, tier k buckets of `factor`**k steps, each tier
+    `capacity` rows, so coarser tiers reach further back and a run of any
+    length fits in fixed memory. Appending a step copies its values into
+    a preallocated row and updates one bucket per tier and the EWMA in
+    place. Queries read the finest tier that still covers the range and
+    downsample or aggregate its buckets, so their cost doesn't grow with
+    the length of the run.
+    """
+
+    def __init__(self, metrics=HISTORY_METRICS, capacity=2048, factor=16, tiers=4, ewma_alpha=0.1):
+        self.metrics = tuple(metrics)
+        self.capacity = capacity
+        self.factor = factor
+        self.num_tiers = tiers
+        self.ewma_alpha = ewma_alpha
+        self.clear()
+
+    def clear(self):
+        self.columns = {name: i for i, name in enumerate(self.metrics)}
+        self.station_ids = []
+        self.tiers = [_Tier(self.capacity, len(self.metrics), self.factor ** level)
+                      for level in range(self.num_tiers)]
+        self.values = np.zeros(len(self.columns))  # Scratch row the current step is written into
+        self.scratch = np.zeros(len(self.columns))
+        self.ewma = np.zeros(len(self.columns))
+        self.samples = 0
+
+    def _add_stations(self, station_ids):
+        """Add utilization columns for stations not seen before"""
+        new_ids = [station_id for station_id in station_ids if STATION_PREFIX + station_id not in self.columns]
+        for station_id in new_ids:
+            self.columns[STATION_PREFIX + station_id] = len(self.columns)
+        self.station_ids.extend(new_ids)
+        for tier in self.tiers:
+            tier.add_columns(len(new_ids))
+        padding = np.zeros(len(new_ids))
+        self.values = np.concatenate((self.values, padding))
+        self.scratch = np.concatenate((self.scratch, padding))
+        self.ewma = np.concatenate((self.ewma, padding))
+
+    def append(self, step, metrics):
+        """Add a step's metrics and station utilization (missing values count as 0)"""
+        utilization = metrics.get('station_utilization') or {}
+        if len(utilization) > len(self.station_ids):
+            self._add_stations(utilization)
+        values = self.values
+        offset = len(self.metrics)
+        values[:offset] = [metrics.get(name) or 0 for name in self.metrics]
+        values[offset:] = [utilization.get(station_id, 0) for station_id in self.station_ids]
+        for tier in self.tiers:
+            tier.add(step, values)
+
+        # ewma += alpha * (values - ewma), in place
+        if self.samples:
+            np.subtract(values, self.ewma, out=self.scratch)
+            self.scratch *= self.ewma_alpha
+            self.ewma += self.scratch
+        else:
+            self.ewma[:] = values
+        self.samples += 1
+
+    def _column_indices(self, names):
+        """(names, column indices); the scalar metrics if `names` is None"""
+        names = self.metrics if names is None else tuple(names)
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+        return names, [self.columns[name] for name in names]
+
+    def span(self):
+        """(first, last) step still covered, or None before the first append"""
+        coarsest = self.tiers[-1]
+        if not coarsest.size:
+            return None
+        return coarsest.oldest(), int(self.tiers[0].last[self.tiers[0].head])
+
+    def _pick_tier(self, start, end, points):
+        """Finest tier that covers `start` with at most `factor` buckets per output point"""
+        for tier in self.tiers:
+            if tier.oldest() <= start:
+                rows = tier.rows(start, end)
+                if len(rows) <= points * self.factor:
+                    return tier, rows
+        tier = self.tiers[-1]
+        return tier, tier.rows(start, end)
+
+    def query(self, start=None, end=None, points=200, metrics=None, method='minmax'):
+        """
+        Downsampled series over a step range
+
+        Args:
+            start, end: Step range (inclusive); defaults to everything retained
+            points: Target number of points per series
+            metrics: Column names (HISTORY_METRICS or STATION_PREFIX + station
+                ID), the scalar metrics if None
+            method: 'minmax' for per-bucket mean/min/max, or 'lttb' for
+                Largest-Triangle-Three-Buckets over the bucket means
+
+        Returns:
+            dict: 'start', 'end', 'resolution' (steps per source bucket),
+            'method' and 'series' {name: {'steps', 'mean', 'min', 'max'}}
+            or {name: {'steps', 'values'}} for lttb
+        """
+        names, columns = self._column_indices(metrics)
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Unknown method {method}; expected one of {', '.join(DOWNSAMPLE_METHODS)}")
+        points = max(int(points), 3)
+
+        span = self.span()
+        if span is None:
+            tier, rows = self.tiers[0], np.zeros(0, dtype=np.int64)
+        else:
+            start = span[0] if start is None else max(int(start), span[0])
+            end = span[1] if end is None else int(end)
+            tier, rows = self._pick_tier(start, end, points)
+
+        steps = tier.first[rows]
+        means = tier.total[rows][:, columns] / np.maximum(tier.count[rows], 1)[:, None]
+        if method == 'lttb':
+            series = {}
+            for j, name in enumerate(names):
+                keep = lttb(steps, means[:, j], points)
+                series[name] = {'steps': steps[keep].tolist(), 'values': means[keep, j].tolist()}
+        else:
+            # Merge runs of source buckets into at most `points` output buckets
+            edges = np.unique(np.linspace(0, len(rows), min(points, len(rows)) + 1).astype(np.int64)[:-1])
+            if len(rows):
+                counts = np.add.reduceat(tier.count[rows], edges)
+                totals = np.add.reduceat(tier.total[rows][:, columns], edges)
+                minimum = np.minimum.reduceat(tier.minimum[rows][:, columns], edges)
+                maximum = np.maximum.reduceat(tier.maximum[rows][:, columns], edges)
+                mean = totals / counts[:, None]
+            else:
+                minimum = maximum = mean = np.zeros((0, len(names)))
+            series = {
+                name: {
+                    'steps': steps[edges].tolist() if len(rows) else [],
+                    'mean': mean[:, j].tolist(),
+                    'min': minimum[:, j].tolist(),
+                    'max': maximum[:, j].tolist()
+                }
+                for j, name in enumerate(names)
+            }
+        return {'start': start, 'end': end, 'resolution': tier.width, 'method': method, 'series': series}
+
+    def rolling(self, window, metrics=None):
+        """
+        Mean and max over the last `window` steps, and the EWMA, per column
+
+        Windows longer than tier 0 are read from the finest tier that
+        covers them, rounded out to whole buckets.
+
+        Returns:
+            dict: 'window', 'resolution' (steps per bucket read) and
+            'series' {name: {'mean', 'max', 'ewma'}}
+        """
+        names, columns = self._column_indices(metrics)
+        window = max(int(window), 1)
+        span = self.span()
+        if span is None:
+            return {'window': window, 'resolution': 1, 'series': {}}
+        start = span[1] - window + 1
+        tier = next((tier for tier in self.tiers if tier.oldest() <= start), self.tiers[-1])
+        rows = tier.rows(start, span[1])
+        count = tier.count[rows].sum()
+        mean = tier.total[rows][:, columns].sum(axis=0) / count
+        maximum = tier.maximum[rows][:, columns].max(axis=0)
+        return {
+            'window': window,
+            'resolution': tier.width,
+            'series': {
+                name: {'mean': float(mean[j]), 'max': float(maximum[j]), 'ewma': float(self.ewma[column])}
+                for j, (name, column) in enumerate(zip(names, columns))
+            }
+        }
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    Keeps the first and last point and, from each of `threshold` - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        if next_hi <= next_lo:
+            next_lo, next_hi = n - 1, n
+        average_x = x[next_lo:next_hi].mean()
+        average_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[previous] - average_x) * (y[lo:hi] - y[previous]) -
+                      (x[previous] - x[lo:hi]) * (average_y - y[previous]))
+        previous = lo + int(np.argmax(area))
+        keep[i + 1] = previous
+    return keep
@@ -1,193 +1,350 @@
 import time
-import logging
+import threading
 import traceback
-from models.maps_service import calculate_distance
+import config
+from models.distance import one_to_many
+from models.distance_matrix import get_active_matrix
+from models import tracing
+from models.tracing import DecisionTracer, DEBUG, INFO, WARNING, ERROR
 
-# Set up logger
-optimization_logger = logging.getLogger("optimization")
-optimization_logger.setLevel(logging.INFO)
+# Decision trace of the optimizer, shared by every simulation in the process
+tracer = DecisionTracer(
+    level=tracing.parse_level(getattr(config, 'TRACE_LEVEL', 'INFO')),
+    sample_rate=getattr(config, 'TRACE_SAMPLE_RATE', 1.0),
+    capacity=getattr(config, 'TRACE_CAPACITY', 5000)
+)
 
-# In-memory handler for log messages
-class InMemoryHandler(logging.Handler):
-    def __init__(self, max_entries=100):
-        super().__init__()
-        self.log_entries = []
-        self.max_entries = max_entries
-        
-    def emit(self, record):
-        if len(self.log_entries) >= self.max_entries:
-            self.log_entries.pop(0)
-        self.log_entries.append(self.format(record))
-        
-    def get_logs(self):
-        return self.log_entries
+def get_optimization_logs(limit=100):
+    """Get the most recent optimization trace records as log lines"""
+    return tracer.format_lines(limit)
+
+class OptimizerCache:
+    """
+    Per-EV candidate stations and score components kept between rounds
+
+    An EV's distances, reachability and route proximity are reused while
+    its position and route index are unchanged and its SoC moved by at
+    most `soc_tolerance`; a cached score is reused while the station's
+    queue/charging set (version) is the one it was computed with and the
+    wait estimate is within `wait_tolerance` seconds of the wait it used,
+    so slow drift across rounds still adds up to a rescore. Entries for EVs
+    missing from a round are dropped, so the cache is bounded by the
+    number of EVs waiting for an assignment.
+    """
+    
+    def __init__(self, soc_tolerance=0.01, wait_tolerance=60.0):
+        self.soc_tolerance = soc_tolerance
+        self.wait_tolerance = wait_tolerance
+        self.station_ids = None
+        self.entries = {}  # EV ID -> _CandidateEntry
+        self.last_round = {}
+    
+    def begin_round(self, stations):
+        """Drop every entry if the station set changed (column positions no longer line up)"""
+        station_ids = tuple(station.id for station in stations)
+        if station_ids != self.station_ids:
+            self.station_ids = station_ids
+            self.entries = {}
+    
+    def is_current(self, cached, version, wait):
+        """Whether a (version, score) pair from `scores` still holds for the station's state"""
+        return (cached is not None and version is not None and cached[0] == version and
+                abs(cached[1]['wait_time'] - wait) <= self.wait_tolerance)
+    
+    def lookup(self, ev):
+        """Cached entry for an EV if its state is within tolerance of the cached one"""
+        entry = self.entries.get(ev.id)
+        if (entry is not None and entry.route_index == ev.route_index and
+                entry.position == ev.current_position and abs(entry.soc - ev.soc) <= self.soc_tolerance):
+            return entry
+        return None
+    
+    def end_round(self, seen_ids, stats):
+        """Drop entries for EVs that were not part of this round"""
+        for ev_id in list(self.entries):
+            if ev_id not in seen_ids:
+                del self.entries[ev_id]
+        self.last_round = stats
 
-# Create and add handler
-log_handler = InMemoryHandler()
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-log_handler.setFormatter(formatter)
-optimization_logger.addHandler(log_handler)
+class _CandidateEntry:
+    __slots__ = ('position', 'route_index', 'soc', 'distances', 'reachable', 'on_route', 'scores')
+    
+    def __init__(self, ev, distances, reachable, on_route):
+        self.position = ev.current_position
+        self.route_index = ev.route_index
+        self.soc = ev.soc
+        self.distances = distances
+        self.reachable = reachable
+        self.on_route = on_route
+        self.scores = {}  # station index -> (station version, score dict) it was computed with
 
-def get_optimization_logs():
-    """Get the current optimization logs"""
-    return log_handler.get_logs()
+def _score_station(ev, station, travel_distance, on_route, wait_time, energy_needed):
+    """Cost components of sending an EV to a station"""
+    # Calculate travel distance and time
+    travel_time = travel_distance / 30 * 3600  # seconds, assuming 30 km/h
+    
+    # Calculate charging time needed
+    # Assume we need to charge to reach destination + 10km buffer
+    current_energy = ev.soc * ev.battery_capacity
+    energy_to_charge = max(0, energy_needed - current_energy)
+    
+    # Ensure we always charge at least 10% of battery capacity
+    min_charge = 0.1 * ev.battery_capacity
+    energy_to_charge = max(energy_to_charge, min_charge)
+    
+    charge_time = (energy_to_charge / station.charging_rate) * 3600  # seconds
+    
+    # Adjust charge time based on queue length
+    # Cannot charge more than 80% if queue exists, unless energy needed is greater
+    if station.get_queue_length() > 0 or station.get_charging_count() >= station.num_chargers:
+        # Calculate energy for 80% SoC
+        energy_80pct = 0.8 * ev.battery_capacity - current_energy
+        # If energy needed is greater than what 80% provides, use energy needed
+        # Otherwise, use 80% cap
+        if energy_needed > 0.8 * ev.battery_capacity:
+            energy_to_charge = max(energy_to_charge, min_charge)
+        else:
+            energy_to_charge = min(energy_to_charge, max(energy_80pct, min_charge))
+        
+        charge_time = (energy_to_charge / station.charging_rate) * 3600  # seconds
+    
+    # Total time = travel time + wait time + charge time
+    total_time = travel_time + wait_time + charge_time
+    
+    # Apply bonus for on-route stations (reduce score)
+    if on_route:
+        total_time *= 0.9  # 10% bonus for on-route stations
+    
+    # Critical battery penalty (< 10% battery)
+    if ev.soc < 0.1:
+        # If battery very low, heavily penalize far stations
+        total_time += travel_time * 5
+    
+    return {
+        'station_id': station.id,
+        'travel_time': travel_time,
+        'wait_time': wait_time,
+        'charge_time': charge_time,
+        'total_time': total_time,
+        'on_route': on_route
+    }
 
-def optimize_charging(evs, stations):
+def optimize_charging(evs, stations, cache=None):
     """
     Smart charging station assignment based on accessibility, wait time, and energy needs
     
     Args:
         evs (list): List of EVs needing charging
         stations (list): List of available charging stations
+        cache (OptimizerCache): Optional state kept between rounds, so only EVs and
+            stations that changed are re-scored
         
     Returns:
         dict: Mapping of EV IDs to assigned station IDs
         list: List of EV IDs that could not be assigned (emergency)
     """
     if not evs or not stations:
-        optimization_logger.info(f"No optimization needed: EVs={len(evs)}, Stations={len(stations)}")
         return {}, []
         
     start_time = time.time()
-    optimization_logger.info(f"Starting optimization for {len(evs)} EVs and {len(stations)} stations")
+    # Trace levels are checked once per round; per-EV records are also subject to sampling
+    tracer.begin_round()
+    trace_info = tracer.level <= INFO
+    trace_scores = tracer.level <= DEBUG
+    trace_warnings = tracer.level <= WARNING
+    trace_errors = tracer.level <= ERROR
+    if trace_info:
+        tracer.record(INFO, 'round_start', values=(len(evs), len(stations)))
     
     assignments = {}
     abandoned_evs = []
+    station_locations = [station.location for station in stations]
+    # Station distances come from the precomputed matrix when it covers these stations
+    matrix = get_active_matrix()
+    station_columns = matrix.station_columns(station_locations) if matrix is not None else None
+    # Station state doesn't change during a round, so each wait estimate is computed once
+    wait_times = [station.get_current_wait_time_estimate() for station in stations]
+    station_versions = [getattr(station, 'version', None) for station in stations]
+    if cache is not None:
+        cache.begin_round(stations)
+    stats = {'evs_rescored': 0, 'evs_reused': 0, 'pairs_scored': 0, 'pairs_reused': 0}
     
     try:
         for ev in evs:
             try:
-                optimization_logger.info(f"Optimizing for EV {ev.id} - Current SoC: {ev.soc:.2f}")
+                traced = trace_info and tracer.sampled(ev.id)
+                if traced:
+                    tracer.record(INFO, 'ev', ev.id, values=(ev.soc,))
                 
                 # Safety check for invalid route data
                 if not ev.route or len(ev.route) < 2:
-                    optimization_logger.warning(f"EV {ev.id} has invalid route data, skipping")
+                    if trace_warnings:
+                        tracer.record(WARNING, 'skip', ev.id, values=("invalid route data",))
                     continue
                     
                 # Safety check for route index out of bounds
                 if ev.route_index >= len(ev.route):
-                    optimization_logger.warning(f"EV {ev.id} has invalid route index {ev.route_index}, resetting to 0")
+                    if trace_warnings:
+                        tracer.record(WARNING, 'skip', ev.id, values=(f"route index {ev.route_index} reset to 0",))
                     ev.route_index = 0
                 
-                # Find stations that are reachable with current battery
-                reachable_stations = []
-                for station in stations:
-                    try:
-                        if ev.can_reach_station(station.location):
-                            # Check if station is on or near route (within 1000m detour)
-                            on_route = ev.is_station_on_route(station.location, max_detour=1000)
-                            reachable_stations.append({
-                                'station': station,
-                                'on_route': on_route
-                            })
-                    except Exception as station_error:
-                        optimization_logger.error(f"Error checking station {station.id} for EV {ev.id}: {station_error}")
-                        continue
+                entry = cache.lookup(ev) if cache is not None else None
+                if entry is None:
+                    # Distances (km) to every station, then reachability and route proximity in one batch
+                    if station_columns is not None:
+                        station_distances = matrix.distances_to_stations(ev.current_position, station_columns) / 1000
+                    else:
+                        station_distances = one_to_many(ev.current_position, station_locations) / 1000
+                    reachable_mask = ev.can_reach_stations(station_distances)
+                    # Check if station is on or near route (within 1000m detour)
+                    on_route_mask = ev.stations_on_route(station_locations, max_detour=1000)
+                    entry = _CandidateEntry(ev, station_distances, reachable_mask, on_route_mask)
+                    if cache is not None:
+                        cache.entries[ev.id] = entry
+                    stats['evs_rescored'] += 1
+                else:
+                    stats['evs_reused'] += 1
                 
-                optimization_logger.info(f"Found {len(reachable_stations)} reachable stations for EV {ev.id}")
+                # Stations that are reachable with current battery, on-route ones first
+                reachable = [i for i in range(len(stations)) if entry.reachable[i]]
+                if traced:
+                    tracer.record(INFO, 'candidates', ev.id, values=(len(reachable),))
                 
-                if not reachable_stations:
-                    optimization_logger.warning(f"No reachable stations for EV {ev.id}! Marking as abandoned.")
+                if not reachable:
+                    if trace_warnings:
+                        tracer.record(WARNING, 'abandon', ev.id, values=("no reachable stations",))
                     abandoned_evs.append(ev.id)
                     continue
+                reachable.sort(key=lambda i: 0 if entry.on_route[i] else 1)
                 
-                # Sort by preference: first on-route stations, then others
-                reachable_stations.sort(key=lambda x: 0 if x['on_route'] else 1)
-                
-                # Calculate scores for each reachable station
-                station_scores = []
-                for station_data in reachable_stations:
+                # Calculate scores for reachable stations that are new or changed since they were scored
+                energy_needed = ev.calculate_energy_needed_for_destination()
+                for i in reachable:
+                    if cache is not None and cache.is_current(entry.scores.get(i), station_versions[i], wait_times[i]):
+                        stats['pairs_reused'] += 1
+                        continue
+                    station = stations[i]
                     try:
-                        station = station_data['station']
-                        on_route = station_data['on_route']
-                        
-                        # Calculate travel distance and time
-                        travel_distance = calculate_distance(ev.current_position, station.location) / 1000  # km
-                        travel_time = travel_distance / 30 * 3600  # seconds, assuming 30 km/h
-                        
-                        # Get estimated wait time at this station
-                        wait_time = station.get_current_wait_time_estimate()
-                        
-                        # Calculate charging time needed
-                        # Assume we need to charge to reach destination + 10km buffer
-                        energy_needed = ev.calculate_energy_needed_for_destination()
-                        current_energy = ev.soc * ev.battery_capacity
-                        energy_to_charge = max(0, energy_needed - current_energy)
-                        
-                        # Ensure we always charge at least 10% of battery capacity
-                        min_charge = 0.1 * ev.battery_capacity
-                        energy_to_charge = max(energy_to_charge, min_charge)
-                        
-                        charge_time = (energy_to_charge / station.charging_rate) * 3600  # seconds
-                        
-                        # Adjust charge time based on queue length
-                        # Cannot charge more than 80% if queue exists, unless energy needed is greater
-                        if station.get_queue_length() > 0 or len(station.charging_evs) >= station.num_chargers:
-                            # Calculate energy for 80% SoC
-                            energy_80pct = 0.8 * ev.battery_capacity - current_energy
-                            # If energy needed is greater than what 80% provides, use energy needed
-                            # Otherwise, use 80% cap
-                            if energy_needed > 0.8 * ev.battery_capacity:
-                                energy_to_charge = max(energy_to_charge, min_charge)
-                            else:
-                                energy_to_charge = min(energy_to_charge, max(energy_80pct, min_charge))
-                            
-                            charge_time = (energy_to_charge / station.charging_rate) * 3600  # seconds
-                        
-                        # Total time = travel time + wait time + charge time
-                        total_time = travel_time + wait_time + charge_time
-                        
-                        # Apply bonus for on-route stations (reduce score)
-                        if on_route:
-                            total_time *= 0.9  # 10% bonus for on-route stations
-                        
-                        # Critical battery penalty (< 10% battery)
-                        if ev.soc < 0.1:
-                            # If battery very low, heavily penalize far stations
-                            total_time += travel_time * 5
-                        
-                        station_scores.append({
-                            'station_id': station.id,
-                            'travel_time': travel_time,
-                            'wait_time': wait_time,
-                            'charge_time': charge_time,
-                            'total_time': total_time,
-                            'on_route': on_route
-                        })
-                        
-                        optimization_logger.info(f"Station {station.id} score: travel={travel_time:.1f}s, "
-                                    f"wait={wait_time:.1f}s, charge={charge_time:.1f}s, "
-                                    f"total={total_time:.1f}s, on_route={on_route}")
+                        score = _score_station(ev, station, float(entry.distances[i]), bool(entry.on_route[i]),
+                                               wait_times[i], energy_needed)
+                        entry.scores[i] = (station_versions[i], score)
+                        stats['pairs_scored'] += 1
+                        if traced and trace_scores:
+                            tracer.record(DEBUG, 'score', ev.id, station.id, values=(
+                                score['travel_time'], score['wait_time'], score['charge_time'],
+                                score['total_time'], score['on_route']))
                     except Exception as score_error:
-                        optimization_logger.error(f"Error calculating score for station {station_data['station'].id}: {score_error}")
-                        continue
+                        entry.scores.pop(i, None)
+                        if trace_errors:
+                            tracer.record(ERROR, 'error', ev.id, station.id,
+                                          values=(f"scoring station {station.id}: {score_error}",))
                 
                 # Choose station with lowest total time
+                station_scores = [entry.scores[i][1] for i in reachable if i in entry.scores]
                 if station_scores:
                     best_station = min(station_scores, key=lambda x: x['total_time'])
                     assignments[ev.id] = best_station['station_id']
-                    
-                    optimization_logger.info(f"Assigned EV {ev.id} to station {best_station['station_id']} "
-                                f"with total time: {best_station['total_time']:.1f}s")
+                    if traced:
+                        tracer.record(INFO, 'assign', ev.id, best_station['station_id'],
+                                      values=(best_station['total_time'],))
                 else:
                     # No valid scores - mark as abandoned
-                    optimization_logger.warning(f"No valid station scores for EV {ev.id}! Marking as abandoned.")
+                    if trace_warnings:
+                        tracer.record(WARNING, 'abandon', ev.id, values=("no valid station scores",))
                     abandoned_evs.append(ev.id)
             except Exception as ev_error:
-                optimization_logger.error(f"Error optimizing for EV {ev.id}: {ev_error}")
-                optimization_logger.error(traceback.format_exc())
+                if trace_errors:
+                    tracer.record(ERROR, 'error', ev.id,
+                                  values=(f"EV {ev.id}: {ev_error}", traceback.format_exc()))
                 # Mark as abandoned due to error
                 abandoned_evs.append(ev.id)
                 continue
     except Exception as e:
-        optimization_logger.error(f"Critical optimization error: {e}")
-        optimization_logger.error(traceback.format_exc())
+        if trace_errors:
+            tracer.record(ERROR, 'error', values=(f"critical: {e}", traceback.format_exc()))
+    
+    if cache is not None:
+        cache.end_round({ev.id for ev in evs}, stats)
+    
+    if trace_info:
+        tracer.record(INFO, 'round_end', values=(
+            time.time() - start_time, len(assignments), len(evs), len(abandoned_evs),
+            stats['pairs_scored'], stats['pairs_reused']))
+    
+    return assignments, abandoned_evs
+
+
+class OptimizationWorker:
+    """
+    Runs optimize_charging on a background thread, one round at a time
+
+    Rounds work on snapshots (EV.snapshot / ChargingStation.snapshot) so
+    the simulation keeps stepping while they run. The finished result is
+    picked up with poll() at a step boundary. An OptimizerCache, if given,
+    is only ever used by one round at a time.
+    """
+    
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._thread = None
+        self._result = None
+        self._generation = 0
+        self._lock = threading.Lock()
+    
+    def busy(self):
+        """Whether a round is still running"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def submit(self, step, ev_snapshots, station_snapshots):
+        """Start a round for the given snapshots; returns False if one is already running"""
+        if self.busy():
+            return False
+        with self._lock:
+            self._result = None
+        self._thread = threading.Thread(
+            target=self._optimize,
+            args=(self._generation, step, ev_snapshots, station_snapshots, self.cache)
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+    
+    def wait(self, timeout=None):
+        """Block until the current round (if any) finishes"""
+        if self._thread is not None:
+            self._thread.join(timeout)
     
-    optimization_time = time.time() - start_time
-    optimization_logger.info(f"Optimization completed in {optimization_time:.3f} seconds")
-    optimization_logger.info(f"Assigned {len(assignments)} EVs out of {len(evs)}")
+    def poll(self):
+        """Take the finished result, if any (dict with step, submitted_at, assignments, ...)"""
+        with self._lock:
+            result, self._result = self._result, None
+        return result
     
-    if abandoned_evs:
-        optimization_logger.warning(f"{len(abandoned_evs)} EVs abandoned due to unsolvable situations: {abandoned_evs}")
+    def discard(self):
+        """Ignore the round in progress (e.g. after a reset)"""
+        with self._lock:
+            self._generation += 1
+            self._result = None
     
-    return assignments, abandoned_evs
\ No newline at end of file
+    def _optimize(self, generation, step, ev_snapshots, station_snapshots, cache):
+        submitted_at = time.time()
+        try:
+            assignments, abandoned_evs = optimize_charging(ev_snapshots, station_snapshots, cache=cache)
+            error = None
+        except Exception as e:
+            assignments, abandoned_evs, error = {}, [], str(e)
+            tracer.record(ERROR, 'error', values=(error, traceback.format_exc()))
+        result = {
+            'step': step,
+            'submitted_at': submitted_at,
+            'optimization_time': time.time() - submitted_at,
+            'assignments': assignments,
+            'abandoned': abandoned_evs,
+            # State the decisions were based on, to detect stale ones
+            'route_index': {ev.id: ev.route_index for ev in ev_snapshots},
+            'cache_stats': dict(cache.last_round) if cache is not None else {},
+            'error': error
+        }
+        with self._lock:
+            if generation == self._generation:
+                self._result = result
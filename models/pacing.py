@@ -0,0 +1,110 @@
+import time
+
+class PacingController:
+    """
+    Deadline-based pacing of the simulation loop
+
+    Runs steps at `speed` simulated seconds per wall-clock second: each
+    step has a deadline one step interval after the previous one, and the
+    loop sleeps until it. When a step finishes past its deadline, the
+    'burst' policy runs the missed steps back to back (at most
+    `max_burst_steps` behind, older ones are dropped) and the 'drop'
+    policy skips them, so simulated time falls behind wall time.
+    """
+
+    def __init__(self, time_step, speed=600.0, catch_up='burst', max_burst_steps=10):
+        if catch_up not in ('burst', 'drop'):
+            raise ValueError(f"Unknown catch-up policy {catch_up}")
+        self.time_step = time_step
+        self.catch_up = catch_up
+        self.max_burst_steps = max_burst_steps
+        self.speed = self._checked(speed)
+        self.reset()
+    
+    def reset(self):
+        """Clear the schedule and the counters"""
+        self.deadline = None
+        self.started_at = None
+        self.steps = 0
+        self.overruns = 0  # Steps that took longer than the step interval
+        self.late_steps = 0  # Steps that finished past their deadline
+        self.catch_up_steps = 0  # Steps run without sleeping to catch up
+        self.dropped_steps = 0  # Step slots skipped
+        self.max_step_seconds = 0.0
+        self.last_step_seconds = 0.0
+        self.sleep_seconds = 0.0
+
+    @staticmethod
+    def _checked(speed):
+        speed = float(speed)
+        if speed <= 0:
+            raise ValueError("Speed must be positive")
+        return speed
+
+    @property
+    def interval(self):
+        """Wall-clock seconds per step"""
+        return self.time_step / self.speed
+
+    def start(self, now=None):
+        """Start a run; counters (and actual_speed) cover this run only"""
+        self.reset()
+        now = time.monotonic() if now is None else now
+        self.started_at = now
+        self.deadline = now + self.interval
+
+    def set_speed(self, speed, now=None):
+        """Change the speed; the next deadline is one new interval from now"""
+        self.speed = self._checked(speed)
+        if self.deadline is not None:
+            self.deadline = (time.monotonic() if now is None else now) + self.interval
+
+    def step_finished(self, step_seconds, now=None):
+        """Record a finished step and return how long to sleep before the next one"""
+        now = time.monotonic() if now is None else now
+        if self.deadline is None:
+            self.start(now)
+            return self.interval
+        interval = self.interval
+        self.steps += 1
+        self.last_step_seconds = step_seconds
+        self.max_step_seconds = max(self.max_step_seconds, step_seconds)
+        if step_seconds > interval:
+            self.overruns += 1
+
+        if now <= self.deadline:
+            delay = self.deadline - now
+            self.deadline += interval
+            self.sleep_seconds += delay
+            return delay
+
+        self.late_steps += 1
+        behind = int((now - self.deadline) / interval)
+        if self.catch_up == 'burst' and behind < self.max_burst_steps:
+            # Run the next step right away; its deadline stays on the original schedule
+            self.catch_up_steps += 1
+            self.deadline += interval
+        else:
+            kept = self.max_burst_steps if self.catch_up == 'burst' else 0
+            self.dropped_steps += behind - kept
+            self.deadline = now - kept * interval + interval
+            if kept:
+                self.catch_up_steps += 1
+        return 0.0
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0
+        return {
+            'target_speed': self.speed,
+            'actual_speed': self.steps * self.time_step / elapsed if elapsed > 0 else 0,
+            'step_interval_seconds': self.interval,
+            'catch_up': self.catch_up,
+            'steps': self.steps,
+            'overruns': self.overruns,
+            'late_steps': self.late_steps,
+            'catch_up_steps': self.catch_up_steps,
+            'dropped_steps': self.dropped_steps,
+            'last_step_seconds': self.last_step_seconds,
+            'max_step_seconds': self.max_step_seconds,
+            'sleep_seconds': self.sleep_seconds
+        }
@@ -0,0 +1,182 @@
+import numpy as np
+import config
+
+# Compactor size; larger is more accurate and retains more values (about 3 * k)
+DEFAULT_K = getattr(config, 'QUANTILE_SKETCH_K', 200)
+
+# Percentiles reported by QuantileSketch.summary
+SUMMARY_PERCENTILES = (50, 90, 95, 99)
+
+class QuantileSketch:
+    """
+    KLL quantile sketch: approximate quantiles of a stream in bounded memory
+
+    Values go into a hierarchy of compactors; level h items stand for 2**h
+    values. When a level fills up it is sorted and every other item is
+    promoted to the next level. Capacities shrink geometrically towards
+    the lower levels, so at most about 3 * k items are retained however
+    many values were added, and the rank error is around 1.7 / k. Two
+    sketches merge by concatenating their levels and compacting, so
+    per-station sketches combine into fleet-wide ones.
+
+    The promoted half alternates between even and odd positions instead of
+    being drawn at random, so runs stay reproducible.
+    """
+    __slots__ = ('k', 'compactors', 'count', 'minimum', 'maximum', 'size', 'max_size', 'flip', '_cdf')
+
+    def __init__(self, k=None):
+        self.k = DEFAULT_K if k is None else k
+        self.clear()
+
+    def clear(self):
+        self.compactors = [[]]
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.size = 0
+        self.max_size = self._capacity(0)
+        self.flip = 0
+        self._cdf = None  # Sorted (values, cumulative weights), rebuilt after changes
+
+    def _capacity(self, level):
+        height = len(self.compactors)
+        return max(int(self.k * (2 / 3) ** (height - level - 1)) + 1, 2)
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self._grow()
+                items.sort()
+                # An odd item out stays at this level
+                remainder = [items.pop()] if len(items) % 2 else []
+                self.compactors[level + 1].extend(items[self.flip::2])
+                self.flip ^= 1
+                self.compactors[level] = remainder
+                self.size = sum(len(items) for items in self.compactors)
+                if self.size < self.max_size:
+                    break
+
+    def update(self, value):
+        """Add a value"""
+        self.compactors[0].append(value)
+        self.count += 1
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self.size += 1
+        self._cdf = None
+        if self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Add another sketch's values to this one"""
+        if not other.count:
+            return self
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self.size = sum(len(items) for items in self.compactors)
+        self._cdf = None
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0-1), or None if the sketch is empty"""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.minimum
+        if q >= 1:
+            return self.maximum
+        if self._cdf is None:
+            values = np.concatenate([np.asarray(items, dtype=np.float64) for items in self.compactors])
+            weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.compactors)])
+            order = np.argsort(values, kind='stable')
+            self._cdf = (values[order], np.cumsum(weights[order]))
+        values, cumulative = self._cdf
+        index = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        return float(values[min(index, len(values) - 1)])
+
+    def summary(self):
+        """Count, min, max and SUMMARY_PERCENTILES as 'p50', 'p90', ..."""
+        result = {'count': self.count, 'min': self.minimum, 'max': self.maximum}
+        for percentile in SUMMARY_PERCENTILES:
+            result[f'p{percentile}'] = self.quantile(percentile / 100)
+        return result
+
+    def to_state(self):
+        """Plain data for checkpoints"""
+        return {
+            'k': self.k, 'compactors': [list(items) for items in self.compactors], 'count': self.count,
+            'minimum': self.minimum, 'maximum': self.maximum, 'flip': self.flip
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['k'])
+        sketch.compactors = [list(items) for items in state['compactors']]
+        sketch.count = state['count']
+        sketch.minimum = state['minimum']
+        sketch.maximum = state['maximum']
+        sketch.flip = state['flip']
+        sketch.size = sum(len(items) for items in sketch.compactors)
+        sketch.max_size = sum(sketch._capacity(level) for level in range(len(sketch.compactors)))
+        return sketch
+
+class DurationSketches:
+    """
+    Wait and charge duration sketches (seconds)
+
+    A station's sketches can feed a `parent` (the simulation's fleet-wide
+    sketches), so fleet quantiles don't need a merge on every read.
+    """
+    __slots__ = ('wait', 'charge', 'parent')
+
+    def __init__(self, k=None, parent=None):
+        self.wait = QuantileSketch(k)
+        self.charge = QuantileSketch(k)
+        self.parent = parent
+
+    def record_wait(self, seconds):
+        self.wait.update(seconds)
+        if self.parent is not None:
+            self.parent.record_wait(seconds)
+
+    def record_charge(self, seconds):
+        self.charge.update(seconds)
+        if self.parent is not None:
+            self.parent.record_charge(seconds)
+
+    def merge(self, other):
+        self.wait.merge(other.wait)
+        self.charge.merge(other.charge)
+        return self
+
+    def clear(self):
+        self.wait.clear()
+        self.charge.clear()
+
+    def summary(self):
+        return {'wait_time': self.wait.summary(), 'charge_time': self.charge.summary()}
+
+    def to_state(self):
+        return {'wait': self.wait.to_state(), 'charge': self.charge.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        sketches = cls()
+        sketches.wait = QuantileSketch.from_state(state['wait'])
+        sketches.charge = QuantileSketch.from_state(state['charge'])
+        return sketches
@@ -0,0 +1,396 @@
+import heapq
+import os
+from collections import OrderedDict
+import numpy as np
+from models.distance import HAVERSINE, distance, many_to_many, one_to_many
+from utils.cache_store import array_key
+
+# Synthetic roads are never straight; scale crow-flies distance by this factor
+ROAD_DETOUR_FACTOR = 1.3
+
+# Average urban driving speed used for route durations (matches the optimizer)
+AVERAGE_SPEED_KMH = 30
+
+# Number of nearest neighbours each node is connected to in the synthetic graph
+DEFAULT_NEIGHBORS = 4
+
+def _haversine(p1, p2):
+    """Haversine distance in meters; A* needs it even when the default mode is approximate"""
+    return distance(p1, p2, mode=HAVERSINE)
+
+class RoadGraph:
+    """
+    Undirected weighted road graph over (lat, lng) nodes
+
+    Answers shortest-path queries with A* and, once `prepare()` has been
+    called, with a contraction-hierarchy search over precomputed shortcuts.
+    """
+
+    def __init__(self, nodes, edges, query_cache_size=100000):
+        self.nodes = [tuple(node) for node in nodes]
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+
+        # Adjacency: node -> {neighbour: distance in meters}
+        self.adj = [dict() for _ in self.nodes]
+        for u, v, weight in edges:
+            if u == v:
+                continue
+            # A* needs weights that never undercut the straight-line heuristic
+            weight = max(weight, _haversine(self.nodes[u], self.nodes[v]))
+            if weight < self.adj[u].get(v, float('inf')):
+                self.adj[u][v] = weight
+                self.adj[v][u] = weight
+
+        # Contraction hierarchy, built by prepare()
+        self.rank = None
+        self.up_adj = None
+        self.shortcut_via = {}
+
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+
+    @classmethod
+    def from_nodes(cls, nodes, neighbors=DEFAULT_NEIGHBORS, detour_factor=ROAD_DETOUR_FACTOR):
+        """Build a synthetic road graph connecting each node to its nearest neighbours"""
+        nodes = [tuple(node) for node in nodes]
+        n = len(nodes)
+        if n < 2:
+            return cls(nodes, [])
+
+        dist = many_to_many(nodes, nodes, mode=HAVERSINE)
+        np.fill_diagonal(dist, np.inf)
+
+        k = min(neighbors, n - 1)
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+
+        edges = set()
+        for u in range(n):
+            for v in nearest[u]:
+                edges.add((min(u, int(v)), max(u, int(v))))
+
+        # Join disconnected components so every pair of nodes has a route
+        parent = list(range(n))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for u, v in edges:
+            parent[find(u)] = find(v)
+
+        roots = {find(i) for i in range(n)}
+        while len(roots) > 1:
+            main = find(0)
+            in_main = np.array([find(i) == main for i in range(n)])
+            sub = dist[np.ix_(in_main, ~in_main)]
+            i, j = np.unravel_index(np.argmin(sub), sub.shape)
+            u = int(np.flatnonzero(in_main)[i])
+            v = int(np.flatnonzero(~in_main)[j])
+            edges.add((min(u, v), max(u, v)))
+            parent[find(v)] = main
+            roots = {find(i) for i in range(n)}
+
+        return cls(nodes, [(u, v, dist[u, v] * detour_factor) for u, v in edges])
+
+    @classmethod
+    def from_edge_file(cls, path):
+        """
+        Load a road graph from a local edge-list file
+
+        Each non-comment line holds `lat1,lng1,lat2,lng2[,distance_m]`. When
+        the distance column is missing the straight-line distance is scaled
+        by ROAD_DETOUR_FACTOR.
+        """
+        nodes = []
+        node_index = {}
+        edges = []
+
+        def index_of(point):
+            if point not in node_index:
+                node_index[point] = len(nodes)
+                nodes.append(point)
+            return node_index[point]
+
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = [part.strip() for part in line.split(',')]
+                if len(parts) not in (4, 5):
+                    raise ValueError(f"{path}:{line_number}: expected 4 or 5 columns, got {len(parts)}")
+                p1 = (float(parts[0]), float(parts[1]))
+                p2 = (float(parts[2]), float(parts[3]))
+                if len(parts) == 5:
+                    weight = float(parts[4])
+                else:
+                    weight = _haversine(p1, p2) * ROAD_DETOUR_FACTOR
+                edges.append((index_of(p1), index_of(p2), weight))
+
+        return cls(nodes, edges)
+
+    def nearest_node(self, point):
+        """Index of the graph node closest to a (lat, lng) point"""
+        index = self.node_index.get(tuple(point))
+        if index is not None:
+            return index
+
+        return int(np.argmin(one_to_many(point, self.nodes, mode=HAVERSINE)))
+
+    def astar(self, source, target):
+        """
+        Shortest path between two node indices with A*
+
+        Returns:
+            tuple: (distance in meters, list of node indices), or (inf, []) if unreachable
+        """
+        if source == target:
+            return 0.0, [source]
+
+        goal = self.nodes[target]
+        g_score = {source: 0.0}
+        came_from = {}
+        open_heap = [(_haversine(self.nodes[source], goal), source)]
+        closed = set()
+
+        while open_heap:
+            _, u = heapq.heappop(open_heap)
+            if u == target:
+                path = [u]
+                while u in came_from:
+                    u = came_from[u]
+                    path.append(u)
+                path.reverse()
+                return g_score[target], path
+            if u in closed:
+                continue
+            closed.add(u)
+
+            for v, weight in self.adj[u].items():
+                tentative = g_score[u] + weight
+                if tentative < g_score.get(v, float('inf')):
+                    g_score[v] = tentative
+                    came_from[v] = u
+                    heapq.heappush(open_heap, (tentative + _haversine(self.nodes[v], goal), v))
+
+        return float('inf'), []
+
+    def prepare(self):
+        """
+        Precompute contraction-hierarchy shortcuts
+
+        Nodes are contracted in order of edge difference (shortcuts added
+        minus edges removed). Each contraction adds a shortcut between two
+        neighbours unless a witness path that avoids the contracted node is
+        at least as short.
+        """
+        n = len(self.nodes)
+        graph = [dict(neighbours) for neighbours in self.adj]
+        contracted = [False] * n
+        self.rank = [0] * n
+        self.shortcut_via = {}
+
+        def witness_distance(source, target, skip, limit):
+            # Bounded Dijkstra over the remaining graph, ignoring `skip`
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap and settled < 500:
+                d, u = heapq.heappop(heap)
+                if d > limit:
+                    break
+                if u == target:
+                    return d
+                if d > dist.get(u, float('inf')):
+                    continue
+                settled += 1
+                for v, weight in graph[u].items():
+                    if v == skip or contracted[v]:
+                        continue
+                    nd = d + weight
+                    if nd < dist.get(v, float('inf')):
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+            return dist.get(target, float('inf'))
+
+        def shortcuts_for(v):
+            neighbours = [(u, w) for u, w in graph[v].items() if not contracted[u]]
+            shortcuts = []
+            for i, (u, w_uv) in enumerate(neighbours):
+                for x, w_vx in neighbours[i + 1:]:
+                    via_v = w_uv + w_vx
+                    if witness_distance(u, x, v, via_v) > via_v:
+                        shortcuts.append((u, x, via_v))
+            return shortcuts, len(neighbours)
+
+        def priority(v):
+            shortcuts, degree = shortcuts_for(v)
+            return len(shortcuts) - degree
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        order = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            # Lazy update: re-insert if the priority has grown since it was queued
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+
+            shortcuts, _ = shortcuts_for(v)
+            for u, x, weight in shortcuts:
+                if weight < graph[u].get(x, float('inf')):
+                    graph[u][x] = weight
+                    graph[x][u] = weight
+                    self.shortcut_via[(u, x)] = v
+                    self.shortcut_via[(x, u)] = v
+            contracted[v] = True
+            self.rank[v] = order
+            order += 1
+
+        # Upward graph: each node keeps only edges towards higher-ranked nodes
+        self.up_adj = [
+            {u: weight for u, weight in graph[v].items() if self.rank[u] > self.rank[v]}
+            for v in range(n)
+        ]
+        self._query_cache.clear()
+        return self
+
+    def _ch_query(self, source, target):
+        """Bidirectional upward search over the contraction hierarchy"""
+        if source == target:
+            return 0.0, [source]
+
+        dist = ({source: 0.0}, {target: 0.0})
+        parents = ({}, {})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best = float('inf')
+        meeting = None
+
+        while heaps[0] or heaps[1]:
+            for side in (0, 1):
+                if not heaps[side]:
+                    continue
+                d, u = heapq.heappop(heaps[side])
+                if d > dist[side].get(u, float('inf')) or d >= best:
+                    if d >= best:
+                        heaps[side].clear()
+                    continue
+                other = dist[1 - side].get(u)
+                if other is not None and d + other < best:
+                    best = d + other
+                    meeting = u
+                for v, weight in self.up_adj[u].items():
+                    nd = d + weight
+                    if nd < dist[side].get(v, float('inf')):
+                        dist[side][v] = nd
+                        parents[side][v] = u
+                        heapq.heappush(heaps[side], (nd, v))
+
+        if meeting is None:
+            return float('inf'), []
+
+        forward = [meeting]
+        while forward[-1] != source:
+            forward.append(parents[0][forward[-1]])
+        forward.reverse()
+        backward = []
+        u = meeting
+        while u != target:
+            u = parents[1][u]
+            backward.append(u)
+
+        return best, self._unpack(forward + backward)
+
+    def _unpack(self, path):
+        """Expand shortcut edges back into original road edges"""
+        result = [path[0]]
+        stack = list(zip(path[:-1], path[1:]))[::-1]
+        while stack:
+            u, v = stack.pop()
+            via = self.shortcut_via.get((u, v))
+            if via is None:
+                result.append(v)
+            else:
+                stack.append((via, v))
+                stack.append((u, via))
+        return result
+
+    def shortest_path(self, source, target):
+        """Shortest path between node indices, using shortcuts when prepared"""
+        key = (source, target)
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            self._query_cache.move_to_end(key)
+            return cached
+
+        if self.up_adj is not None:
+            result = self._ch_query(source, target)
+        else:
+            result = self.astar(source, target)
+
+        self._query_cache[key] = result
+        if len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
+        return result
+
+    def route(self, origin, destination):
+        """
+        Route between two (lat, lng) points over the road graph
+
+        Returns:
+            dict: Same shape as maps_service.get_route (points, distance, duration)
+        """
+        source = self.nearest_node(origin)
+        target = self.nearest_node(destination)
+        distance, path = self.shortest_path(source, target)
+        if not path:
+            raise ValueError(f"No offline route between {origin} and {destination}")
+
+        points = [self.nodes[i] for i in path]
+        # Snap legs from off-graph endpoints onto the network
+        if points[0] != tuple(origin):
+            distance += _haversine(origin, points[0])
+            points.insert(0, tuple(origin))
+        if points[-1] != tuple(destination):
+            distance += _haversine(points[-1], destination)
+            points.append(tuple(destination))
+
+        return {
+            "points": points,
+            "distance": distance,
+            "duration": distance / (AVERAGE_SPEED_KMH / 3.6)
+        }
+
+# Router shared by data generation, keyed by the node set it was built for
+_router = None
+_router_key = None
+
+def get_offline_router(nodes, edge_file=None):
+    """
+    Get a prepared offline router for the given nodes
+
+    Loads the graph from `edge_file` when it exists, otherwise builds a
+    synthetic graph over the nodes. The router is reused while the node
+    set and edge file stay the same.
+    """
+    global _router, _router_key
+    key = (edge_file, array_key(nodes))
+    if _router is not None and _router_key == key:
+        return _router
+
+    if edge_file and os.path.exists(edge_file):
+        print(f"Loading road graph from {edge_file}...")
+        graph = RoadGraph.from_edge_file(edge_file)
+    else:
+        graph = RoadGraph.from_nodes(nodes)
+
+    graph.prepare()
+    print(f"Offline router ready: {len(graph.nodes)} nodes, {len(graph.shortcut_via) // 2} shortcuts")
+    _router, _router_key = graph, key
+    return graph
@@ -0,0 +1,111 @@
+class OptimizationScheduler:
+    """
+    Decides at each step whether to start an optimization round
+
+    In 'interval' mode rounds run every `interval` steps while EVs need
+    charging. In 'events' mode the simulation reports what changed each
+    step: EVs newly needing a charge, station queue/charger changes and
+    finished charging sessions. A round runs once at least `min_batch`
+    EVs are waiting and no new event arrived for `debounce_steps` steps,
+    or when the oldest unhandled event is `max_latency_steps` old. EVs in
+    a round that hasn't finished yet (background optimization) don't
+    count. The interval still acts as a heartbeat for EVs whose
+    assignment was dropped without a new event.
+    """
+
+    def __init__(self, mode='events', interval=10, debounce_steps=1, max_latency_steps=3, min_batch=1):
+        if mode not in ('events', 'interval'):
+            raise ValueError(f"Unknown optimization trigger {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.debounce_steps = debounce_steps
+        self.max_latency_steps = max_latency_steps
+        self.min_batch = min_batch
+        self.reset()
+
+    def reset(self):
+        self.needing_ids = set()
+        self.in_flight = set()  # EVs in the round currently running
+        self.waiting_since = {}  # EV ID -> step it started needing a charge, until a round includes it
+        self.station_versions = None
+        self.sessions_finished = None
+        self.first_event_step = None
+        self.last_event_step = None
+        self.events = {'threshold': 0, 'queue_change': 0, 'charge_complete': 0}
+        self.rounds = {'batch': 0, 'latency': 0, 'interval': 0}
+        self.latency_total = 0
+        self.latency_count = 0
+        self.latency_max = 0
+
+    def observe(self, step, evs_needing_charge, stations):
+        """Record this step's events"""
+        needing_ids = {ev.id for ev in evs_needing_charge}
+        new_ids = needing_ids - self.needing_ids
+        self.needing_ids = needing_ids
+        for ev_id in new_ids:
+            self.waiting_since[ev_id] = step
+        for ev_id in list(self.waiting_since):
+            if ev_id not in needing_ids:
+                del self.waiting_since[ev_id]
+
+        # Sessions started minus those still running = sessions finished
+        station_versions = sum(getattr(station, 'version', 0) for station in stations)
+        sessions_finished = sum(station.total_served - len(station.charging_evs) for station in stations)
+        queue_changed = self.station_versions is not None and station_versions != self.station_versions
+        charge_completed = self.sessions_finished is not None and sessions_finished > self.sessions_finished
+        self.station_versions = station_versions
+        self.sessions_finished = sessions_finished
+
+        self.events['threshold'] += len(new_ids)
+        self.events['queue_change'] += int(queue_changed)
+        self.events['charge_complete'] += int(charge_completed)
+        # Station changes only matter while some EV is still waiting for a station
+        if new_ids or (self._waiting() and (queue_changed or charge_completed)):
+            if self.first_event_step is None:
+                self.first_event_step = step
+            self.last_event_step = step
+
+    def _waiting(self):
+        return len(self.needing_ids - self.in_flight) if self.in_flight else len(self.needing_ids)
+
+    def due(self, step, last_round_step):
+        """Reason to run a round at this step ('batch', 'latency' or 'interval'), or None"""
+        waiting = self._waiting()
+        if not waiting:
+            return None
+        if self.mode == 'events' and self.first_event_step is not None:
+            if (waiting >= self.min_batch and
+                    step - self.last_event_step >= self.debounce_steps):
+                return 'batch'
+            if step - self.first_event_step >= self.max_latency_steps:
+                return 'latency'
+        if step - last_round_step >= self.interval:
+            return 'interval'
+        return None
+
+    def round_started(self, step, reason):
+        """Clear pending events once a round covering them has started"""
+        self.rounds[reason] += 1
+        for since in self.waiting_since.values():
+            latency = step - since
+            self.latency_total += latency
+            self.latency_count += 1
+            self.latency_max = max(self.latency_max, latency)
+        self.waiting_since = {}
+        self.in_flight = set(self.needing_ids)
+        self.first_event_step = None
+        self.last_event_step = None
+
+    def round_finished(self):
+        """The round's decisions have been applied"""
+        self.in_flight = set()
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'events': dict(self.events),
+            'rounds': dict(self.rounds),
+            'pending_evs': len(self.waiting_since),
+            'average_latency_steps': self.latency_total / self.latency_count if self.latency_count else 0,
+            'max_latency_steps': self.latency_max
+        }
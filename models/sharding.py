@@ -0,0 +1,373 @@
+import multiprocessing
+import numpy as np
+import config
+from models.ev import EV
+from models.simulation import Simulation
+from models.station import ChargingStation, StationSnapshot
+from models.quantiles import DurationSketches
+
+# EV attributes sent as-is when an EV moves between region workers
+_EV_PLAIN_FIELDS = tuple(
+    field for field in EV.__slots__
+    if field not in ('route', '_route_geometry', 'assigned_station', 'clock')
+)
+
+class RegionGrid:
+    """
+    Rectangular grid of regions over the city area
+
+    Regions are numbered row-major from the south-west corner. Locations
+    outside the area are clamped to the nearest edge region.
+    """
+
+    def __init__(self, center, radius, rows, cols):
+        self.lat_min = center[0] - radius
+        self.lng_min = center[1] - radius
+        self.lat_step = 2 * radius / rows
+        self.lng_step = 2 * radius / cols
+        self.rows = rows
+        self.cols = cols
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def region_of(self, location):
+        """Region index of a (lat, lng) location"""
+        row = min(max(int((location[0] - self.lat_min) / self.lat_step), 0), self.rows - 1)
+        col = min(max(int((location[1] - self.lng_min) / self.lng_step), 0), self.cols - 1)
+        return row * self.cols + col
+
+    def regions_of(self, locations):
+        """Region index of each location in an (N, 2) array"""
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        rows = np.clip(((locations[:, 0] - self.lat_min) / self.lat_step).astype(np.int64), 0, self.rows - 1)
+        cols = np.clip(((locations[:, 1] - self.lng_min) / self.lng_step).astype(np.int64), 0, self.cols - 1)
+        return rows * self.cols + cols
+
+    def neighbours(self, region):
+        """Regions sharing an edge or corner with `region`"""
+        row, col = divmod(region, self.cols)
+        return [
+            r * self.cols + c
+            for r in range(max(row - 1, 0), min(row + 2, self.rows))
+            for c in range(max(col - 1, 0), min(col + 2, self.cols))
+            if (r, c) != (row, col)
+        ]
+
+class RemoteStation(StationSnapshot):
+    """Station owned by another region worker, as of the last step boundary"""
+    __slots__ = ('region',)
+
+    def __init__(self, summary, region):
+        super().__init__(summary)
+        self.region = region
+
+def station_summary(station):
+    """Compact tuple describing a station's state for other regions"""
+    snapshot = station.snapshot()
+    return tuple(getattr(snapshot, field) for field in StationSnapshot.__slots__)
+
+def route_ids(routes):
+    """Map id(points list) -> route index for routes that are already materialized"""
+    candidates = getattr(routes, '_materialized', None)
+    items = candidates.items() if candidates is not None else enumerate(routes)
+    return {id(route["points"]): index for index, route in items}
+
+def pack_ev(ev, known_routes, pending_station=None):
+    """
+    Encode an EV for transfer to another region worker
+
+    The route is sent as an index into the shared route table when
+    possible, and the assigned station as an id.
+    """
+    route_index = known_routes.get(id(ev.route))
+    return (
+        tuple(getattr(ev, field) for field in _EV_PLAIN_FIELDS),
+        route_index,
+        ev.route if route_index is None else None,
+        ev.assigned_station.id if ev.assigned_station else None,
+        pending_station
+    )
+
+def unpack_ev(packed, routes, known_routes, stations_by_id, clock):
+    """Rebuild an EV sent by pack_ev; returns (ev, pending station id)"""
+    values, route_index, points, station_id, pending_station = packed
+    ev = EV.__new__(EV)
+    for field, value in zip(_EV_PLAIN_FIELDS, values):
+        setattr(ev, field, value)
+    if route_index is not None:
+        points = routes[route_index]["points"]
+        known_routes[id(points)] = route_index
+    ev.route = points
+    ev._route_geometry = None
+    ev.assigned_station = stations_by_id.get(station_id)
+    ev.clock = clock
+    return ev, pending_station
+
+class RegionSimulation(Simulation):
+    """
+    Simulation of one region, run inside a worker process
+
+    The optimizer also considers stations of neighbouring regions. EVs
+    assigned to such a station, and moving EVs that drive out of the
+    region, are handed off at the end of the step.
+    """
+
+    def __init__(self, region, grid, stations, routes, current_step=0):
+        super().__init__([], stations, routes, async_optimization=False)
+        self.region = region
+        self.grid = grid
+        self.clock.step = current_step
+        self.known_routes = route_ids(routes)
+        self.stations_by_id = {station.id: station for station in stations}
+        self.remote_stations = []
+        self._station_regions = {}
+        self.pending_handoffs = {}  # EV ID -> remote station ID
+
+    @classmethod
+    def _create(cls, evs, stations, routes, arrivals, region=None, grid=None, **options):
+        simulation = cls(region, grid, stations, routes)
+        for ev in evs:
+            ev.clock = simulation.clock
+        simulation.evs.extend(evs)
+        return simulation
+
+    def _fork_options(self):
+        return {'region': self.region, 'grid': self.grid}
+
+    def fork(self):
+        """Forked region, with the same view of neighbouring regions' stations"""
+        forked = super().fork()
+        forked.remote_stations = list(self.remote_stations)
+        forked._station_regions = dict(self._station_regions)
+        forked.pending_handoffs = dict(self.pending_handoffs)
+        return forked
+
+    def _candidate_stations(self):
+        return self.stations + self.remote_stations
+
+    def _assign_station(self, ev, station_id):
+        station = self.stations_by_id.get(station_id)
+        if station is not None:
+            station.add_to_queue(ev)
+        else:
+            self.pending_handoffs[ev.id] = station_id
+
+    def receive(self, packed_evs):
+        """Add EVs handed off by other regions"""
+        for packed in packed_evs:
+            ev, pending_station = unpack_ev(
+                packed, self.routes, self.known_routes, self.stations_by_id, self.clock)
+            self.evs.append(ev)
+            if pending_station is not None:
+                self.stations_by_id[pending_station].add_to_queue(ev)
+
+    def collect_outbound(self):
+        """Remove EVs leaving this region; returns [(target region, packed EV)]"""
+        outbound = []
+        remaining = []
+        for ev in self.evs:
+            pending_station = self.pending_handoffs.pop(ev.id, None)
+            if pending_station is not None:
+                target = self._station_regions[pending_station]
+            elif ev.charging or ev.in_queue or ev.trip_completed or ev.abandoned:
+                target = self.region
+            else:
+                target = self.grid.region_of(ev.current_position)
+
+            if target == self.region:
+                remaining.append(ev)
+            else:
+                self.stalled_positions.pop(ev.id, None)
+                outbound.append((target, pack_ev(ev, self.known_routes, pending_station)))
+        self.evs[:] = remaining
+        self.pending_handoffs.clear()
+        return outbound
+
+    def set_remote_stations(self, summaries):
+        """Replace the neighbouring-station views with (region, summary) pairs"""
+        self.remote_stations = [RemoteStation(summary, region) for region, summary in summaries]
+        self._station_regions = {station.id: station.region for station in self.remote_stations}
+
+    def metric_partials(self):
+        """Sums and maxima the coordinator merges into fleet-wide metrics"""
+        waits = [ev.waiting_time for ev in self.evs if ev.waiting_time > 0]
+        return {
+            'ev_count': len(self.evs),
+            'wait_total': sum(waits),
+            'evs_with_wait': len(waits),
+            'max_queue_length': max((len(station.queue) for station in self.stations), default=0),
+            'completed': sum(1 for ev in self.evs if ev.trip_completed),
+            'abandoned': sum(1 for ev in self.evs if ev.abandoned),
+            'optimization_time': self.metrics['optimization_time'],
+            'station_utilization': dict(self.metrics['station_utilization']),
+            'durations': self.durations
+        }
+
+def _region_worker(conn, region, grid, stations, routes, packed_evs, current_step):
+    """Worker process loop: step the region on request and report handoffs"""
+    simulation = RegionSimulation(region, grid, stations, routes, current_step)
+    simulation.receive(packed_evs)
+    while True:
+        message = conn.recv()
+        command = message[0]
+        if command == 'step':
+            _, remote_summaries, inbound = message
+            simulation.set_remote_stations(remote_summaries)
+            simulation.receive(inbound)
+            simulation.step()
+            outbound = simulation.collect_outbound()
+            conn.send((
+                outbound,
+                [station_summary(station) for station in simulation.stations],
+                simulation.metric_partials()
+            ))
+        elif command == 'snapshot':
+            conn.send((
+                [ev.to_dict() for ev in simulation.evs],
+                [station.to_dict() for station in simulation.stations]
+            ))
+        elif command == 'stop':
+            conn.close()
+            return
+
+class ShardedSimulation:
+    """
+    City simulation split into grid regions, one worker process per region
+
+    Each worker owns the stations in its region and the EVs currently in
+    it. Steps run in lockstep: at every step boundary the coordinator
+    forwards handed-off EVs to their new region, broadcasts station
+    summaries to neighbouring regions for the optimizer, and merges the
+    per-region metrics.
+    """
+
+    def __init__(self, evs, stations, routes, grid, start_method=None):
+        self.grid = grid
+        self.routes = routes
+        self.time_step = config.TIME_STEP_SECONDS
+        self.current_step = 0
+        self.metrics = {}
+        self.handoffs = 0
+
+        station_regions = grid.regions_of([station.location for station in stations]).tolist()
+        ev_regions = grid.regions_of([ev.current_position for ev in evs]).tolist()
+        regional_stations = [[] for _ in range(len(grid))]
+        for station, region in zip(stations, station_regions):
+            regional_stations[region].append(
+                ChargingStation(station.id, station.location, station.num_chargers, station.charging_rate))
+        known_routes = route_ids(routes)
+        regional_evs = [[] for _ in range(len(grid))]
+        for ev, region in zip(evs, ev_regions):
+            regional_evs[region].append(pack_ev(ev, known_routes))
+
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = 'fork' if 'fork' in methods else 'spawn'
+        context = multiprocessing.get_context(start_method)
+        self.connections = []
+        self.workers = []
+        for region in range(len(grid)):
+            parent_conn, child_conn = context.Pipe()
+            worker = context.Process(
+                target=_region_worker,
+                args=(child_conn, region, grid, regional_stations[region], routes,
+                      regional_evs[region], self.current_step)
+            )
+            worker.daemon = True
+            worker.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.workers.append(worker)
+
+        self.station_summaries = [
+            [station_summary(station) for station in regional_stations[region]]
+            for region in range(len(grid))
+        ]
+        self.inbound = [[] for _ in range(len(grid))]
+
+    def _remote_summaries(self, region):
+        return [
+            (neighbour, summary)
+            for neighbour in self.grid.neighbours(region)
+            for summary in self.station_summaries[neighbour]
+        ]
+
+    def step(self):
+        """Step every region once and exchange handoffs"""
+        for region, conn in enumerate(self.connections):
+            conn.send(('step', self._remote_summaries(region), self.inbound[region]))
+
+        inbound = [[] for _ in range(len(self.grid))]
+        partials = []
+        for region, conn in enumerate(self.connections):
+            outbound, summaries, region_metrics = conn.recv()
+            for target, packed in outbound:
+                inbound[target].append(packed)
+            self.handoffs += len(outbound)
+            self.station_summaries[region] = summaries
+            partials.append(region_metrics)
+        self.inbound = inbound
+        self.current_step += 1
+        self._merge_metrics(partials)
+
+    def run(self, steps):
+        """Run a number of steps"""
+        for _ in range(steps):
+            self.step()
+
+    def _merge_metrics(self, partials):
+        ev_count = sum(p['ev_count'] for p in partials) + sum(len(packed) for packed in self.inbound)
+        evs_with_wait = sum(p['evs_with_wait'] for p in partials)
+        station_utilization = {}
+        durations = DurationSketches()
+        for p in partials:
+            station_utilization.update(p['station_utilization'])
+            durations.merge(p['durations'])
+        self.metrics = {
+            'average_wait_time': sum(p['wait_total'] for p in partials) / evs_with_wait if evs_with_wait else 0,
+            'average_detour_distance': 0,
+            'max_queue_length': max((p['max_queue_length'] for p in partials), default=0),
+            'station_utilization': station_utilization,
+            'completion_rate': sum(p['completed'] for p in partials) / ev_count if ev_count else 0,
+            'abandoned_rate': sum(p['abandoned'] for p in partials) / ev_count if ev_count else 0,
+            'optimization_time': max((p['optimization_time'] for p in partials), default=0),
+            'wait_time_quantiles': durations.wait.summary(),
+            'charge_time_quantiles': durations.charge.summary(),
+            'region_ev_counts': [p['ev_count'] for p in partials],
+            'handoffs': self.handoffs
+        }
+
+    def get_current_state(self):
+        """Gather EVs and stations from every region (EVs in transit are not included)"""
+        for conn in self.connections:
+            conn.send(('snapshot',))
+        evs, stations = [], []
+        for conn in self.connections:
+            region_evs, region_stations = conn.recv()
+            evs.extend(region_evs)
+            stations.extend(region_stations)
+        return {
+            'step': self.current_step,
+            'evs': evs,
+            'stations': stations,
+            'metrics': self.metrics
+        }
+
+    def close(self):
+        """Stop the worker processes"""
+        for conn in self.connections:
+            try:
+                conn.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout=2.0)
+        self.connections = []
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
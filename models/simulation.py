@@ -2,33 +2,138 @@ import time
 import threading
 from datetime import datetime
 import config
-from models.optimization import optimize_charging, get_optimization_logs
+from models.arrivals import ArrivalProcess
+from models.checkpoint import CheckpointWriter, capture_state, read_checkpoint, restore_state
+from models.clock import SimulationClock
+from models.optimization import OptimizationWorker, OptimizerCache, optimize_charging, get_optimization_logs, tracer
+from models.tracing import ERROR
+from models.scheduler import OptimizationScheduler
+from models.pacing import PacingController
+from models.metrics_history import MetricsHistory
+from models.quantiles import DurationSketches
+from models.fleet_query import SpatialGrid, query_evs
+from models.clustering import ClusterIndex
 
 class Simulation:
-    def __init__(self, evs=None, stations=None, routes=None):
+    def __init__(self, evs=None, stations=None, routes=None, arrivals=None, async_optimization=None):
         self.evs = evs or []
         self.stations = stations or []
         self.routes = routes or []
         self.time_step = config.TIME_STEP_SECONDS
-        self.current_step = 0
+        # Step counter shared by reference with every EV for its timestamps
+        self.clock = SimulationClock(0, self.time_step)
+        for ev in self.evs:
+            ev.clock = self.clock
         self.running = False
         self.thread = None
-        self.metrics = {
+        self.metrics = self._initial_metrics()
+        self.step_history = []
+        # Fleet-wide wait and charge duration quantiles, fed by every station's sketches
+        self.durations = DurationSketches()
+        for station in self.stations:
+            self.durations.merge(station.durations)
+            station.durations.parent = self.durations
+        # Metric and station utilization time series over the whole run, in fixed-size ring buffers
+        self.metrics_history = MetricsHistory(
+            capacity=getattr(config, 'METRICS_HISTORY_CAPACITY', 2048),
+            factor=getattr(config, 'METRICS_HISTORY_FACTOR', 16),
+            tiers=getattr(config, 'METRICS_HISTORY_TIERS', 4),
+            ewma_alpha=getattr(config, 'METRICS_EWMA_ALPHA', 0.1)
+        )
+        self.last_optimization_step = -config.OPTIMIZATION_INTERVAL  # Force initial optimization
+        
+        # Track stalled EVs for monitoring
+        self.stalled_positions = {}  # EV ID -> {position, stall_count}
+        self.last_optimization_error = None
+        
+        # Held while stepping so checkpoints see a consistent state
+        self.lock = threading.RLock()
+        self.checkpoint_writer = CheckpointWriter()
+        self.checkpoint_interval = getattr(config, 'CHECKPOINT_INTERVAL_SECONDS', 0)
+        self.checkpoint_file = getattr(config, 'CHECKPOINT_FILE', 'simulation_checkpoint.npz')
+        self.last_checkpoint_time = time.time()
+        
+        # Optimization runs on a background thread; results are applied at the next step boundary
+        if async_optimization is None:
+            async_optimization = getattr(config, 'ASYNC_OPTIMIZATION', True)
+        self.async_optimization = async_optimization
+        self.optimizer_cache = self._new_optimizer_cache()
+        self.optimization_worker = OptimizationWorker(self.optimizer_cache)
+        self.max_optimization_lag = getattr(config, 'OPTIMIZATION_MAX_LAG_STEPS', 5)
+        
+        # Steps are paced to a target simulated-seconds-per-wall-second ratio
+        self.pacer = PacingController(
+            self.time_step,
+            speed=getattr(config, 'SIMULATION_SPEED', 600),
+            catch_up=getattr(config, 'PACING_CATCH_UP', 'burst'),
+            max_burst_steps=getattr(config, 'PACING_MAX_BURST_STEPS', 10)
+        )
+        self.wake = threading.Event()  # Interrupts the pacing sleep on stop or speed change
+        
+        # Spatial index over EV positions, rebuilt on the first query after a step
+        self.index_cell_size = getattr(config, 'EV_INDEX_CELL_DEGREES', 0.01)
+        self._ev_index = None
+        self._ev_index_key = None
+        self._evs_by_id = None
+        self._evs_by_id_key = None
+        # Map clusters, shown below CLUSTER_POINT_ZOOM
+        self.cluster_index = ClusterIndex(max_zoom=getattr(config, 'CLUSTER_MAX_ZOOM', 16))
+        self.cluster_point_zoom = getattr(config, 'CLUSTER_POINT_ZOOM', 16)
+        
+        # Rounds are triggered by fleet/station events, with the interval as a heartbeat
+        self.scheduler = OptimizationScheduler(
+            mode=getattr(config, 'OPTIMIZATION_TRIGGER', 'events'),
+            interval=config.OPTIMIZATION_INTERVAL,
+            debounce_steps=getattr(config, 'OPTIMIZATION_DEBOUNCE_STEPS', 1),
+            max_latency_steps=getattr(config, 'OPTIMIZATION_MAX_LATENCY_STEPS', 3),
+            min_batch=getattr(config, 'OPTIMIZATION_MIN_BATCH', 1)
+        )
+        
+        # Rolling fleet: trips arrive over time and finished EVs are retired to a pool
+        self.arrivals = arrivals
+        self.trips_total = len(self.evs)
+        self.completed_total = 0
+        self.abandoned_total = 0
+    
+    @staticmethod
+    def _initial_metrics():
+        return {
             'average_wait_time': 0,
             'average_detour_distance': 0,
             'max_queue_length': 0,
             'station_utilization': {},
             'completion_rate': 0,
             'abandoned_rate': 0,  # Added metric for abandoned EVs
-            'optimization_time': 0
+            'optimization_time': 0,
+            'optimization_lag_steps': 0,
+            'optimization_lag_seconds': 0,
+            'stale_assignments_dropped': 0,
+            'optimizations_skipped_busy': 0,
+            'optimizer_cache': {}
         }
-        self.step_history = []
-        self.last_optimization_step = -config.OPTIMIZATION_INTERVAL  # Force initial optimization
-        self.optimization_logs = []
-        
-        # Track stalled EVs for monitoring
-        self.stalled_positions = {}  # EV ID -> {position, stall_count}
-        self.last_optimization_error = None
+    
+    @staticmethod
+    def _new_optimizer_cache():
+        return OptimizerCache(
+            soc_tolerance=getattr(config, 'OPTIMIZATION_SOC_TOLERANCE', 0.01),
+            wait_tolerance=getattr(config, 'OPTIMIZATION_WAIT_TOLERANCE_SECONDS', 60)
+        )
+    
+    @property
+    def rolling(self):
+        return self.arrivals is not None
+    
+    def generators(self):
+        """NumPy Generators used while stepping, by name (saved in checkpoints)"""
+        return {'arrivals': self.arrivals.rng} if self.rolling else {}
+    
+    @property
+    def current_step(self):
+        return self.clock.step
+    
+    @current_step.setter
+    def current_step(self, step):
+        self.clock.step = step
     
     def start(self):
         """Start the simulation in a separate thread"""
@@ -36,6 +141,7 @@ class Simulation:
             return False
         
         self.running = True
+        self.wake.clear()
         self.thread = threading.Thread(target=self._run_simulation)
         self.thread.daemon = True
         self.thread.start()
@@ -44,26 +150,47 @@ class Simulation:
     def stop(self):
         """Stop the simulation"""
         self.running = False
+        self.wake.set()
         if self.thread:
             self.thread.join(timeout=2.0)
             self.thread = None
         return True
     
+    def set_speed(self, speed):
+        """Change the target simulated seconds per wall-clock second, also while running"""
+        self.pacer.set_speed(speed)
+        self.wake.set()
+    
     def _run_simulation(self):
         """Main simulation loop"""
+        self.pacer.start()
         while self.running:
-            # Run one step
-            self.step()
+            started = time.monotonic()
+            with self.lock:
+                # Run one step
+                self.step()
+                
+                # Record state for history
+                self._record_state()
             
-            # Record state for history
-            self._record_state()
+            # Periodic checkpoint, written off the step loop
+            if (self.checkpoint_interval and
+                    time.time() - self.last_checkpoint_time >= self.checkpoint_interval):
+                self.checkpoint(self.checkpoint_file)
             
-            # Sleep to control simulation speed (real-time factor)
-            time.sleep(0.1)  # 10 steps per second regardless of time_step value
+            # Sleep until the next step's deadline
+            delay = self.pacer.step_finished(time.monotonic() - started)
+            self.metrics['pacing'] = self.pacer.stats()
+            if delay > 0 and self.wake.wait(delay):
+                self.wake.clear()
     
     def step(self):
         """Run one simulation step"""
         try:
+            # Apply the background optimization round that finished since the last step
+            if self.async_optimization:
+                self._apply_optimization_result()
+            
             # Update EVs
             for ev in self.evs:
                 if not ev.abandoned:  # Skip abandoned EVs
@@ -108,17 +235,33 @@ class Simulation:
             evs_needing_charge = [ev for ev in self.evs if not ev.abandoned and ev.needs_charging(config.CHARGE_THRESHOLD)]
             
             # Run optimization if needed
-            if (len(evs_needing_charge) > 0 and
-                (self.current_step - self.last_optimization_step >= config.OPTIMIZATION_INTERVAL)):
+            self.scheduler.observe(self.current_step, evs_needing_charge, self.stations)
+            reason = self.scheduler.due(self.current_step, self.last_optimization_step)
+            if reason is not None:
                 
-                try:
-                    self._run_optimization(evs_needing_charge)
-                    self.last_optimization_error = None
-                except Exception as e:
-                    self.last_optimization_error = str(e)
-                    print(f"Optimization error: {e}")
+                if self.async_optimization:
+                    if self._submit_optimization(evs_needing_charge):
+                        self.last_optimization_step = self.current_step
+                        self.scheduler.round_started(self.current_step, reason)
+                    else:
+                        # Previous round still running; try again next step
+                        self.metrics['optimizations_skipped_busy'] = self.metrics.get('optimizations_skipped_busy', 0) + 1
+                else:
+                    self.scheduler.round_started(self.current_step, reason)
+                    try:
+                        self._run_optimization(evs_needing_charge)
+                        self.last_optimization_error = None
+                    except Exception as e:
+                        self.last_optimization_error = str(e)
+                        print(f"Optimization error: {e}")
                     
-                self.last_optimization_step = self.current_step
+                    self.last_optimization_step = self.current_step
+                    self.scheduler.round_finished()
+            self.metrics['optimization_scheduler'] = self.scheduler.stats()
+            
+            # Retire finished trips and admit new arrivals
+            if self.rolling:
+                self._roll_fleet()
             
             # Update metrics
             self._update_metrics()
@@ -128,38 +271,119 @@ class Simulation:
         except Exception as e:
             print(f"Error in simulation step: {e}")
     
+    def _roll_fleet(self):
+        """Retire completed/abandoned EVs into the pool and spawn this step's arrivals"""
+        active = []
+        for ev in self.evs:
+            if ev.trip_completed or ev.abandoned:
+                if ev.trip_completed:
+                    self.completed_total += 1
+                else:
+                    self.abandoned_total += 1
+                self.stalled_positions.pop(ev.id, None)
+                self.arrivals.release(ev)
+            else:
+                active.append(ev)
+        
+        arrivals = self.arrivals.spawn(self.current_step * self.time_step, self.time_step, self.clock)
+        active.extend(arrivals)
+        self.trips_total += len(arrivals)
+        # In place, so references held by the app stay valid
+        self.evs[:] = active
+    
     def _run_optimization(self, evs_needing_charge):
         """Run optimization algorithm and assign stations"""
         try:
             start_time = time.time()
             
             # Run optimizer - now returns assignments and abandoned EVs
-            assignments, abandoned_evs = optimize_charging(evs_needing_charge, self.stations)
+            assignments, abandoned_evs = optimize_charging(evs_needing_charge, self._candidate_stations(),
+                                                           cache=self.optimizer_cache)
             
             # Record optimization time
             optimization_time = time.time() - start_time
             self.metrics['optimization_time'] = optimization_time
-            
-            # Get optimization logs
-            self.optimization_logs = get_optimization_logs()
+            self.metrics['optimizer_cache'] = dict(self.optimizer_cache.last_round)
             
             # Apply assignments
             for ev in evs_needing_charge:
                 if ev.id in assignments:
-                    station_id = assignments[ev.id]
-                    # Find station
-                    for station in self.stations:
-                        if station.id == station_id:
-                            # Add EV to station queue
-                            station.add_to_queue(ev)
-                            break
+                    self._assign_station(ev, assignments[ev.id])
                 elif ev.id in abandoned_evs:
                     # Mark EV as abandoned
                     ev.abandon("No reachable charging station with current battery")
                     print(f"EV {ev.id} abandoned due to unsolvable charging situation")
         except Exception as e:
             print(f"Optimization error: {e}")
-            self.optimization_logs.append(f"Optimization error: {e}")
+            tracer.record(ERROR, 'error', values=(str(e),))
+    
+    def _submit_optimization(self, evs_needing_charge):
+        """Start a background optimization round on snapshots of the EVs and station loads"""
+        return self.optimization_worker.submit(
+            self.current_step,
+            [ev.snapshot() for ev in evs_needing_charge],
+            [station.snapshot() for station in self._candidate_stations()]
+        )
+    
+    def _apply_optimization_result(self):
+        """
+        Apply the last finished background round, discarding stale decisions
+        
+        A decision is stale if the round lagged more than
+        OPTIMIZATION_MAX_LAG_STEPS, if the EV has since left, been queued,
+        finished or abandoned, or if it can no longer reach the station.
+        Abandonments are also dropped once the EV has moved on.
+        """
+        result = self.optimization_worker.poll()
+        if result is None:
+            return
+        self.scheduler.round_finished()
+        
+        lag_steps = self.current_step - result['step']
+        self.metrics['optimization_time'] = result['optimization_time']
+        self.metrics['optimization_lag_steps'] = lag_steps
+        self.metrics['optimization_lag_seconds'] = time.time() - result['submitted_at']
+        self.metrics['optimizer_cache'] = result['cache_stats']
+        self.last_optimization_error = result['error']
+        if result['error']:
+            print(f"Optimization error: {result['error']}")
+        
+        evs_by_id = {ev.id: ev for ev in self.evs}
+        stations_by_id = {station.id: station for station in self._candidate_stations()}
+        
+        def is_stale(ev):
+            return (ev is None or lag_steps > self.max_optimization_lag or
+                    ev.charging or ev.in_queue or ev.trip_completed or ev.abandoned)
+        
+        dropped = 0
+        for ev_id, station_id in result['assignments'].items():
+            ev = evs_by_id.get(ev_id)
+            station = stations_by_id.get(station_id)
+            if is_stale(ev) or station is None or not ev.can_reach_station(station.location):
+                dropped += 1
+                continue
+            self._assign_station(ev, station_id)
+        
+        for ev_id in result['abandoned']:
+            ev = evs_by_id.get(ev_id)
+            if is_stale(ev) or ev.route_index != result['route_index'].get(ev_id):
+                dropped += 1
+                continue
+            ev.abandon("No reachable charging station with current battery")
+            print(f"EV {ev.id} abandoned due to unsolvable charging situation")
+        
+        self.metrics['stale_assignments_dropped'] = self.metrics.get('stale_assignments_dropped', 0) + dropped
+    
+    def _candidate_stations(self):
+        """Stations the optimizer may assign EVs to"""
+        return self.stations
+    
+    def _assign_station(self, ev, station_id):
+        """Add an EV to the queue of the station the optimizer picked"""
+        for station in self.stations:
+            if station.id == station_id:
+                station.add_to_queue(ev)
+                break
     
     def _update_metrics(self):
         """Update simulation metrics"""
@@ -168,13 +392,20 @@ class Simulation:
         evs_with_wait = sum(1 for ev in self.evs if ev.waiting_time > 0)
         
         # Use CURRENT maximum queue length instead of historical maximum
-        current_max_queue = max(len(station.queue) for station in self.stations)
+        current_max_queue = max((len(station.queue) for station in self.stations), default=0)
         
-        completed_trips = sum(1 for ev in self.evs if ev.trip_completed)
-        abandoned_evs = sum(1 for ev in self.evs if ev.abandoned)
+        if self.rolling:
+            # Finished EVs leave the fleet, so rates are over all trips started
+            completed_trips = self.completed_total
+            abandoned_evs = self.abandoned_total
+            trip_count = self.trips_total
+        else:
+            completed_trips = sum(1 for ev in self.evs if ev.trip_completed)
+            abandoned_evs = sum(1 for ev in self.evs if ev.abandoned)
+            trip_count = len(self.evs)
         
-        completion_rate = completed_trips / len(self.evs) if len(self.evs) > 0 else 0
-        abandoned_rate = abandoned_evs / len(self.evs) if len(self.evs) > 0 else 0
+        completion_rate = completed_trips / trip_count if trip_count > 0 else 0
+        abandoned_rate = abandoned_evs / trip_count if trip_count > 0 else 0
         
         # Update metrics dict
         self.metrics['average_wait_time'] = total_wait_time / evs_with_wait if evs_with_wait > 0 else 0
@@ -185,6 +416,21 @@ class Simulation:
         # Station utilization
         for station in self.stations:
             self.metrics['station_utilization'][station.id] = len(station.charging_evs) / station.num_chargers
+        
+        # Wait and charge duration percentiles (sessions that started or finished so far)
+        self.metrics['wait_time_quantiles'] = self.durations.wait.summary()
+        self.metrics['charge_time_quantiles'] = self.durations.charge.summary()
+        
+        if self.rolling:
+            self.metrics['active_evs'] = len(self.evs)
+            self.metrics['arrival_rate_per_hour'] = self.arrivals.rate_at(self.current_step * self.time_step)
+            self.metrics['fleet'] = {
+                **self.arrivals.stats(),
+                'completed_trips': self.completed_total,
+                'abandoned_trips': self.abandoned_total
+            }
+        
+        self.metrics_history.append(self.current_step, self.metrics)
     
     def _record_state(self):
         """Record current state for history"""
@@ -193,8 +439,7 @@ class Simulation:
             'timestamp': datetime.now().isoformat(),
             'evs': [ev.to_dict() for ev in self.evs],
             'stations': [station.to_dict() for station in self.stations],
-            'metrics': self.metrics.copy(),
-            'optimization_logs': self.optimization_logs.copy()
+            'metrics': self.metrics.copy()
         }
         self.step_history.append(state)
         
@@ -216,20 +461,246 @@ class Simulation:
         end = min(start + count, len(self.step_history))
         return self.step_history[start:end]
     
-    def get_optimization_logs(self):
-        """Get current optimization logs"""
-        return self.optimization_logs
+    def get_metrics_history(self, start=None, end=None, start_time=None, end_time=None, **options):
+        """
+        Downsampled metric series over a step range (see MetricsHistory.query)
+        
+        `start_time`/`end_time` give the range in simulated seconds since
+        step 0 instead of steps.
+        """
+        if start_time is not None:
+            start = int(start_time // self.time_step)
+        if end_time is not None:
+            end = int(end_time // self.time_step)
+        with self.lock:
+            return self.metrics_history.query(start, end, **options)
+    
+    def get_duration_quantiles(self, quantiles, station_ids=None):
+        """
+        Wait and charge duration quantiles, fleet-wide or merged over some stations
+        
+        Args:
+            quantiles: Quantiles to report (0-1)
+            station_ids: Stations to merge, or None for the whole fleet
+        
+        Returns:
+            dict: 'count' and 'quantiles' {q: seconds} for 'wait_time' and 'charge_time'
+        """
+        with self.lock:
+            if station_ids is None:
+                durations = self.durations
+            else:
+                by_id = {station.id: station for station in self.stations}
+                unknown = [station_id for station_id in station_ids if station_id not in by_id]
+                if unknown:
+                    raise ValueError(f"Unknown stations: {', '.join(unknown)}")
+                durations = DurationSketches()
+                for station_id in station_ids:
+                    durations.merge(by_id[station_id].durations)
+            return {
+                name: {'count': sketch.count, 'quantiles': {str(q): sketch.quantile(q) for q in quantiles}}
+                for name, sketch in (('wait_time', durations.wait), ('charge_time', durations.charge))
+            }
+    
+    def get_metric_aggregates(self, window, metrics=None):
+        """Rolling mean and max over the last `window` steps, and EWMA (see MetricsHistory.rolling)"""
+        with self.lock:
+            return self.metrics_history.rolling(window, metrics)
+    
+    def ev_index(self):
+        """(EVs, SpatialGrid over their current positions) as of the current step"""
+        key = (self.current_step, len(self.evs))
+        if self._ev_index is None or self._ev_index_key != key:
+            evs = list(self.evs)
+            self._ev_index = (evs, SpatialGrid([ev.current_position for ev in evs], self.index_cell_size))
+            self._ev_index_key = key
+        return self._ev_index
+    
+    def query_evs(self, bbox=None, **options):
+        """Query EVs by bounding box, status and page (see fleet_query.query_evs)"""
+        with self.lock:
+            evs, index = self.ev_index() if bbox is not None else (self.evs, None)
+            return query_evs(evs, index, bbox, **options)
+    
+    def map_view(self, zoom, bbox=None, fields=None):
+        """
+        What the map shows at a zoom level: clusters of EVs and stations, or
+        (from `cluster_point_zoom` up) the individual EVs and stations in view
+        """
+        with self.lock:
+            if zoom >= self.cluster_point_zoom:
+                stations = [
+                    station.to_dict() for station in self.stations
+                    if bbox is None or (bbox[0] <= station.location[0] <= bbox[2] and
+                                        bbox[1] <= station.location[1] <= bbox[3])
+                ]
+                page = self.query_evs(bbox=bbox, fields=fields, limit=max(len(self.evs), 1))
+                return {'zoom': zoom, 'points': True, 'evs': page['evs'], 'stations': stations}
+            
+            self.cluster_index.update(self.evs, self.stations, (self.current_step, len(self.evs)))
+            return {
+                'zoom': zoom,
+                'points': False,
+                'ev_clusters': self.cluster_index.ev_clusters(zoom, bbox),
+                'station_clusters': self.cluster_index.station_clusters(zoom, bbox)
+            }
+    
+    def get_optimization_logs(self, limit=100):
+        """Get the most recent optimizer decisions as log lines"""
+        return get_optimization_logs(limit)
+    
+    def get_decision_trace(self, **filters):
+        """Query optimizer decision records (see DecisionTracer.query)"""
+        return tracer.query(**filters)
+    
+    def ev_by_id(self, ev_id):
+        """The EV with this ID, or None (the lookup table is rebuilt when the fleet changes)"""
+        key = (self.current_step, len(self.evs))
+        if self._evs_by_id is None or self._evs_by_id_key != key:
+            self._evs_by_id = {ev.id: ev for ev in self.evs}
+            self._evs_by_id_key = key
+        return self._evs_by_id.get(ev_id)
     
     def get_ev_journey_log(self, ev_id):
         """Get journey log for a specific EV"""
-        for ev in self.evs:
-            if ev.id == ev_id:
-                return ev.journey_log
-        return []
+        with self.lock:
+            ev = self.ev_by_id(ev_id)
+            return list(ev.journey_log) if ev else []
+    
+    def get_journey_events(self, cursors, limit=None):
+        """
+        Journey log entries added since each EV's cursor
+        
+        Args:
+            cursors: {ev_id: sequence number of the last entry seen, or None for all}
+            limit: Maximum entries per EV
+        
+        Returns:
+            dict: {ev_id: EV.journey_since result}; unknown IDs are left out
+        """
+        with self.lock:
+            deltas = {}
+            for ev_id, since in cursors.items():
+                ev = self.ev_by_id(ev_id)
+                if ev is not None:
+                    deltas[ev_id] = ev.journey_since(since, limit)
+            return deltas
+    
+    def checkpoint(self, path, background=True):
+        """
+        Write the complete simulation state to a checkpoint file
+        
+        The state is captured under the step lock (cheap: containers are
+        copied, immutable entries shared) and encoded and written on a
+        background thread, so the step loop is only paused for the capture.
+        
+        Returns:
+            bool: False if a previous background checkpoint is still being written
+        """
+        if self.checkpoint_writer.busy():
+            return False
+        
+        start_time = time.time()
+        with self.lock:
+            state = capture_state(self)
+        capture_time = time.time() - start_time
+        self.last_checkpoint_time = time.time()
+        
+        self.checkpoint_writer.submit(state, path, capture_time)
+        if not background:
+            self.checkpoint_writer.wait()
+        return True
+    
+    def get_checkpoint_status(self):
+        """Get details of the last written checkpoint"""
+        return {
+            'in_progress': self.checkpoint_writer.busy(),
+            'last': self.checkpoint_writer.last_result
+        }
+    
+    @classmethod
+    def restore(cls, path):
+        """Create a simulation from a checkpoint file, including its generator states"""
+        simulation = cls._from_parts(*read_checkpoint(path))
+        
+        # Seed history with the restored state so the dashboard has something to show
+        simulation._record_state()
+        return simulation
+    
+    @classmethod
+    def _create(cls, evs, stations, routes, arrivals, **options):
+        """New instance for _from_parts; subclasses with another constructor override this"""
+        return cls(evs, stations, routes, arrivals=arrivals, **options)
+    
+    def _fork_options(self):
+        """Options fork passes through _from_parts to _create"""
+        return {'async_optimization': False}
+    
+    @classmethod
+    def _from_parts(cls, evs, stations, routes, state, rng_state, **options):
+        """Simulation over restored EVs and stations, with counters and generator states from `state`"""
+        arrivals = None
+        if state['arrivals'] is not None:
+            arrivals = ArrivalProcess.from_state(routes, state['arrivals'])
+        
+        simulation = cls._create(evs, stations, routes, arrivals, **options)
+        simulation.trips_total = state['trips_total']
+        simulation.completed_total = state['completed_total']
+        simulation.abandoned_total = state['abandoned_total']
+        simulation.time_step = state['time_step']
+        simulation.clock.time_step = state['time_step']
+        simulation.current_step = state['current_step']
+        simulation.last_optimization_step = state['last_optimization_step']
+        simulation.last_optimization_error = state['last_optimization_error']
+        simulation.metrics = state['metrics']
+        simulation.stalled_positions = {
+            ev_id: {**entry, 'position': tuple(entry['position'])}
+            for ev_id, entry in state['stalled_positions'].items()
+        }
+        
+        for name, generator in simulation.generators().items():
+            if name in rng_state:
+                generator.bit_generator.state = rng_state[name]
+        return simulation
+    
+    def fork(self):
+        """
+        Independent copy of the current state, for what-if runs
+        
+        Built from an in-memory capture (see capture_state), so route point
+        lists and journey log entries are shared rather than copied. The
+        copy optimizes inline and can be stepped headlessly without
+        touching this simulation; see models.whatif for running scenarios
+        on forks in parallel.
+        """
+        with self.lock:
+            state = capture_state(self)
+        return type(self)._from_parts(*restore_state(state), **self._fork_options())
     
     def reset(self):
         """Reset simulation to initial state"""
         self.stop()
+        self.optimization_worker.discard()
+        # Cached scores refer to the pre-reset EVs and station loads
+        self.optimizer_cache = self._new_optimizer_cache()
+        self.optimization_worker.cache = self.optimizer_cache
+        self.scheduler.reset()
+        self._ev_index = None
+        self._evs_by_id = None
+        self.cluster_index.key = None
+        self.metrics_history.clear()
+        self.metrics = self._initial_metrics()
+        self.pacer.reset()
+        self.current_step = 0
+        
+        if self.rolling:
+            # A rolling fleet restarts empty and fills up from arrivals
+            for ev in self.evs:
+                self.arrivals.release(ev)
+            self.evs[:] = []
+            self.trips_total = 0
+            self.completed_total = 0
+            self.abandoned_total = 0
         
         # Reset EVs
         for ev in self.evs:
@@ -242,7 +713,12 @@ class Simulation:
             ev.waiting_time = 0
             ev.trip_completed = False
             ev.abandoned = False
-            ev.journey_log = []
+            ev.target_soc = 0.8
+            ev.queue_arrival_time = None
+            ev.charging_start_time = None
+            ev.trip_start_time = 0
+            ev.trip_end_time = None
+            ev.restart_journey_log()
             # Record initialization
             ev._log_event("Initialized", {
                 "origin_node": f"Node at {ev.origin}",
@@ -259,10 +735,11 @@ class Simulation:
             station.total_served = 0
             station.total_wait_time = 0
             station.max_queue_length = 0
+            station.durations.clear()
+        self.durations.clear()
         
-        self.current_step = 0
         self.step_history = []
-        self.optimization_logs = []
+        tracer.clear()
         self.last_optimization_step = -config.OPTIMIZATION_INTERVAL
         
         # Reset stalled EVs
@@ -1,7 +1,13 @@
 import uuid
 from collections import deque
+from models.quantiles import DurationSketches
 
 class ChargingStation:
+    __slots__ = (
+        'id', 'location', 'num_chargers', 'charging_rate', 'charging_evs', 'queue',
+        'total_served', 'total_wait_time', 'max_queue_length', 'version', 'durations'
+    )
+    
     def __init__(self, id=None, location=None, num_chargers=2, charging_rate=7.0):
         self.id = id or str(uuid.uuid4())
         self.location = location  # (lat, lng)
@@ -14,11 +20,14 @@ class ChargingStation:
         self.total_served = 0  # Total number of EVs served
         self.total_wait_time = 0  # Total wait time of all EVs
         self.max_queue_length = 0  # Maximum queue length observed
+        self.version = 0  # Bumped whenever the queue or the set of charging EVs changes
+        self.durations = DurationSketches()  # Wait and charge duration quantiles
     
     def add_to_queue(self, ev):
         """Add an EV to the charging queue"""
         self.queue.append(ev)
         ev.join_queue(self)
+        self.version += 1
         
         # Update max queue length stat
         if len(self.queue) > self.max_queue_length:
@@ -35,11 +44,13 @@ class ChargingStation:
         # Update wait time statistics
         wait_time = ev.waiting_time
         self.total_wait_time += wait_time
+        self.durations.record_wait(wait_time)
         
         # Start charging
         ev.start_charging(self)
         self.charging_evs.append(ev)
         self.total_served += 1
+        self.version += 1
         
         return True
     
@@ -58,6 +69,8 @@ class ChargingStation:
         # Remove finished EVs
         for ev in evs_finished:
             self.charging_evs.remove(ev)
+            self.version += 1
+            self.durations.record_charge(ev.clock.seconds_since(ev.charging_start_time))
             
         # Start charging EVs from queue if possible
         while len(self.charging_evs) < self.num_chargers and self.queue:
@@ -107,6 +120,18 @@ class ChargingStation:
         """Get current queue length"""
         return len(self.queue)
     
+    def get_charging_count(self):
+        """Get number of EVs currently charging"""
+        return len(self.charging_evs)
+    
+    def snapshot(self):
+        """Read-only view of the station's current load, for optimizers running elsewhere"""
+        return StationSnapshot((
+            self.id, self.location, self.num_chargers, self.charging_rate,
+            self.get_queue_length(), self.get_charging_count(),
+            self.get_current_wait_time_estimate(), self.version
+        ))
+    
     def to_dict(self):
         """Convert station to dictionary for API response"""
         return {
@@ -117,5 +142,33 @@ class ChargingStation:
             'charging_evs': [ev.id for ev in self.charging_evs],
             'queue_length': len(self.queue),  # Current queue length
             'total_served': self.total_served,
-            'average_wait_time': self.total_wait_time / self.total_served if self.total_served > 0 else 0
-        }
\ No newline at end of file
+            'average_wait_time': self.total_wait_time / self.total_served if self.total_served > 0 else 0,
+            'wait_time_quantiles': self.durations.wait.summary(),
+            'charge_time_quantiles': self.durations.charge.summary()
+        }
+
+class StationSnapshot:
+    """
+    Station state frozen at one point in time
+
+    Built from a (id, location, num_chargers, charging_rate, queue length,
+    charging count, wait estimate, version) tuple and exposes the methods
+    the optimizer uses to score a station.
+    """
+    __slots__ = (
+        'id', 'location', 'num_chargers', 'charging_rate',
+        'queue_length', 'charging_count', 'wait_estimate', 'version'
+    )
+    
+    def __init__(self, summary):
+        (self.id, self.location, self.num_chargers, self.charging_rate,
+         self.queue_length, self.charging_count, self.wait_estimate, self.version) = summary
+    
+    def get_current_wait_time_estimate(self):
+        return self.wait_estimate
+    
+    def get_queue_length(self):
+        return self.queue_length
+    
+    def get_charging_count(self):
+        return self.charging_count
\ No newline at end of file
@@ -0,0 +1,138 @@
+import itertools
+import logging
+import time
+import zlib
+from collections import deque
+
+# Trace levels, shared with the logging module
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+# Message of each record kind; values are only formatted when a record is read
+MESSAGES = {
+    'round_start': "Starting optimization for {0} EVs and {1} stations",
+    'ev': "Optimizing for EV {ev} - Current SoC: {0:.2f}",
+    'skip': "EV {ev} skipped: {0}",
+    'candidates': "Found {0} reachable stations for EV {ev}",
+    'score': ("Station {station} score for EV {ev}: travel={0:.1f}s, wait={1:.1f}s, "
+              "charge={2:.1f}s, total={3:.1f}s, on_route={4}"),
+    'assign': "Assigned EV {ev} to station {station} with total time: {0:.1f}s",
+    'abandon': "EV {ev} marked as abandoned: {0}",
+    'error': "Optimization error: {0}",
+    'round_end': ("Optimization completed in {0:.3f} seconds: assigned {1} of {2} EVs, "
+                  "{3} abandoned, scored {4} EV-station pairs, reused {5}")
+}
+
+class DecisionTracer:
+    """
+    Bounded ring buffer of compact optimizer decision records
+
+    Records are (seq, round, time, level, kind, ev_id, station_id, values)
+    tuples; nothing is formatted until they are queried. Callers check
+    `level` (and `sampled()` for per-EV records) before building a record,
+    so disabled levels cost a comparison. Sampling is by EV ID, so a
+    sampled EV's records are kept in every round.
+    """
+
+    def __init__(self, level=INFO, sample_rate=1.0, capacity=5000):
+        self.level = level
+        self.sample_rate = sample_rate
+        self.records = deque(maxlen=capacity)
+        self.round = 0
+        self._seq = itertools.count(1)
+        self.last_seq = 0
+
+    def configure(self, level=None, sample_rate=None, capacity=None):
+        """Change the level (int or name), sampling rate or buffer size"""
+        if level is not None:
+            self.level = parse_level(level)
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if capacity is not None and capacity != self.records.maxlen:
+            self.records = deque(self.records, maxlen=capacity)
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def sampled(self, ev_id):
+        """Whether per-EV records are kept for this EV"""
+        if self.sample_rate >= 1.0:
+            return True
+        return zlib.crc32(str(ev_id).encode()) < self.sample_rate * 0xFFFFFFFF
+
+    def begin_round(self):
+        self.round += 1
+        return self.round
+
+    def record(self, level, kind, ev_id=None, station_id=None, values=()):
+        self.last_seq = next(self._seq)
+        self.records.append((self.last_seq, self.round, time.time(), level, kind, ev_id, station_id, values))
+
+    def clear(self):
+        self.records.clear()
+
+    def query(self, ev_id=None, station_id=None, kind=None, min_level=None, since=0, limit=100):
+        """Most recent `limit` matching records newer than sequence number `since`, oldest first"""
+        if isinstance(min_level, str):
+            min_level = parse_level(min_level)
+        matches = []
+        # list() copies the deque in one go, so a round running on another thread can't break iteration
+        for record in reversed(list(self.records)):
+            if record[0] <= since or len(matches) >= limit:
+                break
+            if ((ev_id is not None and record[5] != ev_id) or
+                    (station_id is not None and record[6] != station_id) or
+                    (kind is not None and record[4] != kind) or
+                    (min_level is not None and record[3] < min_level)):
+                continue
+            matches.append(record_to_dict(record))
+        matches.reverse()
+        return matches
+
+    def format_lines(self, limit=100):
+        """The last `limit` records as log lines"""
+        records = list(self.records)[-limit:]
+        return [format_record(record) for record in records]
+
+    def stats(self):
+        return {
+            'level': logging.getLevelName(self.level),
+            'sample_rate': self.sample_rate,
+            'capacity': self.records.maxlen,
+            'records': len(self.records),
+            'last_seq': self.last_seq,
+            'round': self.round
+        }
+
+def parse_level(level):
+    """Level number from an int or a name such as 'DEBUG'"""
+    if isinstance(level, str):
+        value = logging.getLevelName(level.upper())
+        if not isinstance(value, int):
+            raise ValueError(f"Unknown trace level {level}")
+        return value
+    return int(level)
+
+def record_message(record):
+    _, _, _, _, kind, ev_id, station_id, values = record
+    return MESSAGES[kind].format(*values, ev=ev_id, station=station_id)
+
+def record_to_dict(record):
+    seq, round_number, timestamp, level, kind, ev_id, station_id, values = record
+    return {
+        'seq': seq,
+        'round': round_number,
+        'time': timestamp,
+        'level': logging.getLevelName(level),
+        'kind': kind,
+        'ev_id': ev_id,
+        'station_id': station_id,
+        'values': list(values),
+        'message': record_message(record)
+    }
+
+def format_record(record):
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record[2]))
+    return f"{timestamp} - {logging.getLevelName(record[3])} - {record_message(record)}"
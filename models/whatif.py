@@ -0,0 +1,154 @@
+import contextlib
+import multiprocessing
+import os
+import time
+import config
+from models.checkpoint import capture_state, restore_state
+from models.optimization import tracer
+from models.simulation import Simulation
+
+# Metrics sampled into a trajectory after every step
+TRAJECTORY_METRICS = ('average_wait_time', 'max_queue_length', 'completion_rate', 'abandoned_rate')
+
+# State captured by run_what_ifs, with the simulation class and its fork options, inherited by forked workers
+_base_state = None
+_base_class = Simulation
+_base_options = {'async_optimization': False}
+
+def apply_scenario(simulation, scenario):
+    """
+    Modify a forked simulation for a what-if scenario
+
+    Scenario keys (all optional):
+        stations_down: Station IDs taken offline; their queued and
+            charging EVs are released and re-optimized
+        add_chargers: {station_id: chargers to add (negative removes)}
+        charging_rate: {station_id: new charging rate in kW}
+        demand_scale: Multiplier on the trip arrival rate (rolling fleets)
+    """
+    by_id = {station.id: station for station in simulation.stations}
+    referenced = (list(scenario.get('stations_down', ())) + list(scenario.get('add_chargers', {})) +
+                  list(scenario.get('charging_rate', {})))
+    unknown = [station_id for station_id in referenced if station_id not in by_id]
+    if unknown:
+        raise ValueError(f"Unknown stations: {', '.join(unknown)}")
+
+    for station_id, count in scenario.get('add_chargers', {}).items():
+        station = by_id[station_id]
+        station.num_chargers = max(station.num_chargers + int(count), 0)
+        station.version += 1
+    for station_id, rate in scenario.get('charging_rate', {}).items():
+        by_id[station_id].charging_rate = float(rate)
+        by_id[station_id].version += 1
+
+    down = set(scenario.get('stations_down', ()))
+    for station_id in down:
+        station = by_id[station_id]
+        for ev in list(station.charging_evs) + list(station.queue):
+            ev.charging = False
+            ev.in_queue = False
+            ev.assigned_station = None
+            ev.queue_arrival_time = None
+        station.charging_evs = []
+        station.queue.clear()
+        simulation.metrics['station_utilization'].pop(station_id, None)
+    if down:
+        simulation.stations = [station for station in simulation.stations if station.id not in down]
+
+    demand_scale = scenario.get('demand_scale')
+    if demand_scale is not None:
+        if not simulation.rolling:
+            raise ValueError("demand_scale needs a rolling fleet")
+        simulation.arrivals.hourly_rates = simulation.arrivals.hourly_rates * float(demand_scale)
+
+def fast_forward(simulation, steps):
+    """
+    Step a forked simulation headlessly and sample its metrics
+
+    Returns:
+        dict: 'start_step', 'steps' and one list per TRAJECTORY_METRICS
+        entry, plus 'total_queued', 'wait_time_p95' and the 'final' metrics
+    """
+    trajectory = {name: [] for name in ('steps',) + TRAJECTORY_METRICS + ('total_queued', 'wait_time_p95')}
+    trajectory['start_step'] = simulation.current_step
+    for _ in range(steps):
+        simulation.step()
+        metrics = simulation.metrics
+        trajectory['steps'].append(simulation.current_step)
+        for name in TRAJECTORY_METRICS:
+            trajectory[name].append(metrics.get(name, 0))
+        trajectory['total_queued'].append(sum(len(station.queue) for station in simulation.stations))
+        trajectory['wait_time_p95'].append(metrics['wait_time_quantiles']['p95'])
+    trajectory['final'] = {
+        name: simulation.metrics.get(name, 0) for name in TRAJECTORY_METRICS
+    }
+    trajectory['final']['wait_time_quantiles'] = simulation.metrics.get('wait_time_quantiles')
+    return trajectory
+
+def _run_on_state(state, scenario, steps, cls=Simulation, options=None):
+    started = time.perf_counter()
+    if options is None:
+        options = {'async_optimization': False}
+    simulation = cls._from_parts(*restore_state(state), **options)
+    apply_scenario(simulation, scenario)
+    result = fast_forward(simulation, steps)
+    result['name'] = scenario.get('name')
+    result['elapsed_seconds'] = time.perf_counter() - started
+    return result
+
+def _init_worker(state, cls, options):
+    global _base_state, _base_class, _base_options
+    _base_state = state
+    _base_class = cls
+    _base_options = options
+    # Forecasts don't need the optimizer's decision trace
+    tracer.configure(level='CRITICAL')
+
+def _run_scenario(task):
+    scenario, steps = task
+    # The simulation logs to stdout; keep forecast runs out of the server log
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            return _run_on_state(_base_state, scenario, steps, _base_class, _base_options)
+        except ValueError as e:
+            return {'name': scenario.get('name'), 'error': str(e)}
+
+def run_what_ifs(simulation, scenarios, steps, workers=None, start_method=None):
+    """
+    Fast-forward forks of the current state under several scenarios in parallel
+
+    The state is captured once under the step lock and worker processes
+    are forked while it is still held, so they inherit it copy-on-write
+    instead of receiving a pickled copy (with 'spawn', where fork is
+    unavailable, it is pickled to each worker). Each scenario then runs
+    on its own restored copy; the live run is never touched.
+
+    Args:
+        simulation: Live simulation to fork
+        scenarios: List of scenario dicts (see apply_scenario), optionally
+            with a 'name'
+        steps: Steps to fast-forward
+        workers: Worker processes (WHATIF_WORKERS, at most one per scenario)
+
+    Returns:
+        list: One fast_forward result per scenario, in order, with 'name'
+        and 'elapsed_seconds' (or 'error')
+    """
+    if not scenarios:
+        return []
+    if workers is None:
+        workers = getattr(config, 'WHATIF_WORKERS', os.cpu_count() or 1)
+    workers = max(1, min(workers, len(scenarios)))
+    if start_method is None:
+        start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(start_method)
+
+    tasks = [(scenario, steps) for scenario in scenarios]
+    with simulation.lock:
+        state = capture_state(simulation)
+        pool = context.Pool(workers, initializer=_init_worker,
+                            initargs=(state, type(simulation), simulation._fork_options()))
+    try:
+        return pool.map(_run_scenario, tasks)
+    finally:
+        pool.terminate()
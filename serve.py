@@ -0,0 +1,248 @@
+"""
+Multi-process serving: one simulation process and several stateless HTTP workers
+
+The simulation process runs the full app (app.py) with the simulation
+thread and publishes the hot read endpoints into a shared-memory segment
+(utils/shared_state.py) after every step. The workers share one listening
+socket and answer those endpoints straight from the segment, so dashboard
+polling doesn't compete with the step loop for its interpreter; every
+other request (start/stop/reset/generate, journeys, metric queries, ...)
+is passed to the simulation process over a local connection.
+
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 5000] [--no-cache]
+"""
+from flask import Flask, Response, jsonify, render_template, request
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from werkzeug.serving import make_server
+import config
+from utils import transport
+from utils.shared_state import SharedState
+
+# Endpoints answered from the segment: path -> (blob name, whether a columnar rendering is published)
+PUBLISHED = {
+    '/api/ready': ('ready', False),
+    '/api/simulation/state': ('state', True),
+    '/api/stations': ('stations', False),
+    '/api/optimization/logs': ('logs', False)
+}
+
+# Request and response headers passed through to the simulation process
+FORWARDED_REQUEST_HEADERS = ('Accept', 'Accept-Encoding', 'Content-Type')
+FORWARDED_RESPONSE_HEADERS = ('Content-Type', 'Content-Encoding', 'Vary')
+
+worker = Flask(__name__)
+
+# Set in each worker process by run_worker
+serving = {'state': None, 'address': None, 'authkey': None}
+connections = threading.local()
+
+def render_blobs(client):
+    """Published endpoints rendered through the app, plus gzip copies of large bodies"""
+    blobs = {}
+    compression = getattr(config, 'TRANSPORT_COMPRESSION', True)
+    level = getattr(config, 'TRANSPORT_COMPRESS_LEVEL', 6)
+    for path, (name, columnar) in PUBLISHED.items():
+        renderings = [(name, transport.JSON)]
+        if columnar:
+            renderings.append((name + '.columnar', transport.COLUMNAR))
+        for blob, mimetype in renderings:
+            response = client.get(path, headers={'Accept': mimetype})
+            if mimetype != transport.JSON and response.status_code != 200:
+                continue
+            body = response.get_data()
+            blobs[blob] = (body, response.mimetype, response.status_code)
+            if compression and len(body) >= transport.MIN_COMPRESS_BYTES:
+                compressed, _ = transport.compress(body, {'gzip': 1}, level=level)
+                blobs[blob + '.gzip'] = (compressed, response.mimetype, response.status_code)
+    return blobs
+
+def publish_loop(main, state, changed):
+    """Publish whenever the step, the simulation or the load status changes (or a write came in)"""
+    client = main.app.test_client()
+    interval = getattr(config, 'SERVE_PUBLISH_INTERVAL', 0.05)
+    last = None
+    warned = False
+    while True:
+        changed.wait(interval)
+        forced = changed.is_set()
+        changed.clear()
+        simulation = main.simulation
+        key = (id(simulation), simulation.current_step if simulation else None, main.load_state['status'])
+        if key == last and not forced:
+            continue
+        blobs = render_blobs(client)
+        meta = {'step': key[1], 'status': key[2], 'published_at': time.time()}
+        # An oversized state isn't rendered again until it changes
+        last = key
+        if not state.publish(blobs, meta):
+            # Withdraw the previous blobs so workers forward these endpoints instead of serving stale ones
+            state.publish({}, meta)
+            if not warned:
+                print(f"Published state doesn't fit in {state.capacity} bytes; raise SERVE_SHM_SIZE")
+                warned = True
+
+def handle_connection(main, connection, changed):
+    """Answer forwarded requests on one worker connection until it closes"""
+    client = main.app.test_client()
+    with connection:
+        while True:
+            try:
+                method, path, headers, body = connection.recv()
+            except (EOFError, OSError):
+                return
+            response = client.open(path, method=method, headers=headers, data=body)
+            if method != 'GET':
+                changed.set()
+            connection.send((
+                response.status_code,
+                [(key, value) for key, value in response.headers if key in FORWARDED_RESPONSE_HEADERS],
+                response.get_data()
+            ))
+
+def run_simulation(state_name, listener, use_cache):
+    """Simulation process: load data, accept worker connections and publish state"""
+    import app as main
+    state = SharedState.attach(state_name)
+    changed = threading.Event()
+
+    def accept():
+        while True:
+            connection = listener.accept()
+            threading.Thread(target=handle_connection, args=(main, connection, changed), daemon=True).start()
+
+    main.load_options['use_cache'] = use_cache
+    main.start_background_load(use_cache=use_cache)
+    threading.Thread(target=accept, daemon=True).start()
+    publish_loop(main, state, changed)
+
+def forward():
+    """Pass the current request to the simulation process and relay its response"""
+    path = request.full_path if request.query_string else request.path
+    headers = {key: request.headers[key] for key in FORWARDED_REQUEST_HEADERS if key in request.headers}
+    message = (request.method, path, headers, request.get_data())
+    for attempt in range(2):
+        connection = getattr(connections, 'connection', None)
+        try:
+            if connection is None:
+                connection = connections.connection = Client(serving['address'], authkey=serving['authkey'])
+            connection.send(message)
+        except (EOFError, OSError):
+            # Not delivered: safe to retry on a new connection
+            connections.connection = None
+            continue
+        try:
+            status, response_headers, body = connection.recv()
+            return Response(body, status=status, headers=response_headers)
+        except (EOFError, OSError):
+            connections.connection = None
+            # The request may have run already; only repeat reads
+            if request.method != 'GET':
+                break
+    return jsonify({'error': 'Simulation process is not reachable'}), 502
+
+def serve_published(path):
+    """Answer a published endpoint from the segment, or forward it if nothing is published yet"""
+    name, columnar = PUBLISHED[path]
+    mimetype = transport.negotiate(request.accept_mimetypes, columnar=columnar)
+    if mimetype == transport.COLUMNAR:
+        name += '.columnar'
+    elif mimetype != transport.JSON:
+        return forward()
+
+    encoding = None
+    published = None
+    try:
+        if getattr(config, 'TRANSPORT_COMPRESSION', True) and request.accept_encodings['gzip']:
+            published = serving['state'].read(name + '.gzip')
+            encoding = 'gzip'
+        if published is None:
+            published = serving['state'].read(name)
+            encoding = None
+    except TimeoutError:
+        # Publishes kept overlapping the read; let the simulation process answer
+        return forward()
+    if published is None:
+        return forward()
+
+    body, body_mimetype, status, meta = published
+    response = Response(body, status=status, mimetype=body_mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['X-Simulation-Step'] = str(meta.get('step'))
+    response.vary.add('Accept')
+    response.vary.add('Accept-Encoding')
+    return response
+
+@worker.route('/')
+def index():
+    """Render main page"""
+    return render_template('index.html', api_key=config.GOOGLE_MAPS_API_KEY)
+
+for published_path in PUBLISHED:
+    worker.add_url_rule(published_path, published_path, lambda path=published_path: serve_published(path))
+
+@worker.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+def forwarded(path):
+    """Everything that isn't published goes to the simulation process"""
+    return forward()
+
+def run_worker(state_name, address, authkey, host, port, fd):
+    """Worker process: serve HTTP on the shared listening socket"""
+    serving['state'] = SharedState.attach(state_name)
+    serving['address'] = address
+    serving['authkey'] = authkey
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    make_server(host, port, worker, threaded=True, fd=fd).serve_forever()
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='EV Queue multi-process server')
+    parser.add_argument('--workers', type=int, default=getattr(config, 'SERVE_WORKERS', 4),
+                        help='HTTP worker processes')
+    parser.add_argument('--no-cache', action='store_true', help='Disable data caching')
+    parser.add_argument('--host', default=config.HOST, help='Host to bind (default from config)')
+    parser.add_argument('--port', type=int, default=config.PORT, help='Port to bind (default from config)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    context = multiprocessing.get_context('fork')
+    state = SharedState.create(getattr(config, 'SERVE_SHM_SIZE', 64 * 1024 * 1024))
+    authkey = os.urandom(16)
+    listener = Listener(authkey=authkey)
+
+    server_socket = socket.create_server((args.host, args.port), backlog=128)
+    # Not a daemon: the simulation process starts its own workers for what-if forecasts
+    simulation_process = context.Process(target=run_simulation, args=(state.name, listener, not args.no_cache))
+    simulation_process.start()
+    workers = [
+        context.Process(target=run_worker, args=(state.name, listener.address, authkey, args.host, args.port,
+                                                 server_socket.fileno()), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for process in workers:
+        process.start()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+
+    signal.signal(signal.SIGTERM, lambda *_: simulation_process.terminate())
+    try:
+        simulation_process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in workers + [simulation_process]:
+            process.terminate()
+        server_socket.close()
+        listener.close()
+        state.close()
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,12 @@
 let waitTimeChart;
 let queueLengthChart;
 
-// Recent data for charts
-const maxDataPoints = 30;
-const waitTimeData = new Array(maxDataPoints).fill(0);
-const queueLengthData = new Array(maxDataPoints).fill(0);
-const labels = new Array(maxDataPoints).fill('');
+// Points per chart; the server downsamples the whole run to this many
+const maxDataPoints = 120;
+const waitTimeData = [];
+const queueLengthData = [];
+const labels = [];
+let chartRequestPending = false;
 
 // Initialize charts
 document.addEventListener('DOMContentLoaded', function() {
@@ -15,9 +16,10 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // Create the charts
 function initCharts() {
-    // Fill data with zeros
-    waitTimeData.fill(0);
-    queueLengthData.fill(0);
+    // Clear previous data
+    waitTimeData.length = 0;
+    queueLengthData.length = 0;
+    labels.length = 0;
     
     // Wait Time Chart
     const waitTimeCtx = document.getElementById('waitTimeChart').getContext('2d');
@@ -94,25 +96,33 @@ function initCharts() {
     });
 }
 
-// Update charts with new data
+// Update charts from the downsampled metrics history
 function updateCharts(data) {
-    // Shift data out if we've reached max points
-    if (waitTimeData.length >= maxDataPoints) {
-        waitTimeData.shift();
-        queueLengthData.shift();
-        labels.shift();
+    if (chartRequestPending) {
+        return;
     }
+    chartRequestPending = true;
     
-    // Add new data points
-    const waitTimeMinutes = data.metrics.average_wait_time / 60;
-    waitTimeData.push(waitTimeMinutes);
-    
-    queueLengthData.push(data.metrics.max_queue_length);
-    
-    // Add step number as label
-    labels.push(data.step);
-    
-    // Update charts
-    waitTimeChart.update();
-    queueLengthChart.update();
-}
\ No newline at end of file
+    fetch(`/api/metrics/history?metrics=average_wait_time,max_queue_length&points=${maxDataPoints}&method=minmax`)
+    .then(response => response.json())
+    .then(history => {
+        if (!history.series) {
+            return;
+        }
+        const waitTime = history.series.average_wait_time;
+        const queueLength = history.series.max_queue_length;
+        
+        // Replace the arrays' contents in place; the charts hold references to them
+        labels.splice(0, labels.length, ...waitTime.steps);
+        waitTimeData.splice(0, waitTimeData.length, ...waitTime.mean.map(seconds => seconds / 60));
+        // Peaks matter for queue length, so plot each bucket's maximum
+        queueLengthData.splice(0, queueLengthData.length, ...queueLength.max);
+        
+        waitTimeChart.update();
+        queueLengthChart.update();
+    })
+    .catch(error => console.error('Error loading metrics history:', error))
+    .finally(() => {
+        chartRequestPending = false;
+    });
+}
@@ -5,6 +5,11 @@ let journeyTimeline;
 // Global variables
 let currentSelectedEV = null;
 let evList = [];
+let journeyCursor = null;  // Sequence number of the last journey entry shown
+let journeyRequestPending = null;  // EV whose journey request is in flight
+
+// Journey entries fetched per request
+const JOURNEY_PAGE_SIZE = 500;
 
 // Initialize the module
 document.addEventListener('DOMContentLoaded', function() {
@@ -25,15 +30,25 @@ document.addEventListener('DOMContentLoaded', function() {
     evSelector.addEventListener('change', function() {
         currentSelectedEV = this.value;
         console.log("Selected EV:", currentSelectedEV);
+        journeyCursor = null;
         updateJourneyTimeline();
     });
     
     // Initial load of EVs for selector
-    updateEVSelector();
+    whenServerReady(updateEVSelector);
     
     console.log("Journey module initialized");
 });
 
+// Selector labels for EV statuses
+const EV_STATUS_LABELS = {
+    moving: 'Driving',
+    queued: 'In Queue',
+    charging: 'Charging',
+    completed: 'Completed',
+    abandoned: 'Abandoned'
+};
+
 // Populate EV selector dropdown
 function updateEVSelector() {
     console.log("Updating EV selector...");
@@ -46,9 +61,10 @@ function updateEVSelector() {
         }
     }
     
-    fetch('/api/evs')
+    fetch('/api/evs?fields=id,soc,status&limit=5000')
     .then(response => response.json())
-    .then(evs => {
+    .then(page => {
+        const evs = page.evs;
         console.log(`Got ${evs.length} EVs from server`);
         evList = evs;
         
@@ -67,16 +83,7 @@ function updateEVSelector() {
             option.value = ev.id;
             
             // Add icon/status to option text
-            let status = 'Driving';
-            if (ev.trip_completed) {
-                status = 'Completed';
-            } else if (ev.abandoned) {
-                status = 'Abandoned';
-            } else if (ev.charging) {
-                status = 'Charging';
-            } else if (ev.in_queue) {
-                status = 'In Queue';
-            }
+            const status = EV_STATUS_LABELS[ev.status] || 'Driving';
             
             option.textContent = `${ev.id} - ${status} - Battery: ${(ev.soc * 100).toFixed(1)}%`;
             evSelector.appendChild(option);
@@ -90,6 +97,7 @@ function updateEVSelector() {
             // If the selected EV no longer exists, reset
             if (evSelector.value !== currentSelectedEV) {
                 currentSelectedEV = null;
+                journeyCursor = null;
                 journeyTimeline.innerHTML = '<p class="no-ev-selected">Select an EV to view its journey timeline.</p>';
             }
         }
@@ -112,31 +120,62 @@ function updateJourneyTimeline() {
         return;
     }
     
-    console.log("Fetching journey log for EV:", currentSelectedEV);
+    if (journeyRequestPending === currentSelectedEV) {
+        return;
+    }
     
-    fetch(`/api/ev/journey-log/${currentSelectedEV}`)
+    // Only entries after the cursor are fetched; the first request starts from the beginning
+    const ev = currentSelectedEV;
+    const since = journeyCursor === null ? '' : journeyCursor;
+    journeyRequestPending = ev;
+    
+    fetch(`/api/ev/journey-log/${ev}?since=${since}&limit=${JOURNEY_PAGE_SIZE}`)
     .then(response => response.json())
     .then(data => {
-        if (!data.journey_log || data.journey_log.length === 0) {
-            journeyTimeline.innerHTML = '<p class="no-ev-selected">No journey logs available for this EV.</p>';
+        if (ev !== currentSelectedEV || !data.events) {
+            return;
+        }
+        
+        // A fresh timeline, or a log that was cleared (simulation reset): start over
+        if (journeyCursor === null || data.reset) {
+            journeyTimeline.innerHTML = '';
+        }
+        journeyCursor = data.next_cursor;
+        
+        if (data.events.length === 0) {
+            if (!journeyTimeline.hasChildNodes()) {
+                journeyTimeline.innerHTML = '<p class="no-ev-selected">No journey logs available for this EV.</p>';
+            }
             return;
         }
         
-        console.log(`Got ${data.journey_log.length} journey log entries`);
+        const placeholder = journeyTimeline.querySelector('.no-ev-selected');
+        if (placeholder) {
+            placeholder.remove();
+        }
         
-        // Clear existing timeline
-        journeyTimeline.innerHTML = '';
+        // Keep following the bottom only if the user hasn't scrolled up
+        const atBottom = journeyTimeline.scrollHeight - journeyTimeline.scrollTop - journeyTimeline.clientHeight < 20;
         
-        // Add events to timeline
-        data.journey_log.forEach(event => {
-            const eventElement = createEventElement(event);
-            journeyTimeline.appendChild(eventElement);
+        data.events.forEach(event => {
+            journeyTimeline.appendChild(createEventElement(event));
         });
         
-        // Scroll to bottom to show most recent events
-        journeyTimeline.scrollTop = journeyTimeline.scrollHeight;
+        if (atBottom || data.events.length === journeyTimeline.childElementCount) {
+            journeyTimeline.scrollTop = journeyTimeline.scrollHeight;
+        }
+        
+        // More entries than one page: fetch the rest right away
+        if (data.events.length === JOURNEY_PAGE_SIZE) {
+            setTimeout(updateJourneyTimeline, 0);
+        }
     })
-    .catch(error => console.error('Error loading journey log:', error));
+    .catch(error => console.error('Error loading journey log:', error))
+    .finally(() => {
+        if (journeyRequestPending === ev) {
+            journeyRequestPending = null;
+        }
+    });
 }
 
 // Create timeline event element
@@ -174,9 +213,8 @@ function createEventElement(event) {
             eventElement.classList.add('event-info');
     }
     
-    // Format timestamp
-    const timestamp = new Date(event.timestamp);
-    const formattedTime = timestamp.toLocaleTimeString();
+    // Timestamps are simulation step numbers
+    const formattedTime = `Step ${event.step}`;
     
     // Create event content
     const timeElement = document.createElement('div');
@@ -238,6 +276,7 @@ setTimeout(() => {
             console.log("Found EV selector on delayed check, setting up...");
             evSelector.addEventListener('change', function() {
                 currentSelectedEV = this.value;
+                journeyCursor = null;
                 updateJourneyTimeline();
             });
             updateEVSelector();
@@ -5,8 +5,8 @@ let lastLogCount = 0;
 const optimizationLogsEl = document.getElementById('optimizationLogs');
 
 document.addEventListener('DOMContentLoaded', function() {
-    // Initial update of logs
-    updateOptimizationLogs();
+    // Initial update of logs once the server has loaded its data
+    whenServerReady(updateOptimizationLogs);
 });
 
 // Update optimization logs from server
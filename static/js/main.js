@@ -1,6 +1,8 @@
 // Global variables
 let simulationRunning = false;
 let simulationSpeed = 5;
+// Simulated seconds per wall-clock second for each step of the speed slider
+const SPEED_UNIT = 120;
 let updateInterval;
 let stateUpdateCounter = 0;
 
@@ -34,12 +36,26 @@ document.addEventListener('DOMContentLoaded', function() {
     speedSlider.addEventListener('input', updateSpeed);
     generateBtn.addEventListener('click', generateNewData);
     
-    // Initial update of simulation state
-    updateSimulationState();
+    // Initial update of simulation state once the server has loaded its data
+    whenServerReady(updateSimulationState);
     
     console.log("Main module initialized");
 });
 
+// Wait until the server has finished loading simulation data
+function whenServerReady(callback) {
+    fetch('/api/ready')
+    .then(response => response.json())
+    .then(data => {
+        if (data.ready) {
+            callback();
+        } else {
+            setTimeout(() => whenServerReady(callback), 1000);
+        }
+    })
+    .catch(() => setTimeout(() => whenServerReady(callback), 1000));
+}
+
 // Start the simulation
 function startSimulation() {
     fetch('/api/simulation/start', {
@@ -124,6 +140,16 @@ function updateSpeed() {
     simulationSpeed = parseInt(speedSlider.value);
     speedValue.textContent = `${simulationSpeed}x`;
     
+    // Pace the simulation itself on the server
+    fetch('/api/simulation/speed', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({speed: simulationSpeed * SPEED_UNIT})
+    })
+    .catch(error => console.error('Error setting simulation speed:', error));
+    
     // Adjust update interval if simulation is running
     if (simulationRunning) {
         clearInterval(updateInterval);
@@ -193,7 +219,7 @@ function updateSimulationState() {
         
         // Update map
         if (typeof updateMapMarkers === 'function') {
-            updateMapMarkers(data.evs, data.stations);
+            updateMapMarkers(data.stations);
         }
         
         // Update metrics
@@ -205,7 +231,12 @@ function updateSimulationState() {
             updateCharts(data);
         }
         
-        // Update EV selector and journey timeline occasionally
+        // Journey timeline polls only new entries, so it can follow every update
+        if (typeof updateJourneyTimeline === 'function') {
+            updateJourneyTimeline();
+        }
+        
+        // Update EV selector occasionally
         if (stateUpdateCounter % 20 === 0 && typeof updateEVSelector === 'function') {
             updateEVSelector();
         }
@@ -2,6 +2,7 @@
 let map;
 let evMarkers = {};
 let stationMarkers = {};
+let clusterMarkers = [];
 
 // Initialize Google Map
 function initMap() {
@@ -22,9 +23,15 @@ function initMap() {
     });
     
     // Initial load of stations and EVs
-    loadMapData();
+    whenServerReady(loadMapData);
+    
+    // Reload the EVs in view whenever the view changes
+    map.addListener('idle', refreshVisibleEVs);
 }
 
+// Fields the map needs for EV markers
+const EV_MARKER_FIELDS = 'id,current_position,soc,status,assigned_station,waiting_time';
+
 // Load initial map data
 function loadMapData() {
     // Load stations
@@ -38,18 +45,147 @@ function loadMapData() {
     })
     .catch(error => console.error('Error loading stations:', error));
     
-    // Load EVs
-    fetch('/api/evs')
+    // Load EVs (or clusters) in view
+    refreshVisibleEVs();
+}
+
+// Show the EVs and stations in view: clusters when zoomed out, markers when zoomed in
+function refreshVisibleEVs() {
+    const bounds = map.getBounds();
+    if (!bounds) {
+        return;
+    }
+    const sw = bounds.getSouthWest();
+    const ne = bounds.getNorthEast();
+    const bbox = `${sw.lat()},${sw.lng()},${ne.lat()},${ne.lng()}`;
+    fetch(`/api/map/clusters?zoom=${map.getZoom()}&bbox=${bbox}&fields=${EV_MARKER_FIELDS}`)
     .then(response => response.json())
-    .then(evs => {
-        // Create markers for each EV
-        evs.forEach(ev => {
-            createEVMarker(ev);
-        });
+    .then(view => {
+        if (view.points) {
+            showPoints(view.evs);
+        } else {
+            showClusters(view.ev_clusters, view.station_clusters);
+        }
     })
     .catch(error => console.error('Error loading EVs:', error));
 }
 
+// Individual EV markers for the EVs in view; station markers back on the map
+function showPoints(evs) {
+    clearClusterMarkers();
+    Object.values(stationMarkers).forEach(markerInfo => markerInfo.marker.setMap(map));
+    
+    const visible = new Set();
+    evs.forEach(ev => {
+        visible.add(ev.id);
+        if (evMarkers[ev.id]) {
+            updateEVMarker(ev);
+        } else {
+            createEVMarker(ev);
+        }
+    });
+    Object.keys(evMarkers).forEach(id => {
+        if (!visible.has(id)) {
+            evMarkers[id].marker.setMap(null);
+            delete evMarkers[id];
+        }
+    });
+}
+
+// One marker per cluster, labelled with its size, instead of EV and station markers
+function showClusters(evClusters, stationClusters) {
+    clearClusterMarkers();
+    Object.values(evMarkers).forEach(markerInfo => markerInfo.marker.setMap(null));
+    evMarkers = {};
+    Object.values(stationMarkers).forEach(markerInfo => markerInfo.marker.setMap(null));
+    
+    evClusters.forEach(cluster => {
+        const marker = createClusterMarker(cluster, evColor({status: dominantState(cluster.states), soc: cluster.average_soc}), 5);
+        const states = Object.entries(cluster.states)
+            .filter(([, count]) => count > 0)
+            .map(([state, count]) => `<p>${state}: ${count}</p>`)
+            .join('');
+        addClusterInfo(marker, `
+            <div>
+                <h3>${cluster.count} EVs</h3>
+                <p>Average battery: ${(cluster.average_soc * 100).toFixed(1)}%</p>
+                ${states}
+            </div>
+        `);
+    });
+    stationClusters.forEach(cluster => {
+        const marker = createClusterMarker(cluster, '#4CAF50', 10);
+        addClusterInfo(marker, `
+            <div>
+                <h3>${cluster.count} Stations</h3>
+                <p>Chargers: ${cluster.chargers} (${cluster.charging} in use)</p>
+                <p>Queue: ${cluster.queue_length}</p>
+            </div>
+        `);
+    });
+}
+
+// State with the most EVs in a cluster
+function dominantState(states) {
+    return Object.keys(states).reduce((best, state) => (states[state] > states[best] ? state : best));
+}
+
+function createClusterMarker(cluster, fillColor, zIndex) {
+    const marker = new google.maps.Marker({
+        position: { lat: cluster.lat, lng: cluster.lng },
+        map: map,
+        label: { text: String(cluster.count), color: '#FFFFFF', fontSize: '11px' },
+        icon: {
+            path: google.maps.SymbolPath.CIRCLE,
+            scale: 10 + Math.min(Math.log2(cluster.count) * 3, 20),
+            fillColor: fillColor,
+            fillOpacity: 0.8,
+            strokeColor: '#000000',
+            strokeWeight: 1
+        },
+        zIndex: zIndex
+    });
+    clusterMarkers.push(marker);
+    return marker;
+}
+
+function addClusterInfo(marker, content) {
+    const infoWindow = new google.maps.InfoWindow({ content: content });
+    marker.addListener('click', () => {
+        infoWindow.open(map, marker);
+    });
+}
+
+function clearClusterMarkers() {
+    clusterMarkers.forEach(marker => marker.setMap(null));
+    clusterMarkers = [];
+}
+
+// Marker color for an EV's state
+function evColor(ev) {
+    if (ev.status === 'charging') {
+        return '#4CAF50'; // Green when charging
+    } else if (ev.status === 'queued') {
+        return '#FFC107'; // Yellow when in queue
+    } else if (ev.soc < 0.2) {
+        return '#F44336'; // Red when low battery
+    }
+    return '#2196F3'; // Default blue
+}
+
+// Info window content for an EV
+function evInfoContent(ev) {
+    return `
+        <div>
+            <h3>EV ${ev.id}</h3>
+            <p>Battery: ${(ev.soc * 100).toFixed(1)}%</p>
+            <p>Status: ${ev.status === 'charging' ? 'Charging' : (ev.status === 'queued' ? 'In Queue' : 'Driving')}</p>
+            ${ev.assigned_station ? `<p>Assigned to: Station ${ev.assigned_station}</p>` : ''}
+            ${ev.waiting_time > 0 ? `<p>Wait time: ${ev.waiting_time}s</p>` : ''}
+        </div>
+    `;
+}
+
 // Create a marker for a charging station
 function createStationMarker(station) {
     const position = {
@@ -105,14 +241,7 @@ function createEVMarker(ev) {
     };
     
     // Color based on EV state
-    let fillColor = '#2196F3'; // Default blue
-    if (ev.charging) {
-        fillColor = '#4CAF50'; // Green when charging
-    } else if (ev.in_queue) {
-        fillColor = '#FFC107'; // Yellow when in queue
-    } else if (ev.soc < 0.2) {
-        fillColor = '#F44336'; // Red when low battery
-    }
+    const fillColor = evColor(ev);
     
     const marker = new google.maps.Marker({
         position: position,
@@ -130,18 +259,8 @@ function createEVMarker(ev) {
     });
     
     // Add info window
-    const infoContent = `
-        <div>
-            <h3>EV ${ev.id}</h3>
-            <p>Battery: ${(ev.soc * 100).toFixed(1)}%</p>
-            <p>Status: ${ev.charging ? 'Charging' : (ev.in_queue ? 'In Queue' : 'Driving')}</p>
-            ${ev.assigned_station ? `<p>Assigned to: Station ${ev.assigned_station}</p>` : ''}
-            ${ev.waiting_time > 0 ? `<p>Wait time: ${ev.waiting_time}s</p>` : ''}
-        </div>
-    `;
-    
     const infoWindow = new google.maps.InfoWindow({
-        content: infoContent
+        content: evInfoContent(ev)
     });
     
     marker.addListener('click', () => {
@@ -155,55 +274,28 @@ function createEVMarker(ev) {
     };
 }
 
-// Update markers based on current state
-function updateMapMarkers(evs, stations) {
-    // Update EV markers
-    evs.forEach(ev => {
-        const markerInfo = evMarkers[ev.id];
-        
-        if (markerInfo) {
-            // Update position
-            markerInfo.marker.setPosition({
-                lat: ev.current_position[0],
-                lng: ev.current_position[1]
-            });
-            
-            // Update color based on EV state
-            let fillColor = '#2196F3'; // Default blue
-            if (ev.charging) {
-                fillColor = '#4CAF50'; // Green when charging
-            } else if (ev.in_queue) {
-                fillColor = '#FFC107'; // Yellow when in queue
-            } else if (ev.soc < 0.2) {
-                fillColor = '#F44336'; // Red when low battery
-            }
-            
-            markerInfo.marker.setIcon({
-                path: google.maps.SymbolPath.CIRCLE,
-                scale: 7,
-                fillColor: fillColor,
-                fillOpacity: 0.8,
-                strokeColor: '#000000',
-                strokeWeight: 1
-            });
-            
-            // Update info window content
-            const infoContent = `
-                <div>
-                    <h3>EV ${ev.id}</h3>
-                    <p>Battery: ${(ev.soc * 100).toFixed(1)}%</p>
-                    <p>Status: ${ev.charging ? 'Charging' : (ev.in_queue ? 'In Queue' : 'Driving')}</p>
-                    ${ev.assigned_station ? `<p>Assigned to: Station ${ev.assigned_station}</p>` : ''}
-                    ${ev.waiting_time > 0 ? `<p>Wait time: ${ev.waiting_time}s</p>` : ''}
-                </div>
-            `;
-            
-            markerInfo.infoWindow.setContent(infoContent);
-        } else {
-            // Create new marker if not exists
-            createEVMarker(ev);
-        }
+// Move and recolor an existing EV marker
+function updateEVMarker(ev) {
+    const markerInfo = evMarkers[ev.id];
+    markerInfo.marker.setPosition({
+        lat: ev.current_position[0],
+        lng: ev.current_position[1]
+    });
+    markerInfo.marker.setIcon({
+        path: google.maps.SymbolPath.CIRCLE,
+        scale: 7,
+        fillColor: evColor(ev),
+        fillOpacity: 0.8,
+        strokeColor: '#000000',
+        strokeWeight: 1
     });
+    markerInfo.infoWindow.setContent(evInfoContent(ev));
+}
+
+// Update markers based on current state
+function updateMapMarkers(stations) {
+    // Update EV markers in view
+    refreshVisibleEVs();
     
     // Update station markers
     stations.forEach(station => {
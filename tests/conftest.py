@@ -0,0 +1,60 @@
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py is not checked in; fall back to the example settings
+try:
+    import config
+except ImportError:
+    loader = importlib.machinery.SourceFileLoader('config', os.path.join(ROOT, 'config.py.example'))
+    spec = importlib.util.spec_from_loader('config', loader)
+    config = importlib.util.module_from_spec(spec)
+    loader.exec_module(config)
+    sys.modules['config'] = config
+
+from models.distance_matrix import set_active_matrix
+from models.road_graph import RoadGraph
+from models.station import ChargingStation
+from utils.data_generator import compute_route_distances, generate_fleet, generate_random_locations, \
+    generate_routes_parallel
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Run each test in a scratch directory, offline, with no active distance matrix"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, 'OFFLINE_ROUTING', True, raising=False)
+    monkeypatch.setattr(config, 'ROAD_GRAPH_FILE', None, raising=False)
+    monkeypatch.setattr(config, 'ASYNC_OPTIMIZATION', False, raising=False)
+    set_active_matrix(None)
+    yield
+    set_active_matrix(None)
+
+@pytest.fixture
+def nodes():
+    return generate_random_locations(40, np.random.default_rng(0))
+
+@pytest.fixture
+def graph(nodes):
+    graph = RoadGraph.from_nodes(nodes)
+    graph.prepare()
+    return graph
+
+@pytest.fixture
+def small_world(nodes, graph):
+    """(evs, stations, routes) built offline: 200 EVs, 12 stations, 60 routes"""
+    rng = np.random.default_rng(1)
+    routes = generate_routes_parallel(nodes, 60, router=graph, offline=True, rng=rng)
+    stations = [
+        ChargingStation(id=f"station-{i + 1}", location=nodes[int(index)], num_chargers=2, charging_rate=11.0)
+        for i, index in enumerate(rng.integers(0, len(nodes), size=12))
+    ]
+    evs = generate_fleet(200, len(routes), seed=2).materialize(routes, compute_route_distances(routes))
+    for ev in evs[::3]:
+        ev.soc = 0.15  # Make sure some EVs need charging early
+    return evs, stations, routes
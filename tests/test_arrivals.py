@@ -0,0 +1,44 @@
+import pytest
+from models.arrivals import ArrivalProcess, EVPool
+from models.clock import SimulationClock
+from models.simulation import Simulation
+
+def test_rate_interpolates_between_hours(small_world):
+    _, _, routes = small_world
+    rates = [float(hour) for hour in range(24)]
+    arrivals = ArrivalProcess(routes, hourly_rates=rates, start_hour=7)
+    assert arrivals.rate_at(0) == pytest.approx(7)
+    assert arrivals.rate_at(1800) == pytest.approx(7.5)
+    # Wraps around midnight
+    assert arrivals.rate_at(16 * 3600 + 1800) == pytest.approx(23 * 0.5)
+
+def test_pool_reuses_released_evs(small_world):
+    evs, _, routes = small_world
+    pool = EVPool()
+    pool.release(evs[0])
+    route = routes[1]
+    ev = pool.acquire(id="trip-1", origin=route["origin"], destination=route["destination"],
+                      battery_capacity=40, initial_soc=0.5, consumption_rate=0.2, route=route["points"])
+    assert ev is evs[0]
+    assert ev.id == "trip-1" and ev.route is route["points"] and ev.route_index == 0
+    assert not ev.trip_completed and len(ev.journey_log) == 1
+    assert pool.reused == 1
+
+def test_spawn_is_seeded(small_world):
+    _, _, routes = small_world
+    clock = SimulationClock(0, 60)
+    first = ArrivalProcess(routes, seed=4).spawn(8 * 3600, 600, clock)
+    second = ArrivalProcess(routes, seed=4).spawn(8 * 3600, 600, clock)
+    assert first and [ev.soc for ev in first] == [ev.soc for ev in second]
+    assert all(ev.clock is clock for ev in first)
+
+def test_rolling_simulation_retires_and_counts_trips(small_world):
+    evs, stations, routes = small_world
+    simulation = Simulation(evs, stations, routes, arrivals=ArrivalProcess(routes, seed=1))
+    for _ in range(150):
+        simulation.step()
+    assert simulation.trips_total == 200 + simulation.arrivals.trips_started
+    assert all(not ev.trip_completed and not ev.abandoned for ev in simulation.evs)
+    finished = simulation.completed_total + simulation.abandoned_total
+    assert finished + len(simulation.evs) == simulation.trips_total
+    assert simulation.metrics['completion_rate'] == pytest.approx(simulation.completed_total / simulation.trips_total)
@@ -0,0 +1,35 @@
+from models.simulation import Simulation
+
+def run_round(simulation):
+    """Step until a background round has been submitted, then wait for it"""
+    for _ in range(20):
+        simulation.step()
+        if simulation.last_optimization_step >= 0:
+            break
+    simulation.optimization_worker.wait(5)
+
+def test_results_apply_at_next_step(small_world):
+    simulation = Simulation(*small_world, async_optimization=True)
+    run_round(simulation)
+    queued_before = sum(len(station.queue) + len(station.charging_evs) for station in simulation.stations)
+    simulation.step()
+    queued_after = sum(len(station.queue) + len(station.charging_evs) for station in simulation.stations)
+    assert queued_after > queued_before
+    assert simulation.metrics['optimization_lag_steps'] >= 1
+
+def test_lagging_results_are_dropped(small_world):
+    simulation = Simulation(*small_world, async_optimization=True)
+    simulation.max_optimization_lag = 0
+    run_round(simulation)
+    simulation.step()
+    assert simulation.metrics['stale_assignments_dropped'] > 0
+    assert all(not ev.in_queue and not ev.charging for ev in simulation.evs)
+
+def test_snapshots_do_not_touch_live_evs(small_world):
+    evs, stations, _ = small_world
+    snapshot = evs[0].snapshot()
+    snapshot._log_event("Test", {})
+    snapshot.route_index = 5
+    assert evs[0].route_index == 0
+    assert len(evs[0].journey_log) == 1
+    assert stations[0].snapshot().get_queue_length() == 0
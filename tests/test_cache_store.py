@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from utils import cache_store
+from utils.cache_store import RouteTable, cache_key
+
+ROUTES = [
+    {"id": "route-1", "origin": (12.9, 77.5), "destination": (12.95, 77.55),
+     "points": [(12.9, 77.5), (12.92, 77.52), (12.95, 77.55)], "distance": 8.1},
+    {"id": "route-2", "origin": (12.95, 77.55), "destination": (12.9, 77.6),
+     "points": [(12.95, 77.55), (12.9, 77.6)], "distance": 7.4},
+]
+
+def test_cache_key_depends_on_every_parameter():
+    assert cache_key(kind='nodes', seed=1) == cache_key(kind='nodes', seed=1)
+    assert cache_key(kind='nodes', seed=1) != cache_key(kind='nodes', seed=2)
+
+def test_route_table_round_trip():
+    cache_store.save_routes('test', ROUTES)
+    table = cache_store.load_routes('test')
+    assert isinstance(table.points, np.memmap)
+    assert len(table) == 2
+    assert list(table) == ROUTES
+    # Routes are built once and then shared
+    assert table[0] is table[0]
+    assert table[-1]["id"] == "route-2"
+
+def test_from_routes_keeps_original_dicts():
+    table = RouteTable.from_routes(ROUTES)
+    assert table[1] is ROUTES[1]
+    assert table.copy() == ROUTES
+
+def test_missing_cache_and_nodes_round_trip():
+    assert cache_store.load_routes('missing') is None
+    assert cache_store.load_nodes('missing') is None
+    cache_store.save_nodes('n', [(1.0, 2.0), (3.0, 4.0)])
+    assert cache_store.load_nodes('n') == [(1.0, 2.0), (3.0, 4.0)]
+    cache_store.clear_cache()
+    assert cache_store.load_nodes('n') is None
+
+def test_old_station_matrices_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_store, 'CACHE_DIR', str(tmp_path))
+    paths = []
+    for i in range(5):
+        path = cache_store.station_matrix_path('k', [(float(i), 0.0)])
+        np.save(path, np.zeros((2, 1)))
+        os.utime(path, (i, i))
+        paths.append(path)
+    other_nodes = cache_store.station_matrix_path('other', [(0.0, 0.0)])
+    np.save(other_nodes, np.zeros((2, 1)))
+    # The oldest matrix was just reopened, so it counts as the most recent
+    assert cache_store.prune_station_matrices('k', paths[0], keep=2) == 3
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in (paths[0], paths[4], other_nodes))
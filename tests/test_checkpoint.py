@@ -0,0 +1,70 @@
+import random
+import numpy as np
+import pytest
+from models.arrivals import ArrivalProcess
+from models.checkpoint import capture_state, read_checkpoint, write_checkpoint
+from models.simulation import Simulation
+
+def assert_same_evs(a, b):
+    assert [ev.id for ev in a.evs] == [ev.id for ev in b.evs]
+    for x, y in zip(a.evs, b.evs):
+        assert x.soc == pytest.approx(y.soc, abs=1e-12)
+        assert (x.route_index, x.charging, x.in_queue, x.trip_completed) == \
+            (y.route_index, y.charging, y.in_queue, y.trip_completed)
+
+def test_round_trip_restores_fleet_and_queues(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(30):
+        simulation.step()
+    simulation.checkpoint('sim.npz', background=False)
+    restored = Simulation.restore('sim.npz')
+
+    assert restored.current_step == simulation.current_step
+    assert_same_evs(simulation, restored)
+    for x, y in zip(simulation.stations, restored.stations):
+        assert [ev.id for ev in x.queue] == [ev.id for ev in y.queue]
+        assert [ev.id for ev in x.charging_evs] == [ev.id for ev in y.charging_evs]
+    assert restored.evs[0].journey_log == simulation.evs[0].journey_log
+
+    for _ in range(20):
+        simulation.step()
+        restored.step()
+    assert_same_evs(simulation, restored)
+
+def test_restore_leaves_global_rng_alone(small_world):
+    simulation = Simulation(*small_world)
+    simulation.checkpoint('sim.npz', background=False)
+    random.seed(123)
+    np.random.seed(123)
+    expected = (random.random(), np.random.random())
+    random.seed(123)
+    np.random.seed(123)
+    Simulation.restore('sim.npz')
+    assert (random.random(), np.random.random()) == expected
+
+def test_rolling_run_stays_rolling_after_restore(small_world):
+    evs, stations, routes = small_world
+    simulation = Simulation(evs, stations, routes, arrivals=ArrivalProcess(routes, seed=1, start_hour=7))
+    for _ in range(100):
+        simulation.step()
+    simulation.checkpoint('rolling.npz', background=False)
+    restored = Simulation.restore('rolling.npz')
+
+    assert restored.rolling
+    assert restored.trips_total == simulation.trips_total
+    assert restored.completed_total == simulation.completed_total
+    assert restored.arrivals.trips_started == simulation.arrivals.trips_started
+    assert len(restored.arrivals.routes) == len(routes)
+
+    for _ in range(50):
+        simulation.step()
+        restored.step()
+    assert_same_evs(simulation, restored)
+    assert restored.metrics['completion_rate'] == pytest.approx(simulation.metrics['completion_rate'])
+
+def test_old_versions_are_rejected(small_world, monkeypatch):
+    state = capture_state(Simulation(*small_world))
+    state['version'] = 1
+    write_checkpoint(state, 'old.npz')
+    with pytest.raises(ValueError):
+        read_checkpoint('old.npz')
@@ -0,0 +1,45 @@
+from models.clustering import ClusterIndex, EV_STATES
+from models.simulation import Simulation
+
+def test_levels_conserve_counts_and_merge_cells(small_world):
+    evs, stations, _ = small_world
+    index = ClusterIndex(min_zoom=8, max_zoom=16)
+    index.update(evs, stations, key=0)
+    previous = None
+    for zoom in range(16, 7, -1):
+        clusters = index.ev_clusters(zoom)
+        assert sum(cluster['count'] for cluster in clusters) == len(evs)
+        assert all(cluster['count'] == sum(cluster['states'].values()) for cluster in clusters)
+        assert sum(cluster['count'] for cluster in index.station_clusters(zoom)) == len(stations)
+        if previous is not None:
+            assert len(clusters) <= previous
+        previous = len(clusters)
+    # At a city-wide zoom everything ends up in a handful of clusters
+    assert len(index.ev_clusters(8)) <= 4
+
+def test_cluster_summaries(small_world):
+    evs, stations, _ = small_world
+    index = ClusterIndex()
+    index.update(evs, stations, key=0)
+    (cluster,) = [c for c in index.ev_clusters(3)]
+    assert cluster['states']['moving'] == len(evs)
+    assert set(cluster['states']) == set(EV_STATES)
+    assert abs(cluster['average_soc'] - sum(ev.soc for ev in evs) / len(evs)) < 1e-9
+
+def test_map_view_switches_to_points_and_tracks_steps(small_world):
+    simulation = Simulation(*small_world)
+    lats = [ev.current_position[0] for ev in simulation.evs]
+    lngs = [ev.current_position[1] for ev in simulation.evs]
+    bbox = (min(lats), min(lngs), max(lats), max(lngs))
+    view = simulation.map_view(12, bbox)
+    assert not view['points']
+    assert sum(c['count'] for c in view['ev_clusters']) == len(simulation.evs)
+
+    for _ in range(30):
+        simulation.step()
+    view = simulation.map_view(12, bbox)
+    moved = sum(c['states']['charging'] + c['states']['queued'] + c['states']['completed'] for c in view['ev_clusters'])
+    assert moved > 0
+
+    points = simulation.map_view(simulation.cluster_point_zoom, bbox, fields=['id'])
+    assert points['points'] and points['evs'] and set(points['evs'][0]) == {'id'}
@@ -0,0 +1,28 @@
+import numpy as np
+from utils.data_generator import compute_route_distances, generate_synthetic_data
+
+def signature(seed, use_cache):
+    evs, stations, routes = generate_synthetic_data(30, 6, 25, 40, use_cache=use_cache, seed=seed)
+    return (
+        [station.location for station in stations],
+        [route["points"] for route in routes],
+        [(ev.route, ev.soc, ev.battery_capacity) for ev in evs]
+    )
+
+def test_seed_is_reproducible_with_and_without_cache():
+    first = signature(7, use_cache=True)
+    assert signature(7, use_cache=True) == first  # nodes, matrices and routes from cache
+    assert signature(7, use_cache=False) == first
+
+def test_different_seeds_do_not_share_caches():
+    first = signature(7, use_cache=True)
+    second = signature(8, use_cache=True)
+    assert first[0] != second[0]
+    assert first[1] != second[1]
+
+def test_route_distances_are_km(small_world):
+    _, _, routes = small_world
+    distances = compute_route_distances(routes)
+    # Offline route distances (km) include the road detour factor, so straight segments are shorter
+    assert (distances <= np.array([route["distance"] for route in routes]) + 1e-9).all()
+    assert (distances > 0).all()
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from models.distance import EQUIRECTANGULAR, HAVERSINE, distance, many_to_many, one_to_many, paired, \
+    prepare_points, segment_lengths
+
+POINTS = [(12.97, 77.59), (12.98, 77.60), (13.05, 77.50), (12.90, 77.65)]
+
+def test_batch_kernels_match_scalar_distance():
+    expected = np.array([[distance(a, b) for b in POINTS] for a in POINTS])
+    assert np.allclose(many_to_many(POINTS, POINTS), expected)
+    assert np.allclose(one_to_many(POINTS[0], POINTS), expected[0])
+    assert np.allclose(paired(POINTS[:-1], POINTS[1:]), np.diag(expected, 1))
+    assert np.allclose(segment_lengths(prepare_points(POINTS)), np.diag(expected, 1))
+
+def test_known_distance():
+    # One degree of latitude is about 111.2 km
+    assert distance((0.0, 0.0), (1.0, 0.0), mode=HAVERSINE) == pytest.approx(111195, rel=1e-3)
+
+def test_equirectangular_close_to_haversine_at_city_scale():
+    haversine = many_to_many(POINTS, POINTS, mode=HAVERSINE)
+    approx = many_to_many(POINTS, POINTS, mode=EQUIRECTANGULAR)
+    assert np.allclose(approx, haversine, rtol=1e-3, atol=1.0)
@@ -0,0 +1,44 @@
+import numpy as np
+from models.distance import many_to_many, one_to_many, segment_lengths
+from models.distance_matrix import DistanceMatrix
+
+def test_matrix_lookups_match_kernel(nodes):
+    stations = [nodes[3], nodes[7], (12.95, 77.58)]
+    matrix = DistanceMatrix.build(nodes, stations)
+    assert np.allclose(matrix.node_node, many_to_many(nodes, nodes))
+    assert np.allclose(matrix.node_station, many_to_many(nodes, stations))
+    assert np.isclose(matrix.distance(nodes[0], nodes[1]), one_to_many(nodes[0], [nodes[1]])[0])
+
+def test_station_columns_and_off_grid_fallback(nodes):
+    stations = [nodes[3], nodes[7], nodes[9]]
+    matrix = DistanceMatrix.build(nodes, stations)
+    columns = matrix.station_columns([nodes[9], nodes[3]])
+    assert columns.tolist() == [2, 0]
+    assert matrix.station_columns([(0.0, 0.0)]) is None
+    assert np.allclose(matrix.distances_to_stations(nodes[0], columns), one_to_many(nodes[0], [nodes[9], nodes[3]]))
+    off_grid = (nodes[0][0] + 0.001, nodes[0][1])
+    assert np.allclose(matrix.distances_to_stations(off_grid), one_to_many(off_grid, stations))
+
+def test_segment_lengths_from_matrix(nodes):
+    matrix = DistanceMatrix.build(nodes, [])
+    route = [nodes[0], nodes[4], nodes[2]]
+    assert np.allclose(matrix.segment_lengths(route), segment_lengths(route))
+    assert np.allclose(matrix.segment_lengths(route + [(12.9, 77.5)]), segment_lengths(route + [(12.9, 77.5)]))
+
+def test_matrices_persisted_and_memory_mapped(tmp_path, nodes):
+    stations = [nodes[3], nodes[7]]
+    node_file = str(tmp_path / "nodes.dist.npy")
+    station_file = str(tmp_path / "nodes.stations.npy")
+    built = DistanceMatrix.build(nodes, stations, node_file, station_file)
+    loaded = DistanceMatrix.build(nodes, stations, node_file, station_file)
+    assert isinstance(loaded.node_node, np.memmap)
+    assert isinstance(loaded.node_station, np.memmap)
+    assert np.allclose(loaded.node_station, built.node_station)
+
+def test_stale_station_matrix_is_rebuilt(tmp_path, nodes):
+    node_file = str(tmp_path / "nodes.dist.npy")
+    station_file = str(tmp_path / "nodes.stations.npy")
+    DistanceMatrix.build(nodes, [nodes[3], nodes[7]], node_file, station_file)
+    other = [nodes[1], nodes[2]]
+    rebuilt = DistanceMatrix.build(nodes, other, node_file, station_file)
+    assert np.allclose(rebuilt.node_station, many_to_many(nodes, other))
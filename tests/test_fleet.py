@@ -0,0 +1,27 @@
+import numpy as np
+from models.fleet import FleetArrays
+from utils.data_generator import compute_route_distances
+
+def test_generate_is_reproducible():
+    a = FleetArrays.generate(100, 10, np.random.default_rng(5))
+    b = FleetArrays.generate(100, 10, np.random.default_rng(5))
+    assert np.array_equal(a.route_index, b.route_index)
+    assert np.array_equal(a.initial_soc, b.initial_soc)
+    assert a.route_index.max() < 10
+    assert ((a.initial_soc >= 0.2) & (a.initial_soc <= 0.8)).all()
+
+def test_materialize_and_chunks(small_world):
+    _, _, routes = small_world
+    fleet = FleetArrays.generate(25, len(routes), np.random.default_rng(0))
+    evs = fleet.materialize(routes, start=5, stop=8)
+    assert [ev.id for ev in evs] == ["ev-6", "ev-7", "ev-8"]
+    assert evs[0].route is routes[int(fleet.route_index[5])]["points"]
+    chunks = list(fleet.iter_chunks(routes, chunk_size=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+
+def test_route_distances_match_ev_computation(small_world):
+    evs, _, routes = small_world
+    distances = compute_route_distances(routes)
+    for i, route in enumerate(routes[:10]):
+        ev = FleetArrays(np.array([i]), np.array([40.0]), np.array([0.5]), np.array([0.2])).materialize(routes)[0]
+        assert np.isclose(distances[i], ev.calculate_total_route_distance())
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from models.fleet_query import SpatialGrid, parse_bbox, query_evs
+from models.simulation import Simulation
+
+def test_grid_matches_brute_force():
+    rng = np.random.default_rng(3)
+    points = rng.uniform([12.87, 77.49], [13.07, 77.69], size=(2000, 2))
+    grid = SpatialGrid(points, cell_size=0.01)
+    for south, west, north, east in [(12.9, 77.5, 12.95, 77.56), (12.0, 77.0, 14.0, 78.0), (13.1, 77.0, 13.2, 77.1)]:
+        expected = np.flatnonzero((points[:, 0] >= south) & (points[:, 0] <= north) &
+                                  (points[:, 1] >= west) & (points[:, 1] <= east))
+        assert grid.query(south, west, north, east).tolist() == expected.tolist()
+
+def test_bbox_page_has_only_requested_fields(small_world):
+    simulation = Simulation(*small_world)
+    simulation.step()
+    lats = [ev.current_position[0] for ev in simulation.evs]
+    lngs = [ev.current_position[1] for ev in simulation.evs]
+    bbox = (min(lats), min(lngs), float(np.median(lats)), max(lngs))
+    page = simulation.query_evs(bbox=bbox, fields=['id', 'status'])
+    inside = [ev for ev in simulation.evs if ev.current_position[0] <= bbox[2]]
+    assert page['total'] == len(inside)
+    assert all(set(ev) == {'id', 'status'} for ev in page['evs'])
+
+def test_cursor_pages_cover_all_matches_once(small_world):
+    evs = small_world[0]
+    seen = []
+    cursor = None
+    while True:
+        page = query_evs(evs, fields=['id'], statuses=['moving'], cursor=cursor, limit=30)
+        seen.extend(ev['id'] for ev in page['evs'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert sorted(seen) == seen
+    assert seen == sorted(ev.id for ev in evs if ev.status == 'moving')
+
+def test_invalid_queries_are_rejected(small_world):
+    evs = small_world[0]
+    with pytest.raises(ValueError):
+        query_evs(evs, fields=['route'])
+    with pytest.raises(ValueError):
+        query_evs(evs, statuses=['parked'])
+    with pytest.raises(ValueError):
+        parse_bbox('13,77,12,78')
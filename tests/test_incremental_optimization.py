@@ -0,0 +1,69 @@
+from models.optimization import OptimizerCache, optimize_charging
+
+def needing_charge(small_world):
+    evs, stations, _ = small_world
+    return [ev for ev in evs if ev.needs_charging(0.3)], stations
+
+def test_cached_round_matches_full_round(small_world):
+    evs, stations = needing_charge(small_world)
+    cache = OptimizerCache()
+    first = optimize_charging(evs, stations, cache=cache)
+    assert cache.last_round['pairs_reused'] == 0
+    second = optimize_charging(evs, stations, cache=cache)
+    assert second == first == optimize_charging(evs, stations)
+    assert cache.last_round['evs_reused'] == len(evs)
+    assert cache.last_round['pairs_scored'] == 0
+
+def test_only_changed_stations_are_rescored(small_world):
+    evs, stations = needing_charge(small_world)
+    cache = OptimizerCache()
+    optimize_charging(evs, stations, cache=cache)
+    # Fill every charger of the most popular station and queue one more EV
+    assignments, _ = optimize_charging(evs, stations, cache=cache)
+    busiest = max(stations, key=lambda station: list(assignments.values()).count(station.id))
+    queued = [ev for ev in evs if assignments.get(ev.id) == busiest.id][:busiest.num_chargers + 1]
+    for ev in queued:
+        busiest.add_to_queue(ev)
+    while busiest.start_next_in_queue():
+        pass
+    remaining = [ev for ev in evs if ev not in queued]
+    assignments, abandoned = optimize_charging(remaining, stations, cache=cache)
+    assert cache.last_round['pairs_reused'] > 0
+    assert 0 < cache.last_round['pairs_scored'] <= len(remaining)
+    assert (assignments, abandoned) == optimize_charging(remaining, stations)
+
+def test_moved_evs_are_rescored_and_departed_ones_evicted(small_world):
+    evs, stations = needing_charge(small_world)
+    cache = OptimizerCache(soc_tolerance=0.01)
+    optimize_charging(evs, stations, cache=cache)
+    evs[0].soc -= 0.05
+    optimize_charging(evs[:5], stations, cache=cache)
+    assert cache.last_round['evs_rescored'] == 1
+    assert set(cache.entries) == {ev.id for ev in evs[:5]}
+
+class DriftingStation:
+    """Wraps a station and overrides its wait estimate"""
+    def __init__(self, station, wait):
+        self.station = station
+        self.wait = wait
+    
+    def get_current_wait_time_estimate(self):
+        return self.wait
+    
+    def __getattr__(self, name):
+        return getattr(self.station, name)
+
+def test_slow_wait_drift_adds_up_to_a_rescore(small_world):
+    evs, stations = needing_charge(small_world)
+    drifting = [DriftingStation(station, 0.0) for station in stations]
+    cache = OptimizerCache(wait_tolerance=60.0)
+    optimize_charging(evs, drifting, cache=cache)
+    rescored_rounds = 0
+    for _ in range(20):
+        drifting[0].wait += 50.0  # Under the tolerance each round
+        optimize_charging(evs, drifting, cache=cache)
+        rescored_rounds += cache.last_round['pairs_scored'] > 0
+    assert rescored_rounds >= 10
+    for entry in cache.entries.values():
+        if 0 in entry.scores:
+            assert abs(entry.scores[0][1]['wait_time'] - drifting[0].wait) <= 60.0
@@ -0,0 +1,60 @@
+from models.simulation import Simulation
+
+def test_cursor_returns_only_new_entries(small_world):
+    simulation = Simulation(*small_world)
+    ev = simulation.evs[0]
+    first = ev.journey_since(None)
+    assert [entry['seq'] for entry in first['events']] == list(range(len(ev.journey_log)))
+    for _ in range(5):
+        simulation.step()
+    delta = ev.journey_since(first['next_cursor'])
+    assert not delta['reset']
+    assert delta['events'] == ev.journey_log[len(first['events']):]
+    # Nothing new: same cursor back
+    assert ev.journey_since(delta['next_cursor']) == {'events': [], 'next_cursor': delta['next_cursor'], 'reset': False}
+
+def test_limit_pages_through_log(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(10):
+        simulation.step()
+    ev = max(simulation.evs, key=lambda ev: len(ev.journey_log))
+    seen, cursor = [], None
+    while True:
+        page = ev.journey_since(cursor, limit=3)
+        if not page['events']:
+            break
+        seen += page['events']
+        cursor = page['next_cursor']
+    assert seen == ev.journey_log
+
+def test_reset_is_flagged(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(3):
+        simulation.step()
+    ev = simulation.evs[0]
+    cursor = ev.journey_since(None)['next_cursor']
+    simulation.reset()
+    delta = ev.journey_since(cursor)
+    assert delta['reset']
+    assert delta['events'] == ev.journey_log
+    assert ev.journey_log[0]['seq'] > cursor
+
+def test_bulk_deltas_and_unknown_ids(small_world):
+    simulation = Simulation(*small_world)
+    ids = [ev.id for ev in simulation.evs[:20]]
+    deltas = simulation.get_journey_events({ev_id: None for ev_id in ids + ['missing']})
+    assert set(deltas) == set(ids)
+    simulation.step()
+    cursors = {ev_id: delta['next_cursor'] for ev_id, delta in deltas.items()}
+    for ev_id, delta in simulation.get_journey_events(cursors).items():
+        assert all(entry['seq'] > cursors[ev_id] for entry in delta['events'])
+
+def test_sequence_survives_checkpoint(small_world, tmp_path):
+    simulation = Simulation(*small_world)
+    for _ in range(3):
+        simulation.step()
+    path = tmp_path / 'checkpoint.npz'
+    simulation.checkpoint(str(path), background=False)
+    restored = Simulation.restore(str(path))
+    before = {ev.id: ev.journey_seq for ev in simulation.evs}
+    assert {ev.id: ev.journey_seq for ev in restored.evs} == before
@@ -0,0 +1,23 @@
+import sys
+from models.memory import deep_sizeof, memory_report
+from models.simulation import Simulation
+
+def test_shared_objects_counted_once():
+    shared = [1.5] * 100
+    seen = set()
+    first = deep_sizeof({'a': shared}, seen)
+    second = deep_sizeof({'b': shared}, seen)
+    assert first > sys.getsizeof(shared)
+    assert second < sys.getsizeof(shared)
+
+def test_report_attributes_routes_and_logs_separately(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(5):
+        simulation.step()
+        simulation._record_state()
+    report = memory_report(simulation)
+    structures = report['structures']
+    assert set(structures) >= {'journey_logs', 'routes', 'evs', 'stations', 'history'}
+    assert report['total_bytes'] == sum(entry['bytes'] for entry in structures.values())
+    # EVs only own their own slots; logs and routes are sized in their own rows
+    assert report['bytes_per_ev'] < structures['journey_logs']['bytes'] / len(simulation.evs)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from models.metrics_history import MetricsHistory, lttb
+from models.simulation import Simulation
+
+def filled_history(steps, **options):
+    history = MetricsHistory(metrics=('value',), **options)
+    values = np.random.default_rng(1).normal(size=steps).cumsum()
+    for step, value in enumerate(values):
+        history.append(step, {'value': value})
+    return history, values
+
+def test_minmax_buckets_keep_extremes():
+    history, values = filled_history(5000, capacity=512, factor=8, tiers=3)
+    result = history.query(4000, 4999, points=40)
+    series = result['series']['value']
+    assert len(series['steps']) <= 40
+    assert min(series['min']) == pytest.approx(values[4000:].min())
+    assert max(series['max']) == pytest.approx(values[4000:].max())
+
+def test_long_ranges_read_coarser_tiers():
+    history, values = filled_history(20000, capacity=256, factor=4, tiers=4)
+    recent = history.query(19900, None, points=100)
+    assert recent['resolution'] == 1
+    everything = history.query(points=100)
+    assert everything['resolution'] == 64
+    assert everything['start'] <= 20000 - 256 * 64 + 64
+    # Means over merged buckets match the raw values
+    series = everything['series']['value']
+    assert series['mean'][-1] == pytest.approx(values[series['steps'][-1]:].mean())
+
+def test_lttb_keeps_endpoints_and_spikes():
+    y = np.zeros(1000)
+    y[500] = 10
+    keep = lttb(np.arange(1000), y, 20)
+    assert len(keep) == 20 and keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+    assert np.all(np.diff(keep) > 0)
+
+def test_simulation_records_metrics(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(10):
+        simulation.step()
+    result = simulation.get_metrics_history(metrics=['average_wait_time'], method='lttb', points=5)
+    assert len(result['series']['average_wait_time']['values']) == 5
+    by_time = simulation.get_metrics_history(start_time=5 * simulation.time_step, points=100)
+    assert by_time['series']['max_queue_length']['steps'][0] == 5
+    with pytest.raises(ValueError):
+        simulation.get_metrics_history(metrics=['nope'])
+    simulation.reset()
+    assert simulation.get_metrics_history()['series']['completion_rate']['steps'] == []
+
+def test_rolling_aggregates_and_ewma():
+    history, values = filled_history(3000, capacity=256, factor=4, tiers=3, ewma_alpha=0.5)
+    recent = history.rolling(100)['series']['value']
+    assert recent['mean'] == pytest.approx(values[-100:].mean())
+    assert recent['max'] == pytest.approx(values[-100:].max())
+    expected = values[0]
+    for value in values[1:]:
+        expected += 0.5 * (value - expected)
+    assert recent['ewma'] == pytest.approx(expected)
+    # Longer than tier 0: whole buckets from a coarser tier
+    longer = history.rolling(900)
+    assert longer['resolution'] == 4
+    # 3000 - 900 is a multiple of the bucket width, so the buckets match the window exactly
+    assert longer['series']['value']['max'] == pytest.approx(values[-900:].max())
+    assert longer['series']['value']['mean'] == pytest.approx(values[-900:].mean())
+
+def test_station_columns_and_bounded_memory():
+    history = MetricsHistory(capacity=64, factor=4, tiers=3)
+    history.append(0, {'station_utilization': {'a': 0.5, 'b': 1.0}})
+    arrays = [tier.total for tier in history.tiers]
+    for step in range(1, 5000):
+        history.append(step, {'average_wait_time': step, 'station_utilization': {'a': step % 2, 'b': 1.0}})
+    # Appends write into the arrays allocated for the first step
+    assert all(tier.total is array for tier, array in zip(history.tiers, arrays))
+    result = history.query(4990, None, metrics=['station_utilization.a'])
+    assert result['series']['station_utilization.a']['mean'] == [0.0, 1.0] * 5
+    assert history.rolling(10, ['station_utilization.b'])['series']['station_utilization.b']['mean'] == 1.0
+    # A station seen later gets a column with zeros before it appeared
+    history.append(5000, {'station_utilization': {'a': 0, 'b': 1.0, 'c': 0.25}})
+    assert history.rolling(2, ['station_utilization.c'])['series']['station_utilization.c']['max'] == 0.25
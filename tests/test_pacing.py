@@ -0,0 +1,66 @@
+import time
+import pytest
+from models.pacing import PacingController
+from models.simulation import Simulation
+
+def test_sleeps_until_deadline():
+    pacer = PacingController(time_step=60, speed=600)  # 0.1 s per step
+    pacer.start(now=0.0)
+    assert pacer.step_finished(0.02, now=0.02) == pytest.approx(0.08)
+    assert pacer.step_finished(0.05, now=0.15) == pytest.approx(0.05)
+    assert pacer.overruns == 0 and pacer.late_steps == 0
+
+def test_burst_catches_up_then_drops_beyond_limit():
+    pacer = PacingController(time_step=60, speed=600, catch_up='burst', max_burst_steps=3)
+    pacer.start(now=0.0)
+    # 0.25 s step: two slots behind, run the next ones back to back
+    assert pacer.step_finished(0.25, now=0.25) == 0.0
+    assert pacer.overruns == 1 and pacer.catch_up_steps == 1
+    assert pacer.step_finished(0.01, now=0.26) == 0.0
+    # 1 s stall: only 3 steps of backlog are kept
+    pacer.step_finished(1.0, now=1.26)
+    assert pacer.dropped_steps > 0
+    assert pacer.deadline == pytest.approx(1.26 - 0.2)
+
+def test_drop_resynchronizes():
+    pacer = PacingController(time_step=60, speed=600, catch_up='drop')
+    pacer.start(now=0.0)
+    assert pacer.step_finished(0.35, now=0.35) == 0.0
+    assert pacer.dropped_steps == 2
+    assert pacer.step_finished(0.01, now=0.36) == pytest.approx(0.09)
+
+def test_restart_reports_the_new_run_only():
+    pacer = PacingController(time_step=60, speed=1.0)
+    pacer.start(now=0.0)
+    for i in range(100):
+        pacer.step_finished(0.01, now=60.0 * (i + 1))
+    pacer.start(now=10000.0)
+    assert pacer.steps == 0
+    pacer.step_finished(0.01, now=10060.0)
+    stats = pacer.stats()
+    assert stats['steps'] == 1 and stats['overruns'] == 0
+
+def test_speed_change_applies_while_running(small_world):
+    simulation = Simulation(*small_world)
+    simulation.set_speed(60)  # 1 step per second
+    simulation.start()
+    time.sleep(0.3)
+    simulation.set_speed(60000)
+    time.sleep(0.3)
+    simulation.stop()
+    assert simulation.current_step > 5
+    assert simulation.metrics['pacing']['target_speed'] == 60000
+    with pytest.raises(ValueError):
+        simulation.set_speed(0)
+
+def test_reset_clears_metrics_and_pacing(small_world):
+    simulation = Simulation(*small_world)
+    simulation.set_speed(60000)
+    simulation.start()
+    time.sleep(0.2)
+    simulation.stop()
+    assert simulation.metrics['pacing']['steps'] > 0
+    simulation.reset()
+    assert 'pacing' not in simulation.metrics
+    assert simulation.metrics == Simulation._initial_metrics()
+    assert simulation.pacer.stats()['steps'] == 0
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from models.quantiles import DurationSketches, QuantileSketch
+from models.simulation import Simulation
+
+def rank_of(data, value):
+    return np.mean(np.asarray(data) <= value)
+
+def test_quantiles_within_rank_error_in_bounded_memory():
+    data = np.random.default_rng(0).exponential(600, 100000)
+    sketch = QuantileSketch(k=200)
+    for value in data.tolist():
+        sketch.update(value)
+    assert sketch.size < 3 * 200 + 50
+    for q in (0.5, 0.9, 0.95, 0.99):
+        assert rank_of(data, sketch.quantile(q)) == pytest.approx(q, abs=0.02)
+    assert sketch.quantile(0) == data.min() and sketch.quantile(1) == data.max()
+
+def test_merged_sketch_matches_union():
+    rng = np.random.default_rng(1)
+    parts = [rng.normal(loc, 1, 20000) for loc in (0, 5, 10)]
+    merged = QuantileSketch(k=200)
+    for part in parts:
+        sketch = QuantileSketch(k=200)
+        for value in part.tolist():
+            sketch.update(value)
+        merged.merge(sketch)
+    union = np.concatenate(parts)
+    assert merged.count == len(union)
+    for q in (0.1, 0.5, 0.95):
+        assert rank_of(union, merged.quantile(q)) == pytest.approx(q, abs=0.02)
+
+def test_state_round_trip():
+    sketches = DurationSketches(k=50)
+    for value in range(5000):
+        sketches.record_wait(value)
+    restored = DurationSketches.from_state(sketches.to_state())
+    assert restored.summary() == sketches.summary()
+
+def test_stations_feed_fleet_sketches(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(60):
+        simulation.step()
+    served = sum(station.total_served for station in simulation.stations)
+    assert served > 0
+    assert simulation.durations.wait.count == served
+    assert simulation.metrics['wait_time_quantiles']['count'] == served
+    busiest = max(simulation.stations, key=lambda station: station.total_served)
+    assert busiest.to_dict()['wait_time_quantiles']['count'] == busiest.total_served
+    merged = simulation.get_duration_quantiles([0.5], [station.id for station in simulation.stations])
+    assert merged['wait_time']['count'] == served
+    with pytest.raises(ValueError):
+        simulation.get_duration_quantiles([0.5], ['missing'])
+    simulation.reset()
+    assert simulation.durations.wait.count == 0 and busiest.durations.wait.count == 0
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from models.road_graph import RoadGraph, get_offline_router
+
+def test_contraction_hierarchy_matches_astar(nodes, graph):
+    plain = RoadGraph.from_nodes(nodes)
+    rng = np.random.default_rng(3)
+    for source, target in rng.integers(0, len(nodes), size=(200, 2)).tolist():
+        expected, _ = plain.astar(source, target)
+        distance, path = graph.shortest_path(source, target)
+        assert distance == pytest.approx(expected)
+        assert path[0] == source and path[-1] == target
+
+def test_unpacked_path_follows_original_edges(graph, nodes):
+    plain = RoadGraph.from_nodes(nodes)
+    distance, path = graph.shortest_path(0, len(nodes) - 1)
+    total = sum(plain.adj[u][v] for u, v in zip(path, path[1:]))
+    assert total == pytest.approx(distance)
+
+def test_graph_is_connected(graph, nodes):
+    for target in range(1, len(nodes)):
+        distance, _ = graph.shortest_path(0, target)
+        assert np.isfinite(distance)
+
+def test_route_snaps_off_graph_endpoints(graph, nodes):
+    origin = (nodes[0][0] + 0.001, nodes[0][1])
+    route = graph.route(origin, nodes[5])
+    assert route["points"][0] == origin
+    assert route["points"][-1] == tuple(nodes[5])
+    assert route["distance"] > 0
+    assert route["duration"] > 0
+
+def test_from_edge_file(tmp_path):
+    path = tmp_path / "edges.csv"
+    path.write_text("12.90,77.50,12.91,77.50\n12.91,77.50,12.91,77.51,2000\n")
+    graph = RoadGraph.from_edge_file(str(path))
+    distance, path_nodes = graph.astar(0, 2)
+    assert len(path_nodes) == 3
+    assert distance >= 2000
+
+def test_offline_router_is_keyed_on_every_node(nodes):
+    other = list(nodes)
+    middle = len(other) // 2
+    other[middle] = (other[middle][0] + 0.001, other[middle][1])
+    router = get_offline_router(nodes)
+    assert get_offline_router(list(nodes)) is router
+    assert get_offline_router(other) is not router
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from models.scheduler import OptimizationScheduler
+from models.simulation import Simulation
+from models.station import ChargingStation
+
+def fleet(*ids):
+    return [SimpleNamespace(id=ev_id) for ev_id in ids]
+
+def test_new_ev_triggers_after_debounce():
+    scheduler = OptimizationScheduler(debounce_steps=1, max_latency_steps=5, interval=10)
+    stations = [ChargingStation(id='s1')]
+    scheduler.observe(0, [], stations)
+    assert scheduler.due(0, last_round_step=0) is None
+    scheduler.observe(1, fleet('a'), stations)
+    assert scheduler.due(1, last_round_step=0) is None
+    scheduler.observe(2, fleet('a'), stations)
+    assert scheduler.due(2, last_round_step=0) == 'batch'
+    scheduler.round_started(2, 'batch')
+    scheduler.round_finished()
+    assert scheduler.stats()['max_latency_steps'] == 1
+
+def test_latency_bound_overrides_min_batch():
+    scheduler = OptimizationScheduler(debounce_steps=0, max_latency_steps=3, min_batch=5, interval=100)
+    stations = [ChargingStation(id='s1')]
+    for step in range(3):
+        scheduler.observe(step, fleet('a'), stations)
+        assert scheduler.due(step, last_round_step=0) is None
+    scheduler.observe(3, fleet('a'), stations)
+    assert scheduler.due(3, last_round_step=0) == 'latency'
+
+def test_station_events_only_count_for_waiting_evs():
+    scheduler = OptimizationScheduler(debounce_steps=0, max_latency_steps=10, interval=100)
+    station = ChargingStation(id='s1')
+    scheduler.observe(0, [], [station])
+    station.add_to_queue(SimpleNamespace(join_queue=lambda station: None))
+    scheduler.observe(1, [], [station])
+    assert scheduler.first_event_step is None
+    assert scheduler.events['queue_change'] == 1
+
+    # An EV still in a running round is not waiting; one dropped afterwards is
+    scheduler.observe(2, fleet('a'), [station])
+    scheduler.round_started(2, 'batch')
+    station.add_to_queue(SimpleNamespace(join_queue=lambda station: None))
+    scheduler.observe(3, fleet('a'), [station])
+    assert scheduler.due(3, last_round_step=2) is None
+    scheduler.round_finished()
+    station.add_to_queue(SimpleNamespace(join_queue=lambda station: None))
+    scheduler.observe(4, fleet('a'), [station])
+    assert scheduler.due(4, last_round_step=2) == 'batch'
+
+def test_interval_mode_keeps_fixed_cadence(small_world):
+    simulation = Simulation(*small_world)
+    simulation.scheduler.mode = 'interval'
+    for _ in range(25):
+        simulation.step()
+    rounds = simulation.metrics['optimization_scheduler']['rounds']
+    assert rounds['batch'] == rounds['latency'] == 0
+    assert rounds['interval'] >= 1
@@ -0,0 +1,58 @@
+from models.sharding import RegionGrid, RegionSimulation, ShardedSimulation, pack_ev, route_ids, unpack_ev
+from models.clock import SimulationClock
+from utils.data_generator import BANGALORE_CENTER, CITY_RADIUS
+
+def test_region_grid():
+    grid = RegionGrid((0.0, 0.0), 1.0, 2, 3)
+    assert len(grid) == 6
+    assert grid.region_of((-0.9, -0.9)) == 0
+    assert grid.region_of((0.9, 0.9)) == 5
+    assert grid.region_of((5.0, -5.0)) == 3  # Clamped to the edge
+    assert grid.regions_of([(-0.9, -0.9), (0.9, 0.9)]).tolist() == [0, 5]
+    assert sorted(grid.neighbours(0)) == [1, 3, 4]
+
+def test_pack_unpack_round_trip(small_world):
+    evs, _, routes = small_world
+    ev = evs[0]
+    for _ in range(3):
+        ev.move(60)
+    known = route_ids(routes)
+    packed = pack_ev(ev, known, pending_station="station-2")
+    clock = SimulationClock(3, 60)
+    copy, pending = unpack_ev(packed, routes, {}, {}, clock)
+    assert pending == "station-2"
+    assert copy.route is ev.route  # Sent as a route index, resolved to the shared list
+    assert (copy.id, copy.soc, copy.route_index, copy.journey_log) == (ev.id, ev.soc, ev.route_index, ev.journey_log)
+    assert copy.clock is clock
+
+def test_handoffs_keep_every_ev(small_world):
+    evs, stations, routes = small_world
+    ids = {ev.id for ev in evs}
+    grid = RegionGrid(BANGALORE_CENTER, CITY_RADIUS, 2, 2)
+    with ShardedSimulation(evs, stations, routes, grid) as simulation:
+        for _ in range(40):
+            simulation.step()
+            in_transit = sum(len(packed) for packed in simulation.inbound)
+            assert sum(simulation.metrics['region_ev_counts']) + in_transit == len(ids)
+        assert simulation.handoffs > 0
+        simulation.step()
+        state = simulation.get_current_state()
+        in_transit = sum(len(packed) for packed in simulation.inbound)
+    assert len({ev['id'] for ev in state['evs']}) + in_transit == len(ids)
+
+def test_region_simulation_forks_into_its_own_class(small_world):
+    evs, stations, routes = small_world
+    grid = RegionGrid(BANGALORE_CENTER, CITY_RADIUS, 1, 1)
+    region = RegionSimulation(0, grid, stations, routes)
+    region.evs.extend(evs)
+    for ev in evs:
+        ev.clock = region.clock
+    for _ in range(5):
+        region.step()
+    fork = region.fork()
+    assert type(fork) is RegionSimulation
+    assert (fork.region, fork.grid, fork.current_step) == (0, grid, region.current_step)
+    assert [ev.id for ev in fork.evs] == [ev.id for ev in region.evs]
+    assert all(ev.clock is fork.clock for ev in fork.evs)
+    fork.step()
+    assert region.current_step == 5
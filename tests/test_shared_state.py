@@ -0,0 +1,96 @@
+import threading
+from multiprocessing.connection import Listener
+from types import SimpleNamespace
+import pytest
+from flask import Flask, jsonify, request
+import serve
+from utils.shared_state import SharedState
+
+@pytest.fixture
+def state():
+    segment = SharedState.create(64 * 1024)
+    yield segment
+    segment.close()
+
+def test_publish_and_read(state):
+    assert state.read('state') is None
+    assert state.publish({'state': (b'{"step": 3}', 'application/json', 200)}, {'step': 3})
+    reader = SharedState.attach(state.name)
+    assert reader.read('state') == (b'{"step": 3}', 'application/json', 200, {'step': 3})
+    assert reader.read('missing') is None
+
+    assert state.publish({'state': (b'{"step": 4}', 'application/json', 200)}, {'step': 4})
+    assert reader.read('state')[0] == b'{"step": 4}'
+    assert state.sequence % 2 == 0
+    reader.close()
+
+def test_oversized_publish_keeps_previous_blobs(state):
+    state.publish({'state': (b'old', 'application/json', 200)})
+    assert not state.publish({'state': (b'x' * 100000, 'application/json', 200)})
+    assert state.read('state')[0] == b'old'
+
+def test_read_retries_while_a_publish_is_in_progress(state):
+    state.publish({'state': (b'old', 'application/json', 200)})
+    state.buffer[0] += 1  # Odd sequence: a writer is mid-publish
+    with pytest.raises(TimeoutError):
+        state.read('state', retries=10)
+
+def test_worker_serves_published_and_forwards_the_rest(state, monkeypatch):
+    backend = Flask(__name__)
+
+    @backend.route('/api/simulation/start', methods=['POST'])
+    def start():
+        return jsonify({'success': True, 'speed': request.json['speed']})
+
+    listener = Listener(authkey=b'test')
+    changed = threading.Event()
+    def accept():
+        serve.handle_connection(SimpleNamespace(app=backend), listener.accept(), changed)
+    threading.Thread(target=accept, daemon=True).start()
+
+    monkeypatch.setattr(serve, 'serving', {'state': state, 'address': listener.address, 'authkey': b'test'})
+    monkeypatch.setattr(serve, 'connections', threading.local())
+    client = serve.worker.test_client()
+    state.publish({'state': (b'{"step": 7}', 'application/json', 200)}, {'step': 7})
+
+    response = client.get('/api/simulation/state')
+    assert response.get_json() == {'step': 7}
+    assert response.headers['X-Simulation-Step'] == '7'
+
+    response = client.post('/api/simulation/start', json={'speed': 5})
+    assert response.get_json() == {'success': True, 'speed': 5}
+    assert changed.is_set()
+    listener.close()
+
+def test_worker_forwards_when_reads_keep_overlapping_publishes(state, monkeypatch):
+    backend = Flask(__name__)
+
+    @backend.route('/api/simulation/state')
+    def current_state():
+        return jsonify({'step': 8})
+
+    listener = Listener(authkey=b'test')
+    threading.Thread(target=lambda: serve.handle_connection(SimpleNamespace(app=backend), listener.accept(),
+                                                            threading.Event()), daemon=True).start()
+    monkeypatch.setattr(serve, 'serving', {'state': state, 'address': listener.address, 'authkey': b'test'})
+    monkeypatch.setattr(serve, 'connections', threading.local())
+    state.publish({'state': (b'{"step": 7}', 'application/json', 200)})
+    state.buffer[0] += 1  # A publish that never finishes
+    assert serve.worker.test_client().get('/api/simulation/state').get_json() == {'step': 8}
+    listener.close()
+
+def test_worker_does_not_resend_writes_after_a_dropped_connection(state, monkeypatch):
+    listener = Listener(authkey=b'test')
+    received = []
+    def accept():
+        while True:
+            connection = listener.accept()
+            received.append(connection.recv())
+            connection.close()  # Drop the connection without answering
+    threading.Thread(target=accept, daemon=True).start()
+    monkeypatch.setattr(serve, 'serving', {'state': state, 'address': listener.address, 'authkey': b'test'})
+    monkeypatch.setattr(serve, 'connections', threading.local())
+    response = serve.worker.test_client().post('/api/simulation/reset', json={})
+    assert response.status_code == 502
+    assert len(received) == 1
+    listener.close()
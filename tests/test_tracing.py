@@ -0,0 +1,61 @@
+import pytest
+from models.optimization import optimize_charging, tracer
+from models.simulation import Simulation
+from models.tracing import DEBUG, INFO, WARNING, DecisionTracer
+
+@pytest.fixture(autouse=True)
+def fresh_tracer():
+    tracer.clear()
+    tracer.configure(level=INFO, sample_rate=1.0)
+    yield
+    tracer.clear()
+    tracer.configure(level=INFO, sample_rate=1.0)
+
+def needing_charge(small_world):
+    evs, stations, _ = small_world
+    return [ev for ev in evs if ev.needs_charging(0.3)], stations
+
+def test_ring_buffer_is_bounded_and_queryable():
+    trace = DecisionTracer(capacity=3)
+    for i in range(5):
+        trace.record(INFO, 'assign', f"ev-{i}", "station-1", values=(float(i),))
+    assert [record['ev_id'] for record in trace.query()] == ['ev-2', 'ev-3', 'ev-4']
+    assert [record['seq'] for record in trace.query(since=4)] == [5]
+    assert trace.query(ev_id='ev-3')[0]['message'] == "Assigned EV ev-3 to station station-1 with total time: 3.0s"
+    assert trace.query(station_id='station-2') == []
+
+def test_scores_only_recorded_at_debug(small_world):
+    evs, stations = needing_charge(small_world)
+    optimize_charging(evs, stations)
+    assert tracer.query(kind='score') == []
+    assigned = tracer.query(kind='assign', limit=1000)
+    assert assigned and all(record['station_id'] for record in assigned)
+
+    tracer.configure(level='DEBUG')
+    optimize_charging(evs, stations)
+    scores = tracer.query(kind='score', station_id=stations[0].id, limit=1000)
+    assert scores and all(record['level'] == 'DEBUG' for record in scores)
+
+def test_warning_level_skips_per_ev_records(small_world):
+    evs, stations = needing_charge(small_world)
+    tracer.configure(level=WARNING)
+    optimize_charging(evs, stations)
+    assert all(record['kind'] in ('skip', 'abandon', 'error') for record in tracer.query(limit=1000))
+
+def test_sampling_keeps_the_same_evs_each_round(small_world):
+    evs, stations = needing_charge(small_world)
+    tracer.configure(sample_rate=0.3)
+    optimize_charging(evs, stations)
+    first = {record['ev_id'] for record in tracer.query(kind='ev', limit=1000)}
+    tracer.clear()
+    optimize_charging(evs, stations)
+    second = {record['ev_id'] for record in tracer.query(kind='ev', limit=1000)}
+    assert first == second
+    assert 0 < len(first) < len(evs)
+
+def test_history_no_longer_copies_logs(small_world):
+    simulation = Simulation(*small_world)
+    simulation.step()
+    simulation._record_state()
+    assert 'optimization_logs' not in simulation.get_current_state()
+    assert any('Optimization completed' in line for line in simulation.get_optimization_logs())
@@ -0,0 +1,50 @@
+import gzip
+import numpy as np
+import pytest
+from werkzeug.datastructures import Accept, MIMEAccept
+from models.simulation import Simulation
+from utils import transport
+
+def test_columnar_round_trip():
+    columns = [('a', np.arange(5, dtype=np.float32)), ('b', np.array([1, 2, 3], dtype=np.uint8)),
+               ('c', np.arange(4, dtype=np.uint32))]
+    header, decoded = transport.decode_columnar(transport.encode_columnar({'step': 7}, columns))
+    assert header['step'] == 7
+    for name, array in columns:
+        assert decoded[name].dtype == array.dtype
+        assert decoded[name].tolist() == array.tolist()
+    assert all(column['offset'] % 8 == 0 for column in header['columns'])
+
+def test_state_columnar_matches_evs(small_world):
+    simulation = Simulation(*small_world)
+    simulation.step()
+    payload = transport.state_columnar(simulation.current_step, simulation.metrics,
+                                       simulation.evs, simulation.stations)
+    header, columns = transport.decode_columnar(payload)
+    assert header['ev_ids'] == [ev.id for ev in simulation.evs]
+    assert columns['ev_soc'] == pytest.approx([ev.soc for ev in simulation.evs], abs=1e-6)
+    statuses = [transport.STATUS_CODES[ev.status] for ev in simulation.evs]
+    assert columns['ev_status'].tolist() == statuses
+    assert columns['station_queue'].tolist() == [len(station.queue) for station in simulation.stations]
+
+def test_negotiate_defaults_to_json():
+    assert transport.negotiate(MIMEAccept([('*/*', 1)])) == transport.JSON
+    assert transport.negotiate(MIMEAccept()) == transport.JSON
+    assert transport.negotiate(MIMEAccept([(transport.COLUMNAR, 1)])) == transport.COLUMNAR
+    assert transport.negotiate(MIMEAccept([(transport.COLUMNAR, 1)]), columnar=False) == transport.JSON
+
+@pytest.mark.skipif(transport.msgpack is None, reason="msgpack not installed")
+def test_msgpack_ev_fields_match_dicts(small_world):
+    evs = small_world[0][:10]
+    getters = [('id', lambda ev: ev.id), ('soc', lambda ev: ev.soc)]
+    assert transport.msgpack.unpackb(transport.pack_ev_fields(evs, getters)) == \
+        [{'id': ev.id, 'soc': ev.soc} for ev in evs]
+    assert transport.negotiate(MIMEAccept([('application/x-msgpack', 1)])) == transport.MSGPACK
+
+def test_compress_skips_small_bodies():
+    gzip_only = Accept([('gzip', 1)])
+    assert transport.compress(b'{}', gzip_only) == (b'{}', None)
+    body = b'x' * 4096
+    compressed, encoding = transport.compress(body, gzip_only)
+    assert encoding == 'gzip' and gzip.decompress(compressed) == body
+    assert transport.compress(body, Accept()) == (body, None)
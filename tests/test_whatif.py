@@ -0,0 +1,51 @@
+import pytest
+from models.whatif import apply_scenario, fast_forward, run_what_ifs
+from models.simulation import Simulation
+
+def busiest_station(simulation):
+    return max(simulation.stations, key=lambda station: len(station.queue) + len(station.charging_evs))
+
+def test_fork_is_independent(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(10):
+        simulation.step()
+    positions = [ev.current_position for ev in simulation.evs]
+    fork = simulation.fork()
+    assert fork.current_step == simulation.current_step
+    assert [ev.current_position for ev in fork.evs] == positions
+    fast_forward(fork, 20)
+    assert fork.current_step == simulation.current_step + 20
+    assert [ev.current_position for ev in simulation.evs] == positions
+    assert all(ev.clock is simulation.clock for ev in simulation.evs)
+    # Route point lists are shared, not copied
+    assert fork.evs[0].route is simulation.evs[0].route
+
+def test_station_down_releases_its_evs(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(30):
+        simulation.step()
+    fork = simulation.fork()
+    station = busiest_station(fork)
+    affected = list(station.queue) + list(station.charging_evs)
+    apply_scenario(fork, {'stations_down': [station.id], 'add_chargers': {fork.stations[0].id: 2}})
+    assert station not in fork.stations
+    assert all(ev.assigned_station is None and not ev.in_queue and not ev.charging for ev in affected)
+    with pytest.raises(ValueError):
+        apply_scenario(fork, {'stations_down': ['missing']})
+
+def test_parallel_forks_match_inline_run(small_world):
+    simulation = Simulation(*small_world)
+    for _ in range(10):
+        simulation.step()
+    inline = fast_forward(simulation.fork(), 15)
+    station_id = busiest_station(simulation).id
+    results = run_what_ifs(simulation, [
+        {'name': 'baseline'},
+        {'name': 'down', 'stations_down': [station_id]},
+        {'name': 'bad', 'add_chargers': {'missing': 1}}
+    ], 15, workers=2)
+    assert [result['name'] for result in results] == ['baseline', 'down', 'bad']
+    assert results[0]['average_wait_time'] == inline['average_wait_time']
+    assert results[0]['steps'] == list(range(11, 26))
+    assert 'error' in results[2]
+    assert simulation.current_step == 10
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Sequence
+import numpy as np
+
+# Bump when the on-disk layout changes; old caches then simply miss
+CACHE_FORMAT_VERSION = 1
+
+# Directory holding node and route caches
+CACHE_DIR = "data_cache"
+
+ROUTE_COLUMNS = ('points', 'offsets', 'origins', 'destinations', 'distances', 'id_numbers')
+
+def cache_key(**params):
+    """Stable short hash of generation parameters and the cache format version"""
+    payload = json.dumps({'version': CACHE_FORMAT_VERSION, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def array_key(values):
+    """Stable short hash of a coordinate array's float64 contents"""
+    return hashlib.sha256(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+def nodes_path(key):
+    """Path of the node coordinate array for a cache key"""
+    return os.path.join(CACHE_DIR, f"nodes-{key}.npy")
+
+def distance_matrix_path(key):
+    """Path of the node x node distance matrix stored next to the nodes"""
+    return os.path.join(CACHE_DIR, f"nodes-{key}.dist.npy")
+
+def station_matrix_path(key, station_locations):
+    """Path of the node x station distance matrix for a station set, next to the nodes"""
+    stations_key = array_key(station_locations)
+    return os.path.join(CACHE_DIR, f"nodes-{key}.stations-{stations_key}.npy")
+
+def prune_station_matrices(key, current, keep=8):
+    """
+    Keep the `keep` most recently used node x station matrices for a node set
+
+    `current` (the matrix just built or opened) is marked as used first;
+    older station sets are deleted, so regenerating stations doesn't grow
+    the cache without bound. Returns the number of files removed.
+    """
+    if os.path.exists(current):
+        os.utime(current)
+    prefix = f"nodes-{key}.stations-"
+    try:
+        names = [name for name in os.listdir(CACHE_DIR) if name.startswith(prefix) and name.endswith('.npy')]
+    except FileNotFoundError:
+        return 0
+    paths = sorted((os.path.join(CACHE_DIR, name) for name in names), key=os.path.getmtime, reverse=True)
+    removed = 0
+    for path in paths[max(keep, 1):]:
+        if path == current:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError as e:
+            print(f"Failed to remove {path}: {e}")
+    return removed
+
+def routes_path(key):
+    """Directory of the columnar route arrays for a cache key"""
+    return os.path.join(CACHE_DIR, f"routes-{key}")
+
+def save_nodes(key, nodes):
+    """Save node coordinates as a (N, 2) float64 array"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = nodes_path(key) + ".tmp.npy"
+        np.save(tmp_path, np.asarray(nodes, dtype=np.float64).reshape(-1, 2))
+        os.replace(tmp_path, nodes_path(key))
+    except Exception as e:
+        print(f"Error saving nodes cache: {e}")
+
+def load_nodes(key):
+    """Load node coordinates for a cache key, or None if not cached"""
+    path = nodes_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        nodes = [tuple(node) for node in np.load(path, mmap_mode='r').tolist()]
+        print(f"Loaded {len(nodes)} cached nodes")
+        return nodes
+    except Exception as e:
+        print(f"Error loading nodes cache: {e}")
+        return None
+
+class RouteTable(Sequence):
+    """
+    Routes stored as flat columns
+
+    All route points live in one (P, 2) array; route i spans
+    points[offsets[i]:offsets[i + 1]]. Columns may be memory-mapped, so
+    opening a table is zero-copy. Indexing returns the same dict shape as
+    the route generator, built on first access and then shared.
+    """
+
+    def __init__(self, points, offsets, origins, destinations, distances, id_numbers):
+        self.points = points
+        self.offsets = offsets
+        self.origins = origins
+        self.destinations = destinations
+        self.distances = distances
+        self.id_numbers = id_numbers
+        self._materialized = {}
+
+    @classmethod
+    def from_routes(cls, routes):
+        """Build a table from a list of route dicts"""
+        if isinstance(routes, RouteTable):
+            return routes
+        counts = [len(route["points"]) for route in routes]
+        offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        points = np.empty((int(offsets[-1]), 2), dtype=np.float64)
+        for i, route in enumerate(routes):
+            points[offsets[i]:offsets[i + 1]] = route["points"]
+        table = cls(
+            points,
+            offsets,
+            np.array([route["origin"] for route in routes], dtype=np.float64).reshape(-1, 2),
+            np.array([route["destination"] for route in routes], dtype=np.float64).reshape(-1, 2),
+            np.array([route["distance"] for route in routes], dtype=np.float64),
+            np.array([int(str(route["id"]).rsplit('-', 1)[-1]) for route in routes], dtype=np.int64)
+        )
+        # Keep the original dicts so existing references stay shared
+        table._materialized = dict(enumerate(routes))
+        return table
+
+    def __len__(self):
+        return len(self.distances)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("route index out of range")
+        route = self._materialized.get(index)
+        if route is None:
+            start, end = self.offsets[index], self.offsets[index + 1]
+            route = {
+                "id": f"route-{int(self.id_numbers[index])}",
+                "origin": tuple(self.origins[index].tolist()),
+                "destination": tuple(self.destinations[index].tolist()),
+                "points": [tuple(point) for point in self.points[start:end].tolist()],
+                "distance": float(self.distances[index])
+            }
+            self._materialized[index] = route
+        return route
+
+    def copy(self):
+        """List copy of the routes (matches list.copy for callers that extend it)"""
+        return list(self)
+
+def save_routes(key, routes):
+    """Save routes as columnar .npy arrays plus a metadata file"""
+    try:
+        table = RouteTable.from_routes(routes)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        final_path = routes_path(key)
+        tmp_path = final_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for column in ROUTE_COLUMNS:
+            np.save(os.path.join(tmp_path, f"{column}.npy"), getattr(table, column))
+        with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+            json.dump({'version': CACHE_FORMAT_VERSION, 'num_routes': len(table)}, f)
+        shutil.rmtree(final_path, ignore_errors=True)
+        os.replace(tmp_path, final_path)
+    except Exception as e:
+        print(f"Error saving routes cache: {e}")
+
+def load_routes(key):
+    """Open cached routes for a cache key as a memory-mapped RouteTable"""
+    path = routes_path(key)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('version') != CACHE_FORMAT_VERSION:
+            return None
+        columns = {
+            column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r')
+            for column in ROUTE_COLUMNS
+        }
+        table = RouteTable(**columns)
+        print(f"Loaded {len(table)} cached routes")
+        return table
+    except Exception as e:
+        print(f"Error loading routes cache: {e}")
+        return None
+
+def clear_cache():
+    """Remove all node and route caches"""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
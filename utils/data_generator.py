@@ -1,13 +1,16 @@
-import random
+import hashlib
 import numpy as np
 import config
 import concurrent.futures
-import os
-import pickle
 import time
-from models.ev import EV
 from models.station import ChargingStation
 from models.maps_service import get_route, calculate_distance, save_cache
+from models.distance import segment_lengths
+from models.fleet import FleetArrays
+from models.road_graph import get_offline_router
+from models.distance_matrix import DistanceMatrix, set_active_matrix
+from utils import cache_store
+from utils.cache_store import RouteTable, cache_key
 
 # Bangalore city center coordinates
 BANGALORE_CENTER = (12.9716, 77.5946)
@@ -15,69 +18,51 @@ BANGALORE_CENTER = (12.9716, 77.5946)
 # Radius of city area in degrees
 CITY_RADIUS = 0.1  # ~11km
 
-# Cache for generated data
-NODES_CACHE_FILE = "nodes_cache.pkl"
-ROUTES_CACHE_FILE = "routes_cache.pkl"
+def generate_random_locations(count, rng, center=BANGALORE_CENTER, radius=CITY_RADIUS):
+    """Generate `count` random locations within radius of center in one vectorized draw"""
+    angle = rng.uniform(0, 2 * np.pi, size=count)
+    distance = rng.uniform(0, radius, size=count)
+    lat = center[0] + distance * np.cos(angle)
+    lng = center[1] + distance * np.sin(angle)
+    return list(zip(lat.tolist(), lng.tolist()))
 
-def generate_random_location(center=BANGALORE_CENTER, radius=CITY_RADIUS):
-    """Generate a random location within radius of center"""
-    # Random angle
-    angle = random.uniform(0, 2 * np.pi)
-    
-    # Random distance within radius
-    distance = random.uniform(0, radius)
+def compute_route_distances(routes):
+    """
+    Total length in km of every route, computed in one batch over all route points
     
-    # Convert to lat/lng offset
-    lat_offset = distance * np.cos(angle)
-    lng_offset = distance * np.sin(angle)
+    Uses the same per-segment rules as EV.calculate_total_route_distance so
+    EVs can be handed the result instead of recomputing it.
+    """
+    table = RouteTable.from_routes(routes)
+    points = np.asarray(table.points)
+    offsets = np.asarray(table.offsets)
+    if len(points) < 2:
+        return np.zeros(len(table))
     
-    # Add to center
-    lat = center[0] + lat_offset
-    lng = center[1] + lng_offset
+    segments = segment_lengths(points) / 1000  # km
+    segments[(segments < 0) | (segments > 1000)] = 0
+    # Segment i joins points i and i+1; drop the ones that cross a route boundary
+    boundaries = offsets[1:-1] - 1
+    segments[boundaries[(boundaries >= 0) & (boundaries < len(segments))]] = 0
+    cumulative = np.concatenate(([0.0], np.cumsum(segments)))
     
-    return (lat, lng)
+    starts = offsets[:-1]
+    ends = np.maximum(offsets[1:] - 1, starts)
+    return cumulative[ends] - cumulative[starts]
 
-def save_nodes(nodes):
-    """Save nodes to disk"""
-    try:
-        with open(NODES_CACHE_FILE, 'wb') as f:
-            pickle.dump(nodes, f)
-    except Exception as e:
-        print(f"Error saving nodes cache: {e}")
+def generate_fleet(num_evs, num_routes, seed=None):
+    """Draw the trip parameters of a whole fleet into array-backed storage"""
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    return FleetArrays.generate(num_evs, num_routes, rng)
 
-def load_nodes():
-    """Load nodes from disk if available"""
-    if os.path.exists(NODES_CACHE_FILE):
-        try:
-            with open(NODES_CACHE_FILE, 'rb') as f:
-                nodes = pickle.load(f)
-            print(f"Loaded {len(nodes)} cached nodes")
-            return nodes
-        except Exception as e:
-            print(f"Error loading nodes cache: {e}")
-    return None
+def iter_ev_chunks(num_evs, routes, chunk_size=10000, seed=None):
+    """Yield generated EVs in lists of at most `chunk_size`, without holding the whole fleet"""
+    fleet = generate_fleet(num_evs, len(routes), seed)
+    route_distances = compute_route_distances(routes)
+    yield from fleet.iter_chunks(routes, chunk_size, route_distances)
 
-def save_routes(routes):
-    """Save routes to disk"""
-    try:
-        with open(ROUTES_CACHE_FILE, 'wb') as f:
-            pickle.dump(routes, f)
-    except Exception as e:
-        print(f"Error saving routes cache: {e}")
-
-def load_routes():
-    """Load routes from disk if available"""
-    if os.path.exists(ROUTES_CACHE_FILE):
-        try:
-            with open(ROUTES_CACHE_FILE, 'rb') as f:
-                routes = pickle.load(f)
-            print(f"Loaded {len(routes)} cached routes")
-            return routes
-        except Exception as e:
-            print(f"Error loading routes cache: {e}")
-    return None
-
-def generate_synthetic_data(num_evs=100, num_stations=20, num_nodes=80, num_routes=240, use_cache=True):
+def generate_synthetic_data(num_evs=100, num_stations=20, num_nodes=80, num_routes=240, use_cache=True,
+                            seed=None):
     """
     Generate synthetic EVs, charging stations, nodes and routes
     
@@ -87,89 +72,107 @@ def generate_synthetic_data(num_evs=100, num_stations=20, num_nodes=80, num_rout
         num_nodes: Number of nodes (locations) in the city
         num_routes: Number of predefined routes between nodes
         use_cache: Whether to use cached data if available
+        seed: Seed for the NumPy Generators drawing nodes, routes, stations and EVs
     """
+    # One independent stream per stage, so skipping a stage (e.g. nodes
+    # loaded from cache) doesn't shift the draws of the others
+    node_rng, route_rng, station_rng, fleet_rng = (
+        np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(4)
+    )
+    # Caches are keyed by the parameters that produced them
+    nodes_key = cache_key(kind='nodes', num_nodes=num_nodes, center=BANGALORE_CENTER, radius=CITY_RADIUS,
+                          seed=seed)
+    
     # Try to load nodes from cache
-    nodes = None
-    routes = None
-    if use_cache:
-        nodes = load_nodes()
-        routes = load_routes()
+    nodes = cache_store.load_nodes(nodes_key) if use_cache else None
     
     if nodes is None:
         print("Generating nodes...")
         # Generate nodes (key locations in the city)
-        nodes = [generate_random_location() for _ in range(num_nodes)]
+        nodes = generate_random_locations(num_nodes, node_rng)
         # Save nodes to cache
-        save_nodes(nodes)
-    else:
-        # Ensure we have enough nodes
-        if len(nodes) < num_nodes:
-            print(f"Extending nodes from {len(nodes)} to {num_nodes}...")
-            additional_nodes = [generate_random_location() for _ in range(num_nodes - len(nodes))]
-            nodes.extend(additional_nodes)
-            save_nodes(nodes)
+        cache_store.save_nodes(nodes_key, nodes)
+    
+    # Routes depend on the exact node coordinates and how they were routed
+    offline = getattr(config, 'OFFLINE_ROUTING', False)
+    edge_file = getattr(config, 'ROAD_GRAPH_FILE', None)
+    routes_key = cache_key(
+        kind='routes',
+        nodes=hashlib.sha256(np.asarray(nodes, dtype=np.float64).tobytes()).hexdigest(),
+        num_routes=num_routes,
+        offline=offline,
+        road_graph=edge_file,
+        seed=seed
+    )
+    routes = cache_store.load_routes(routes_key) if use_cache else None
     
     print("Generating charging stations...")
-    stations = []
-    # Generate stations
-    for i in range(num_stations):
-        # Place stations at random nodes
-        location = random.choice(nodes)
-        # Vary number of chargers (1-4)
-        num_chargers = random.randint(1, 4)
-        # Vary charging rate (7-22 kW)
-        charging_rate = random.choice([7.0, 11.0, 22.0])
-        
-        station = ChargingStation(
+    # Place stations at random nodes
+    station_nodes = station_rng.integers(0, len(nodes), size=num_stations).tolist()
+    # Vary number of chargers (1-4)
+    station_chargers = station_rng.integers(1, 5, size=num_stations).tolist()
+    # Vary charging rate (7-22 kW)
+    station_rates = station_rng.choice([7.0, 11.0, 22.0], size=num_stations).tolist()
+    stations = [
+        ChargingStation(
             id=f"station-{i+1}",
-            location=location,
-            num_chargers=num_chargers,
-            charging_rate=charging_rate
+            location=nodes[station_nodes[i]],
+            num_chargers=station_chargers[i],
+            charging_rate=station_rates[i]
         )
-        stations.append(station)
+        for i in range(num_stations)
+    ]
+    
+    # Precompute node x node and node x station distances for lookups
+    station_locations = [station.location for station in stations]
+    station_cache_file = cache_store.station_matrix_path(nodes_key, station_locations) if use_cache else None
+    distance_matrix = DistanceMatrix.build(
+        nodes,
+        station_locations,
+        cache_file=cache_store.distance_matrix_path(nodes_key) if use_cache else None,
+        station_cache_file=station_cache_file
+    )
+    if station_cache_file:
+        cache_store.prune_station_matrices(nodes_key, station_cache_file,
+                                           keep=getattr(config, 'STATION_MATRIX_CACHE_LIMIT', 8))
+    set_active_matrix(distance_matrix)
     
     # Generate predefined routes between nodes if not loaded from cache
     if routes is None or len(routes) < num_routes:
-        print(f"Generating routes in parallel (this might take a while)...")
-        routes = generate_routes_parallel(nodes, num_routes, existing_routes=routes)
+        # Offline road graph used instead of (or as a fallback for) the Maps API
+        router = get_offline_router(nodes, edge_file)
+        print(f"Generating routes {'offline' if offline else 'in parallel (this might take a while)'}...")
+        routes = generate_routes_parallel(nodes, num_routes, existing_routes=routes,
+                                          router=router, offline=offline,
+                                          routes_cache_key=routes_key, rng=route_rng)
         # Save routes to cache after generation
-        save_routes(routes)
+        routes = RouteTable.from_routes(routes)
+        cache_store.save_routes(routes_key, routes)
     else:
         print(f"Using {len(routes)} cached routes")
     
     print("Generating EVs...")
-    evs = []
-    # Generate EVs
-    for i in range(num_evs):
-        # Randomly select a route
-        selected_route = random.choice(routes)
-        
-        # Generate EV properties
-        # 20-60 kWh for battery capacity (smaller for scooters, larger for cars)
-        battery_capacity = random.uniform(20, 60)
-        # 0.2 to 0.8 for initial SoC
-        initial_soc = random.uniform(0.2, 0.8)
-        # 0.15 to 0.25 kWh/km for consumption
-        consumption_rate = random.uniform(0.15, 0.25)
-        
-        ev = EV(
-            id=f"ev-{i+1}",
-            origin=selected_route["origin"],
-            destination=selected_route["destination"],
-            battery_capacity=battery_capacity,
-            initial_soc=initial_soc,
-            consumption_rate=consumption_rate,
-            route=selected_route["points"]
-        )
-        evs.append(ev)
+    start_time = time.time()
+    fleet = generate_fleet(num_evs, len(routes), fleet_rng)
+    evs = fleet.materialize(routes, compute_route_distances(routes))
+    elapsed = time.time() - start_time
+    print(f"Generated {num_evs} EVs in {elapsed:.3f}s ({num_evs / max(elapsed, 1e-9):.0f} EVs/sec)")
     
     # Ensure route cache is saved to disk
     save_cache()
     print("Data generation complete!")
     return evs, stations, routes
 
-def generate_routes_parallel(nodes, num_routes, max_workers=10, existing_routes=None):
-    """Generate routes in parallel using ThreadPoolExecutor"""
+def generate_routes_parallel(nodes, num_routes, max_workers=10, existing_routes=None,
+                             router=None, offline=False, routes_cache_key=None, rng=None):
+    """
+    Generate routes in parallel using ThreadPoolExecutor
+
+    With `offline=True` routes come straight from the offline `router`
+    without any network calls, so no thread pool is needed. Partial
+    progress is saved under `routes_cache_key` when one is given.
+    Node pairs are drawn from `rng` (a NumPy Generator).
+    """
     routes = [] if existing_routes is None else existing_routes.copy()
     routes_to_generate = max(0, num_routes - len(routes))
     
@@ -179,24 +182,29 @@ def generate_routes_parallel(nodes, num_routes, max_workers=10, existing_routes=
     
     print(f"Generating {routes_to_generate} new routes...")
     
-    # Create node pairs for routes
-    node_pairs = []
-    for _ in range(routes_to_generate):
-        # Select random origin and destination nodes
-        origin_idx = random.randint(0, len(nodes) - 1)
-        dest_idx = random.randint(0, len(nodes) - 1)
-        
-        # Ensure origin and destination are different
-        while origin_idx == dest_idx:
-            dest_idx = random.randint(0, len(nodes) - 1)
-            
-        node_pairs.append((nodes[origin_idx], nodes[dest_idx]))
+    # Create node pairs for routes: random origin, then a destination among the other nodes
+    if rng is None:
+        rng = np.random.default_rng()
+    origin_idx = rng.integers(0, len(nodes), size=routes_to_generate)
+    dest_idx = rng.integers(0, len(nodes) - 1, size=routes_to_generate)
+    dest_idx += dest_idx >= origin_idx
+    node_pairs = [(nodes[o], nodes[d]) for o, d in zip(origin_idx.tolist(), dest_idx.tolist())]
+    
+    if offline and router is not None:
+        start_time = time.time()
+        for origin, destination in node_pairs:
+            route_data, _ = get_offline_route_data(router, origin, destination, len(routes))
+            routes.append(route_data)
+        elapsed = time.time() - start_time
+        print(f"Generated {len(node_pairs)} offline routes in {elapsed:.3f}s "
+              f"({len(node_pairs) / max(elapsed, 1e-9):.0f} routes/sec)")
+        return routes
     
     # Process routes in parallel
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Submit all tasks
         future_to_pair = {
-            executor.submit(get_route_data, pair[0], pair[1], len(routes) + i): pair 
+            executor.submit(get_route_data, pair[0], pair[1], len(routes) + i, router): pair 
             for i, pair in enumerate(node_pairs)
         }
         
@@ -210,8 +218,8 @@ def generate_routes_parallel(nodes, num_routes, max_workers=10, existing_routes=
                 if completed % 10 == 0 or completed == total:
                     print(f"Generated {completed}/{total} routes...")
                     # Save interim progress
-                    if completed % 50 == 0 and routes:
-                        save_routes(routes)
+                    if completed % 50 == 0 and routes and routes_cache_key:
+                        cache_store.save_routes(routes_cache_key, routes)
                 
                 try:
                     route_data, route_id = future.result(timeout=30)
@@ -232,13 +240,25 @@ def generate_routes_parallel(nodes, num_routes, max_workers=10, existing_routes=
             executor.shutdown(wait=False)
             
             # Save whatever routes we have
-            if routes:
+            if routes and routes_cache_key:
                 print(f"Saving {len(routes)} routes generated so far")
-                save_routes(routes)
+                cache_store.save_routes(routes_cache_key, routes)
     
     return routes
 
-def get_route_data(origin, destination, route_id):
+def get_offline_route_data(router, origin, destination, route_id):
+    """Get route data between two points from the offline road graph"""
+    route_data = router.route(origin, destination)
+    result = {
+        "id": f"route-{route_id+1}",
+        "origin": origin,
+        "destination": destination,
+        "points": route_data["points"],
+        "distance": route_data["distance"] / 1000  # Convert m to km
+    }
+    return result, route_id
+
+def get_route_data(origin, destination, route_id, router=None):
     """Get route data between two points with error handling"""
     try:
         route_data = get_route(origin, destination)
@@ -254,6 +274,12 @@ def get_route_data(origin, destination, route_id):
         return result, route_id
     except Exception as e:
         print(f"API error for route {route_id}: {str(e)[:100]}")
+        # Prefer the offline road graph over a straight line
+        if router is not None:
+            try:
+                return get_offline_route_data(router, origin, destination, route_id)
+            except Exception as router_error:
+                print(f"Offline routing error for route {route_id}: {router_error}")
         # Fallback if route API fails
         route = [origin, destination]
         # Estimate distance (straight line)
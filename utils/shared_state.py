@@ -0,0 +1,126 @@
+import json
+import struct
+import time
+from multiprocessing import shared_memory
+
+# Segment layout: sequence number, index length, JSON index, then the blobs
+HEADER = struct.Struct('<QQ')
+
+class SharedState:
+    """
+    Pre-rendered API responses in a shared-memory segment
+
+    One process publishes a set of named blobs (response bodies with their
+    content type and status) and any number of processes read them. Writes
+    are guarded by a seqlock: the sequence number is odd while a publish is
+    in progress and bumped to the next even number when it's done, so a
+    reader that sees the same even number before and after copying a blob
+    knows the copy isn't torn, and retries otherwise. Readers never block
+    the writer.
+    """
+
+    def __init__(self, segment, owner):
+        self.segment = segment
+        self.owner = owner
+        self.buffer = segment.buf
+        self.capacity = segment.size - HEADER.size
+        self.sequence = HEADER.unpack_from(self.buffer, 0)[0]
+        self._index = (None, None)  # (sequence, parsed index) of the last read
+
+    @classmethod
+    def create(cls, size, name=None):
+        """Create a zeroed segment of `size` bytes (the creator unlinks it in close)"""
+        return cls(shared_memory.SharedMemory(name=name, create=True, size=size), owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Open an existing segment
+
+        Before Python 3.13 attaching registers the segment with the
+        resource tracker, which unlinks it when the tracker exits. Readers
+        forked from the creator share its tracker, so that's harmless there.
+        """
+        try:
+            segment = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            segment = shared_memory.SharedMemory(name=name)
+        return cls(segment, owner=False)
+
+    @property
+    def name(self):
+        return self.segment.name
+
+    def publish(self, blobs, meta=None):
+        """
+        Replace the published blobs
+
+        Args:
+            blobs: {name: (body bytes, content type, status code)}
+            meta: Small JSON-serializable dict returned with every read
+
+        Returns:
+            bool: False if the blobs don't fit in the segment (nothing is written)
+        """
+        entries = {}
+        offset = 0
+        for name, (body, mimetype, status) in blobs.items():
+            entries[name] = [offset, len(body), mimetype, status]
+            offset += len(body)
+        index = json.dumps({'meta': meta or {}, 'blobs': entries}).encode()
+        start = HEADER.size + len(index)
+        if len(index) + offset > self.capacity:
+            return False
+
+        buffer = self.buffer
+        self.sequence += 1
+        HEADER.pack_into(buffer, 0, self.sequence, 0)
+        buffer[HEADER.size:start] = index
+        for name, (body, _, _) in blobs.items():
+            position = start + entries[name][0]
+            buffer[position:position + len(body)] = body
+        self.sequence += 1
+        HEADER.pack_into(buffer, 0, self.sequence, len(index))
+        return True
+
+    def read(self, name, retries=1000):
+        """
+        Consistent copy of one blob
+
+        Returns:
+            tuple: (body, content type, status, meta), or None if nothing is
+            published yet or there's no blob `name`
+        """
+        buffer = self.buffer
+        for _ in range(retries):
+            sequence, length = HEADER.unpack_from(buffer, 0)
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            if not length:
+                return None
+            cached_sequence, index = self._index
+            if cached_sequence != sequence:
+                try:
+                    index = json.loads(bytes(buffer[HEADER.size:HEADER.size + length]))
+                except ValueError:
+                    continue
+            entry = index['blobs'].get(name)
+            body = None
+            if entry is not None:
+                start = HEADER.size + length + entry[0]
+                body = bytes(buffer[start:start + entry[1]])
+            if HEADER.unpack_from(buffer, 0)[0] != sequence:
+                continue
+            self._index = (sequence, index)
+            if entry is None:
+                return None
+            return body, entry[2], entry[3], index['meta']
+        raise TimeoutError(f"No consistent read of {name} after {retries} attempts")
+
+    def close(self):
+        """Detach, and remove the segment if this process created it"""
+        self.buffer = None
+        self.segment.close()
+        if self.owner:
+            self.segment.unlink()
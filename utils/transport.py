@@ -0,0 +1,171 @@
+import gzip
+import json
+import struct
+import zlib
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # Optional: MessagePack responses are only offered when it is installed
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+COLUMNAR = 'application/vnd.evqueue.columnar'
+
+# Leading bytes of a columnar payload
+COLUMNAR_MAGIC = b'EVQC'
+
+# EV status codes in the columnar `status` column
+STATUS_CODES = {'moving': 0, 'queued': 1, 'charging': 2, 'completed': 3, 'abandoned': 4}
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+def negotiate(accept, columnar=True):
+    """
+    Media type to answer with, given the request's Accept header
+
+    `accept` is a werkzeug MIMEAccept (request.accept_mimetypes). JSON is
+    listed first so it wins for */* and missing headers; MessagePack is
+    only offered when the package is installed.
+    """
+    offered = [JSON]
+    if msgpack is not None:
+        offered += [MSGPACK, 'application/x-msgpack']
+    if columnar:
+        offered.append(COLUMNAR)
+    best = accept.best_match(offered, default=JSON)
+    return MSGPACK if best == 'application/x-msgpack' else best
+
+def compress(body, accept_encoding, level=6):
+    """(body, Content-Encoding or None) using gzip or deflate if the client accepts one"""
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if accept_encoding['gzip']:
+        return gzip.compress(body, compresslevel=level), 'gzip'
+    if accept_encoding['deflate']:
+        return zlib.compress(body, level), 'deflate'
+    return body, None
+
+def pack_msgpack(obj):
+    """MessagePack bytes of plain data (dicts, lists, tuples, numbers, strings)"""
+    return msgpack.packb(obj, use_bin_type=True)
+
+def pack_ev_fields(evs, getters):
+    """
+    MessagePack array of EV maps, written field by field from the EVs
+
+    `getters` is a list of (field name, getter) pairs such as
+    fleet_query.EV_FIELDS items; no per-EV dict is built.
+    """
+    packer = msgpack.Packer(use_bin_type=True, autoreset=False)
+    packer.pack_array_header(len(evs))
+    for ev in evs:
+        packer.pack_map_header(len(getters))
+        for field, getter in getters:
+            packer.pack(field)
+            packer.pack(getter(ev))
+    return packer.bytes()
+
+def encode_columnar(header, columns):
+    """
+    Packed columnar payload
+
+    Layout: b'EVQC', a little-endian uint32 header length, the UTF-8 JSON
+    header, padding to an 8-byte boundary, then the columns' raw bytes,
+    each starting on an 8-byte boundary. The header's 'columns' list gives
+    each column's name, dtype, length and byte offset from the start of
+    the column data.
+    """
+    descriptions = []
+    blobs = []
+    position = 0
+    for name, array in columns:
+        position += -position % 8
+        blob = np.ascontiguousarray(array).tobytes()
+        descriptions.append({'name': name, 'dtype': array.dtype.str, 'length': len(array), 'offset': position})
+        blobs.append(blob)
+        position += len(blob)
+    header_bytes = json.dumps(dict(header, columns=descriptions), separators=(',', ':')).encode()
+
+    parts = [COLUMNAR_MAGIC, struct.pack('<I', len(header_bytes)), header_bytes]
+    position = 8 + len(header_bytes)
+    for blob in [b''] + blobs:
+        # The empty first blob pads the header; then each column is aligned
+        parts.append(b'\0' * (-position % 8))
+        position += -position % 8
+        parts.append(blob)
+        position += len(blob)
+    return b''.join(parts)
+
+def decode_columnar(payload):
+    """(header, {name: array}) from an encode_columnar payload"""
+    if payload[:4] != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar payload")
+    (header_length,) = struct.unpack('<I', payload[4:8])
+    header = json.loads(payload[8:8 + header_length])
+    data_start = 8 + header_length + (-(8 + header_length) % 8)
+    columns = {
+        column['name']: np.frombuffer(payload, dtype=np.dtype(column['dtype']),
+                                      count=column['length'], offset=data_start + column['offset'])
+        for column in header['columns']
+    }
+    return header, columns
+
+def ev_columns(evs):
+    """float32 lat/lng/SoC and uint8 status columns read straight from EV objects"""
+    count = len(evs)
+    return [
+        ('ev_lat', np.fromiter((ev.current_position[0] for ev in evs), dtype=np.float32, count=count)),
+        ('ev_lng', np.fromiter((ev.current_position[1] for ev in evs), dtype=np.float32, count=count)),
+        ('ev_soc', np.fromiter((ev.soc for ev in evs), dtype=np.float32, count=count)),
+        ('ev_status', np.fromiter((STATUS_CODES[ev.status] for ev in evs), dtype=np.uint8, count=count))
+    ]
+
+def station_columns(stations):
+    """Station location and load columns"""
+    count = len(stations)
+    return [
+        ('station_lat', np.fromiter((station.location[0] for station in stations), dtype=np.float32, count=count)),
+        ('station_lng', np.fromiter((station.location[1] for station in stations), dtype=np.float32, count=count)),
+        ('station_queue', np.fromiter((len(station.queue) for station in stations), dtype=np.uint16, count=count)),
+        ('station_charging', np.fromiter((len(station.charging_evs) for station in stations),
+                                         dtype=np.uint16, count=count))
+    ]
+
+def state_columnar(step, metrics, evs, stations):
+    """Columnar payload of a simulation state: IDs and metrics in the header, per-EV values as columns"""
+    header = {
+        'step': step,
+        'metrics': metrics,
+        'ev_ids': [ev.id for ev in evs],
+        'station_ids': [station.id for station in stations],
+        'status_codes': STATUS_CODES
+    }
+    return encode_columnar(header, ev_columns(evs) + station_columns(stations))
+
+def history_columnar(history):
+    """Columnar payload of history entries (the dicts recorded by Simulation._record_state)"""
+    steps = []
+    lengths = []
+    lat, lng, soc = [], [], []
+    for state in history:
+        steps.append(state['step'])
+        lengths.append(len(state['evs']))
+        for ev in state['evs']:
+            position = ev['current_position']
+            lat.append(position[0])
+            lng.append(position[1])
+            soc.append(ev['soc'])
+    header = {
+        'steps': steps,
+        'metrics': [state['metrics'] for state in history],
+        'ev_ids': [[ev['id'] for ev in state['evs']] for state in history]
+    }
+    return encode_columnar(header, [
+        ('ev_count', np.asarray(lengths, dtype=np.uint32)),
+        ('ev_lat', np.asarray(lat, dtype=np.float32)),
+        ('ev_lng', np.asarray(lng, dtype=np.float32)),
+        ('ev_soc', np.asarray(soc, dtype=np.float32))
+    ])